@@ -54,6 +54,476 @@ CREATE TABLE IF NOT EXISTS processing_jobs (
   completed_at TIMESTAMP WITH TIME ZONE
 );
 
+-- Job queue columns: leases and heartbeats let another worker recover a job
+-- whose worker crashed, attempts bound how often a job is retried
+ALTER TABLE processing_jobs ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0;
+ALTER TABLE processing_jobs ADD COLUMN IF NOT EXISTS max_attempts INTEGER DEFAULT 3;
+ALTER TABLE processing_jobs ADD COLUMN IF NOT EXISTS locked_by TEXT;
+ALTER TABLE processing_jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE processing_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE processing_jobs ADD COLUMN IF NOT EXISTS started_at TIMESTAMP WITH TIME ZONE;
+-- Failed attempts back off: a requeued job isn't claimed before not_before
+ALTER TABLE processing_jobs ADD COLUMN IF NOT EXISTS not_before TIMESTAMP WITH TIME ZONE;
+
+-- Atomically claim the oldest pending job, honouring a global limit on running jobs
+CREATE OR REPLACE FUNCTION claim_processing_job(
+  p_worker_id TEXT,
+  p_lease_seconds INTEGER,
+  p_max_running INTEGER
+)
+RETURNS SETOF processing_jobs
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  running_count INTEGER;
+  claimed processing_jobs;
+BEGIN
+  -- Serialize claims so the running count check is exact across workers
+  PERFORM pg_advisory_xact_lock(hashtext('claim_processing_job'));
+
+  -- Expired leases belong to crashed workers: requeue or give up
+  UPDATE processing_jobs
+  SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+      stage = CASE WHEN attempts >= max_attempts THEN 'error' ELSE 'queued' END,
+      error = CASE WHEN attempts >= max_attempts THEN 'Worker lease expired' ELSE error END,
+      locked_by = NULL,
+      lease_expires_at = NULL,
+      not_before = NOW() + make_interval(secs => LEAST(600, 30 * power(2, GREATEST(attempts - 1, 0)))),
+      updated_at = NOW()
+  WHERE status = 'processing' AND lease_expires_at < NOW();
+
+  SELECT COUNT(*) INTO running_count FROM processing_jobs WHERE status = 'processing';
+  IF running_count >= p_max_running THEN
+    RETURN;
+  END IF;
+
+  UPDATE processing_jobs
+  SET status = 'processing',
+      locked_by = p_worker_id,
+      lease_expires_at = NOW() + make_interval(secs => p_lease_seconds),
+      heartbeat_at = NOW(),
+      started_at = COALESCE(started_at, NOW()),
+      attempts = attempts + 1,
+      updated_at = NOW()
+  WHERE id = (
+    SELECT id FROM processing_jobs
+    WHERE status = 'pending' AND (not_before IS NULL OR not_before <= NOW())
+    ORDER BY created_at
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1
+  )
+  RETURNING * INTO claimed;
+
+  IF claimed.id IS NOT NULL THEN
+    RETURN NEXT claimed;
+  END IF;
+END;
+$$;
+
+-- Bulk save of a lesson's topics: one round trip, one transaction.
+-- Re-processing upserts on (lesson_id, topic_id) instead of adding duplicates.
+-- Earlier saves inserted a new row per run, so before the unique index is
+-- first built keep one row per pair (active first, then the most recently
+-- updated) and delete the rest.
+DO $$
+BEGIN
+  IF to_regclass('idx_lesson_topic_lesson_id_topic_id') IS NULL THEN
+    DELETE FROM lesson_topic
+    WHERE id IN (
+      SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (
+          PARTITION BY lesson_id, topic_id
+          ORDER BY COALESCE(active, false) DESC, updated_at DESC NULLS LAST, id DESC
+        ) AS copy_number
+        FROM lesson_topic
+        WHERE topic_id IS NOT NULL
+      ) copies
+      WHERE copy_number > 1
+    );
+  END IF;
+END;
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_lesson_topic_lesson_id_topic_id ON lesson_topic(lesson_id, topic_id);
+
+CREATE OR REPLACE FUNCTION save_lesson_topics(p_lesson_id BIGINT, p_topics JSONB)
+RETURNS SETOF lesson_topic
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  INSERT INTO lesson_topic (lesson_id, topic_id, topic, subtopic, "order", simplified_explanation, active)
+  SELECT p_lesson_id, t.topic_id, t.topic, t.subtopic, t."order", t.simplified_explanation, true
+  FROM jsonb_to_recordset(p_topics)
+    AS t(topic_id TEXT, topic TEXT, subtopic TEXT, "order" INTEGER, simplified_explanation JSONB)
+  ON CONFLICT (lesson_id, topic_id) DO UPDATE
+  SET topic = EXCLUDED.topic,
+      subtopic = EXCLUDED.subtopic,
+      "order" = EXCLUDED."order",
+      simplified_explanation = EXCLUDED.simplified_explanation,
+      active = true,
+      updated_at = NOW();
+
+  -- Topics no longer produced by the pipeline are soft-deleted
+  UPDATE lesson_topic
+  SET active = false, updated_at = NOW()
+  WHERE lesson_id = p_lesson_id
+    AND active
+    AND topic_id NOT IN (SELECT t->>'topic_id' FROM jsonb_array_elements(p_topics) AS t);
+
+  UPDATE lesson
+  SET num_topics = jsonb_array_length(p_topics), updated_at = NOW()
+  WHERE id = p_lesson_id;
+
+  RETURN QUERY
+  SELECT * FROM lesson_topic
+  WHERE lesson_id = p_lesson_id AND active
+  ORDER BY "order";
+END;
+$$;
+
+-- Lesson Topic Search Table (full-text index over topics and their segments)
+-- Kept in its own table so topic reads don't carry the vector. Weights:
+-- topic A, subtopic B, segment text C, segment originalText D.
+CREATE TABLE IF NOT EXISTS lesson_topic_search (
+  lesson_topic_id BIGINT PRIMARY KEY REFERENCES lesson_topic(id) ON DELETE CASCADE,
+  search_vector TSVECTOR NOT NULL,
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION lesson_topic_search_vector(p_topic TEXT, p_subtopic TEXT, p_segments JSONB)
+RETURNS TSVECTOR
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  WITH segments AS (
+    SELECT s
+    FROM jsonb_array_elements(CASE WHEN jsonb_typeof(p_segments) = 'array' THEN p_segments ELSE '[]'::jsonb END) AS s
+  )
+  SELECT setweight(to_tsvector('english', coalesce(p_topic, '')), 'A') ||
+         setweight(to_tsvector('english', coalesce(p_subtopic, '')), 'B') ||
+         setweight(to_tsvector('english', coalesce((SELECT string_agg(s->>'text', ' ') FROM segments), '')), 'C') ||
+         setweight(to_tsvector('english', coalesce((SELECT string_agg(s->>'originalText', ' ') FROM segments), '')), 'D')
+$$;
+
+-- Re-index a topic only when its searchable columns are written, so the
+-- soft-delete in save_lesson_topics (active only) costs nothing
+CREATE OR REPLACE FUNCTION index_lesson_topic_search()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  INSERT INTO lesson_topic_search (lesson_topic_id, search_vector)
+  VALUES (NEW.id, lesson_topic_search_vector(NEW.topic, NEW.subtopic, NEW.simplified_explanation))
+  ON CONFLICT (lesson_topic_id) DO UPDATE
+  SET search_vector = EXCLUDED.search_vector,
+      updated_at = NOW();
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS lesson_topic_search_index ON lesson_topic;
+CREATE TRIGGER lesson_topic_search_index
+AFTER INSERT OR UPDATE OF topic, subtopic, simplified_explanation ON lesson_topic
+FOR EACH ROW EXECUTE FUNCTION index_lesson_topic_search();
+
+-- Backfill topics written before the trigger existed
+INSERT INTO lesson_topic_search (lesson_topic_id, search_vector)
+SELECT id, lesson_topic_search_vector(topic, subtopic, simplified_explanation)
+FROM lesson_topic
+ON CONFLICT (lesson_topic_id) DO NOTHING;
+
+-- Ranked search over active topics of active lessons. Pages are keyset on
+-- (rank desc, id): pass the last row's rank and id to get the next page.
+-- Headlines and matching segment ids are only built for the returned page.
+CREATE OR REPLACE FUNCTION search_lesson_topics(
+  p_query TEXT,
+  p_book_id BIGINT DEFAULT NULL,
+  p_limit INTEGER DEFAULT 20,
+  p_after_rank REAL DEFAULT NULL,
+  p_after_id BIGINT DEFAULT NULL
+)
+RETURNS TABLE (
+  id BIGINT,
+  lesson_id BIGINT,
+  lesson_name TEXT,
+  book_id BIGINT,
+  topic_id TEXT,
+  topic TEXT,
+  subtopic TEXT,
+  "order" INTEGER,
+  rank REAL,
+  headline TEXT,
+  segment_ids JSONB
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH query AS (
+    SELECT websearch_to_tsquery('english', p_query) AS q
+  ),
+  matches AS (
+    SELECT t.id, t.lesson_id, l.name AS lesson_name, l.book_id, t.topic_id, t.topic, t.subtopic,
+           t."order", t.simplified_explanation, ts_rank_cd(ts.search_vector, query.q)::REAL AS rank
+    FROM query
+    JOIN lesson_topic_search ts ON ts.search_vector @@ query.q
+    JOIN lesson_topic t ON t.id = ts.lesson_topic_id AND t.active
+    JOIN lesson l ON l.id = t.lesson_id AND l.active
+    WHERE p_book_id IS NULL OR l.book_id = p_book_id
+  ),
+  page AS (
+    SELECT * FROM matches m
+    WHERE p_after_rank IS NULL
+       OR m.rank < p_after_rank
+       OR (m.rank = p_after_rank AND m.id > p_after_id)
+    ORDER BY m.rank DESC, m.id
+    LIMIT p_limit
+  )
+  SELECT a.id::BIGINT, a.lesson_id::BIGINT, a.lesson_name::TEXT, a.book_id::BIGINT, a.topic_id::TEXT,
+         a.topic::TEXT, a.subtopic::TEXT, a."order"::INTEGER, a.rank,
+         ts_headline(
+           'english',
+           coalesce(a.topic, '') || ' — ' || coalesce((
+             SELECT string_agg(s->>'text', ' ')
+             FROM jsonb_array_elements(CASE WHEN jsonb_typeof(a.simplified_explanation) = 'array' THEN a.simplified_explanation ELSE '[]'::jsonb END) AS s
+           ), ''),
+           query.q,
+           'MaxFragments=2, MaxWords=20, MinWords=5, StartSel=<mark>, StopSel=</mark>'
+         ),
+         coalesce((
+           SELECT jsonb_agg(s->'id')
+           FROM jsonb_array_elements(CASE WHEN jsonb_typeof(a.simplified_explanation) = 'array' THEN a.simplified_explanation ELSE '[]'::jsonb END) AS s
+           WHERE to_tsvector('english', coalesce(s->>'text', '') || ' ' || coalesce(s->>'originalText', '')) @@ query.q
+         ), '[]'::jsonb)
+  FROM page a, query
+  ORDER BY a.rank DESC, a.id
+$$;
+
+-- Batch quiz edits for one lesson in one transaction. Rows with an id are
+-- updated (omitted fields are kept), rows without one (or with a null or empty
+-- id) are created; questions nested in a section belong to it, and deleting a
+-- section deletes its questions. Any id outside the lesson rolls back the
+-- whole batch. num_questions is recounted and the lesson's quiz is returned.
+CREATE OR REPLACE FUNCTION save_quiz_question(p_lesson_id BIGINT, p_section_id BIGINT, p_question JSONB)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  r quiz_question;
+  v_section_id BIGINT := COALESCE(p_section_id, (p_question->>'section_id')::BIGINT);
+  v_id BIGINT;
+BEGIN
+  -- A null or empty id means a new question (and would not cast to BIGINT)
+  IF NULLIF(p_question->>'id', '') IS NULL THEN
+    p_question := p_question - 'id';
+  END IF;
+  r := jsonb_populate_record(NULL::quiz_question, p_question);
+
+  IF v_section_id IS NOT NULL AND NOT EXISTS (
+    SELECT 1 FROM quiz_section WHERE id = v_section_id AND lesson_id = p_lesson_id AND active
+  ) THEN
+    RAISE EXCEPTION 'Quiz section % is not in lesson %', v_section_id, p_lesson_id USING ERRCODE = '22023';
+  END IF;
+
+  IF NULLIF(p_question->>'id', '') IS NOT NULL THEN
+    UPDATE quiz_question q
+    SET quiz_section_id = COALESCE(v_section_id, q.quiz_section_id),
+        question_type = CASE WHEN p_question ? 'question_type' THEN r.question_type ELSE q.question_type END,
+        question = CASE WHEN p_question ? 'question' THEN r.question ELSE q.question END,
+        answer = CASE WHEN p_question ? 'answer' THEN r.answer ELSE q.answer END,
+        "order" = CASE WHEN p_question ? 'order' THEN r."order" ELSE q."order" END,
+        updated_at = NOW()
+    FROM quiz_section s
+    WHERE q.id = r.id AND q.active
+      AND s.id = q.quiz_section_id AND s.lesson_id = p_lesson_id
+    RETURNING q.id INTO v_id;
+    IF v_id IS NULL THEN
+      RAISE EXCEPTION 'Quiz question % is not in lesson %', r.id, p_lesson_id USING ERRCODE = '22023';
+    END IF;
+  ELSE
+    IF v_section_id IS NULL OR r.question_type IS NULL OR r.question IS NULL THEN
+      RAISE EXCEPTION 'section_id, question_type and question are required for new questions' USING ERRCODE = '22023';
+    END IF;
+    INSERT INTO quiz_question (quiz_section_id, question_type, question, answer, "order", active)
+    VALUES (v_section_id, r.question_type, r.question, r.answer, COALESCE(r."order", 1), true);
+  END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION save_quiz_changes(
+  p_lesson_id BIGINT,
+  p_sections JSONB DEFAULT '[]'::jsonb,
+  p_questions JSONB DEFAULT '[]'::jsonb,
+  p_deleted_section_ids BIGINT[] DEFAULT '{}',
+  p_deleted_question_ids BIGINT[] DEFAULT '{}'
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  r quiz_section;
+  v_book_id BIGINT;
+  v_section JSONB;
+  v_question JSONB;
+  v_section_id BIGINT;
+BEGIN
+  -- Lock the lesson so concurrent editors apply their batches one at a time
+  SELECT book_id INTO v_book_id FROM lesson WHERE id = p_lesson_id AND active FOR UPDATE;
+  IF v_book_id IS NULL THEN
+    RAISE EXCEPTION 'Invalid lesson_id or lesson has no book_id' USING ERRCODE = '22023';
+  END IF;
+
+  FOR v_section IN SELECT * FROM jsonb_array_elements(COALESCE(p_sections, '[]'::jsonb)) LOOP
+    -- A null or empty id means a new section (and would not cast to BIGINT)
+    IF NULLIF(v_section->>'id', '') IS NULL THEN
+      v_section := v_section - 'id';
+    END IF;
+    r := jsonb_populate_record(NULL::quiz_section, v_section);
+    v_section_id := NULL;
+
+    IF NULLIF(v_section->>'id', '') IS NOT NULL THEN
+      UPDATE quiz_section s
+      SET name = CASE WHEN v_section ? 'name' THEN r.name ELSE s.name END,
+          "order" = CASE WHEN v_section ? 'order' THEN r."order" ELSE s."order" END,
+          updated_at = NOW()
+      WHERE s.id = r.id AND s.lesson_id = p_lesson_id AND s.active
+      RETURNING s.id INTO v_section_id;
+      IF v_section_id IS NULL THEN
+        RAISE EXCEPTION 'Quiz section % is not in lesson %', r.id, p_lesson_id USING ERRCODE = '22023';
+      END IF;
+    ELSE
+      IF r.name IS NULL OR r."order" IS NULL THEN
+        RAISE EXCEPTION 'name and order are required for new sections' USING ERRCODE = '22023';
+      END IF;
+      INSERT INTO quiz_section (lesson_id, book_id, name, "order", num_questions, active)
+      VALUES (p_lesson_id, v_book_id, r.name, r."order", 0, true)
+      RETURNING id INTO v_section_id;
+    END IF;
+
+    FOR v_question IN SELECT * FROM jsonb_array_elements(COALESCE(v_section->'questions', '[]'::jsonb)) LOOP
+      PERFORM save_quiz_question(p_lesson_id, v_section_id, v_question);
+    END LOOP;
+  END LOOP;
+
+  FOR v_question IN SELECT * FROM jsonb_array_elements(COALESCE(p_questions, '[]'::jsonb)) LOOP
+    PERFORM save_quiz_question(p_lesson_id, NULL, v_question);
+  END LOOP;
+
+  -- Deleting a section deletes its questions too
+  UPDATE quiz_question q
+  SET active = false, updated_at = NOW()
+  FROM quiz_section s
+  WHERE (q.id = ANY(p_deleted_question_ids) OR q.quiz_section_id = ANY(p_deleted_section_ids))
+    AND q.active
+    AND s.id = q.quiz_section_id AND s.lesson_id = p_lesson_id;
+
+  UPDATE quiz_section
+  SET active = false, updated_at = NOW()
+  WHERE id = ANY(p_deleted_section_ids) AND lesson_id = p_lesson_id;
+
+  UPDATE quiz_section s
+  SET num_questions = counts.total
+  FROM (
+    SELECT s2.id, COUNT(q.id) AS total
+    FROM quiz_section s2
+    LEFT JOIN quiz_question q ON q.quiz_section_id = s2.id AND q.active
+    WHERE s2.lesson_id = p_lesson_id AND s2.active
+    GROUP BY s2.id
+  ) AS counts
+  WHERE s.id = counts.id AND s.num_questions IS DISTINCT FROM counts.total;
+
+  RETURN COALESCE((
+    SELECT jsonb_agg(to_jsonb(s) || jsonb_build_object('questions', COALESCE((
+      SELECT jsonb_agg(to_jsonb(q) ORDER BY q."order", q.created_at)
+      FROM quiz_question q
+      WHERE q.quiz_section_id = s.id AND q.active
+    ), '[]'::jsonb)) ORDER BY s."order")
+    FROM quiz_section s
+    WHERE s.lesson_id = p_lesson_id AND s.active
+  ), '[]'::jsonb);
+END;
+$$;
+
+-- Import keys: stable identifiers tools/bulk_import.py upserts on, so an
+-- import can be re-run without duplicating rows. Rows created in the admin
+-- UI leave them NULL, which never conflicts.
+ALTER TABLE school ADD COLUMN IF NOT EXISTS import_key TEXT;
+ALTER TABLE curriculum ADD COLUMN IF NOT EXISTS import_key TEXT;
+ALTER TABLE grade ADD COLUMN IF NOT EXISTS import_key TEXT;
+ALTER TABLE book ADD COLUMN IF NOT EXISTS import_key TEXT;
+ALTER TABLE subject ADD COLUMN IF NOT EXISTS import_key TEXT;
+ALTER TABLE lesson ADD COLUMN IF NOT EXISTS import_key TEXT;
+
+-- PDF Uploads Table (chunked, resumable uploads streamed to the lesson-pdfs bucket)
+-- checksum is sha256 over the concatenated hex sha256 digests of each chunk
+CREATE TABLE IF NOT EXISTS pdf_uploads (
+  id TEXT PRIMARY KEY,
+  lesson_id TEXT NOT NULL,
+  file_name TEXT,
+  size BIGINT NOT NULL,
+  chunk_size INTEGER NOT NULL,
+  bytes_received BIGINT DEFAULT 0,
+  hash_state JSONB, -- Running sha256 of the bytes received, null once a chunk was only partly stored
+  checksum TEXT,
+  upload_url TEXT,
+  storage_path TEXT NOT NULL,
+  status TEXT DEFAULT 'uploading',
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Pipeline Artifacts Table (per-stage checkpoints so re-runs skip unchanged work)
+-- stage is 'page_image', 'ocr', 'segmentation' or 'topic_audio'; input_hash identifies the stage input
+CREATE TABLE IF NOT EXISTS pipeline_artifacts (
+  lesson_id TEXT NOT NULL,
+  stage TEXT NOT NULL,
+  artifact_key TEXT NOT NULL,
+  input_hash TEXT NOT NULL,
+  data JSONB,
+  storage_path TEXT,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  PRIMARY KEY (lesson_id, stage, artifact_key)
+);
+
+-- TTS Audio Cache Table (content-addressed synthesized audio, LRU by last_used_at)
+CREATE TABLE IF NOT EXISTS tts_audio_cache (
+  cache_key TEXT PRIMARY KEY,
+  voice_id TEXT NOT NULL,
+  model TEXT NOT NULL,
+  audio_path TEXT NOT NULL,
+  audio_url TEXT NOT NULL,
+  duration NUMERIC,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  last_used_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- LLM Response Cache Table (model responses keyed by task + model + prompt + input)
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+  cache_key TEXT PRIMARY KEY,
+  task TEXT NOT NULL,
+  model TEXT NOT NULL,
+  response JSONB NOT NULL,
+  usage JSONB,
+  expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  last_used_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Lesson Bundles Table (latest published bundle per lesson in the lesson-bundles bucket)
+-- version is a content hash; bundles at lessons/<lesson_id>/<version>.json(.gz|.br) are immutable
+CREATE TABLE IF NOT EXISTS lesson_bundles (
+  lesson_id TEXT PRIMARY KEY,
+  version TEXT NOT NULL,
+  previous_version TEXT,
+  path TEXT NOT NULL,
+  url TEXT NOT NULL,
+  size INTEGER,
+  gzip_size INTEGER,
+  brotli_size INTEGER,
+  published_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_lessons_book_id ON lessons(book_id);
 CREATE INDEX IF NOT EXISTS idx_lessons_status ON lessons(status);
@@ -61,23 +531,47 @@ CREATE INDEX IF NOT EXISTS idx_lesson_topics_lesson_id ON lesson_topics(lesson_i
 CREATE INDEX IF NOT EXISTS idx_lesson_topics_order ON lesson_topics("order");
 CREATE INDEX IF NOT EXISTS idx_processing_jobs_lesson_id ON processing_jobs(lesson_id);
 CREATE INDEX IF NOT EXISTS idx_processing_jobs_status ON processing_jobs(status);
+CREATE INDEX IF NOT EXISTS idx_processing_jobs_status_created_at ON processing_jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_tts_audio_cache_last_used_at ON tts_audio_cache(last_used_at);
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_used_at ON llm_response_cache(last_used_at);
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires_at ON llm_response_cache(expires_at);
+CREATE INDEX IF NOT EXISTS idx_lesson_topic_search_vector ON lesson_topic_search USING GIN(search_vector);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_school_import_key ON school(import_key);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_curriculum_import_key ON curriculum(import_key);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_grade_import_key ON grade(import_key);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_book_import_key ON book(import_key);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_subject_import_key ON subject(import_key);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_lesson_import_key ON lesson(import_key);
 
 -- Enable Row Level Security (RLS)
 ALTER TABLE books ENABLE ROW LEVEL SECURITY;
 ALTER TABLE lessons ENABLE ROW LEVEL SECURITY;
 ALTER TABLE lesson_topics ENABLE ROW LEVEL SECURITY;
 ALTER TABLE processing_jobs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE pdf_uploads ENABLE ROW LEVEL SECURITY;
+ALTER TABLE pipeline_artifacts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE tts_audio_cache ENABLE ROW LEVEL SECURITY;
+ALTER TABLE lesson_bundles ENABLE ROW LEVEL SECURITY;
+ALTER TABLE llm_response_cache ENABLE ROW LEVEL SECURITY;
+ALTER TABLE lesson_topic_search ENABLE ROW LEVEL SECURITY;
 
 -- Create RLS Policies (Allow all operations for now - adjust based on your auth needs)
 CREATE POLICY "Allow all operations on books" ON books FOR ALL USING (true);
 CREATE POLICY "Allow all operations on lessons" ON lessons FOR ALL USING (true);
 CREATE POLICY "Allow all operations on lesson_topics" ON lesson_topics FOR ALL USING (true);
 CREATE POLICY "Allow all operations on processing_jobs" ON processing_jobs FOR ALL USING (true);
+CREATE POLICY "Allow all operations on pdf_uploads" ON pdf_uploads FOR ALL USING (true);
+CREATE POLICY "Allow all operations on pipeline_artifacts" ON pipeline_artifacts FOR ALL USING (true);
+CREATE POLICY "Allow all operations on tts_audio_cache" ON tts_audio_cache FOR ALL USING (true);
+CREATE POLICY "Allow all operations on lesson_bundles" ON lesson_bundles FOR ALL USING (true);
+CREATE POLICY "Allow all operations on llm_response_cache" ON llm_response_cache FOR ALL USING (true);
+CREATE POLICY "Allow all operations on lesson_topic_search" ON lesson_topic_search FOR ALL USING (true);
 
 -- Create Storage Buckets (run separately or via Supabase Dashboard)
 -- You'll need to create these buckets manually:
 -- 1. lesson-pdfs (for storing uploaded PDFs)
 -- 2. lesson-images (for storing extracted page images)
 -- 3. lesson-audio (for storing generated audio files)
+-- 4. lesson-bundles (for published lesson bundles)
 
 -- Storage bucket policies should be set to allow public read access
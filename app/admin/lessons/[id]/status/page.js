@@ -23,38 +23,39 @@ export default function LessonProcessingStatus() {
   useEffect(() => {
     if (!lessonId) return
 
-    fetchStatus()
-    const interval = setInterval(fetchStatus, 3000) // Poll every 3 seconds
+    fetchLesson()
 
-    return () => clearInterval(interval)
+    // Progress is pushed over server-sent events; EventSource reconnects on its own
+    const events = new EventSource(`/api/lessons/process/stream?lessonId=${lessonId}`)
+    events.addEventListener('progress', (event) => {
+      handleStatus(JSON.parse(event.data))
+      setLoading(false)
+    })
+    events.addEventListener('done', () => events.close())
+
+    return () => events.close()
   }, [lessonId])
 
-  const fetchStatus = async () => {
+  const fetchLesson = async () => {
     try {
-      // Fetch lesson
       const lessonRes = await fetch('/api/lessons')
       const lessonData = await lessonRes.json()
       const currentLesson = lessonData.lessons?.find(l => l.id === lessonId)
       setLesson(currentLesson)
-
-      // Fetch processing job
-      const jobRes = await fetch(`/api/lessons/process?lessonId=${lessonId}`)
-      if (jobRes.ok) {
-        const jobData = await jobRes.json()
-        setJob(jobData)
-
-        // Redirect if completed
-        if (jobData?.status === 'completed') {
-          setTimeout(() => {
-            router.push(`/admin/lessons/${lessonId}`)
-          }, 2000)
-        }
-      }
     } catch (error) {
-      console.error('Error fetching status:', error)
+      console.error('Error fetching lesson:', error)
       setError(error.message)
-    } finally {
-      setLoading(false)
+    }
+  }
+
+  const handleStatus = (jobData) => {
+    setJob(jobData)
+
+    // Redirect if completed
+    if (jobData?.status === 'completed') {
+      setTimeout(() => {
+        router.push(`/admin/lessons/${lessonId}`)
+      }, 2000)
     }
   }
 
@@ -10,6 +10,7 @@ import { Label } from '@/components/ui/label'
 import { Alert, AlertDescription } from '@/components/ui/alert'
 import { Progress } from '@/components/ui/progress'
 import { Loader2, Upload, FileText, ArrowLeft, CheckCircle, AlertCircle } from 'lucide-react'
+import { uploadPdfInChunks } from '@/lib/chunkedUpload'
 
 export default function UploadLessonPDF() {
   const params = useParams()
@@ -51,8 +52,8 @@ export default function UploadLessonPDF() {
         setError('Please select a PDF file')
         return
       }
-      if (file.size > 50 * 1024 * 1024) {
-        setError('File size must be less than 50MB')
+      if (file.size > 500 * 1024 * 1024) {
+        setError('File size must be less than 500MB')
         return
       }
       setPdfFile(file)
@@ -71,35 +72,11 @@ export default function UploadLessonPDF() {
       setUploadProgress(0)
       setError('')
 
-      const formData = new FormData()
-      formData.append('pdf', pdfFile)
-      formData.append('lessonId', lessonId)
-
-      // Simulate progress
-      const progressInterval = setInterval(() => {
-        setUploadProgress((prev) => {
-          if (prev >= 90) {
-            clearInterval(progressInterval)
-            return prev
-          }
-          return prev + 10
-        })
-      }, 200)
-
-      const response = await fetch('/api/lessons/upload', {
-        method: 'POST',
-        body: formData
+      // Chunked upload resumes from the last stored offset if interrupted
+      await uploadPdfInChunks(pdfFile, lessonId, {
+        onProgress: setUploadProgress
       })
 
-      clearInterval(progressInterval)
-      setUploadProgress(100)
-
-      const data = await response.json()
-
-      if (!response.ok) {
-        throw new Error(data.error || 'Upload failed')
-      }
-
       setSuccess(true)
 
       // Start processing
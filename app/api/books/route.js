@@ -1,18 +1,20 @@
 import { NextResponse } from 'next/server'
 import { db } from '@/lib/db'
+import { jsonWithETag, listOptionsFromSearchParams } from '@/lib/http'
 
 export const runtime = 'nodejs'
 export const dynamic = 'force-dynamic'
 
-export async function GET() {
+export async function GET(request) {
   try {
-    const books = await db.getBooks()
-    return NextResponse.json({ success: true, books })
+    const { searchParams } = new URL(request.url)
+    const { items, nextCursor } = await db.listPage('book', listOptionsFromSearchParams(searchParams))
+    return jsonWithETag(request, { success: true, books: items, nextCursor })
   } catch (error) {
     console.error('Get books error:', error)
     return NextResponse.json(
       { error: error.message || 'Failed to fetch books' },
-      { status: 500 }
+      { status: error.status || 500 }
     )
   }
 }
@@ -1,18 +1,20 @@
 import { NextResponse } from 'next/server'
 import { db } from '@/lib/db'
+import { jsonWithETag, listOptionsFromSearchParams } from '@/lib/http'
 
 export const runtime = 'nodejs'
 export const dynamic = 'force-dynamic'
 
-export async function GET() {
+export async function GET(request) {
   try {
-    const grades = await db.getGrades()
-    return NextResponse.json({ success: true, grades })
+    const { searchParams } = new URL(request.url)
+    const { items, nextCursor } = await db.listPage('grade', listOptionsFromSearchParams(searchParams))
+    return jsonWithETag(request, { success: true, grades: items, nextCursor })
   } catch (error) {
     console.error('Get grades error:', error)
     return NextResponse.json(
       { error: error.message || 'Failed to fetch grades' },
-      { status: 500 }
+      { status: error.status || 500 }
     )
   }
 }
@@ -0,0 +1,53 @@
+import { NextResponse } from 'next/server'
+import { db, storage } from '@/lib/db'
+import lessonBundle from '@/lib/services/lessonBundle'
+
+export const runtime = 'nodejs'
+export const dynamic = 'force-dynamic'
+
+function bundleUrls(bundle) {
+  return {
+    url: bundle.url,
+    gzipUrl: storage.getPublicUrl('lesson-bundles', `${bundle.path}.gz`),
+    brotliUrl: storage.getPublicUrl('lesson-bundles', `${bundle.path}.br`),
+    latestUrl: storage.getPublicUrl('lesson-bundles', `lessons/${bundle.lesson_id}/latest.json`)
+  }
+}
+
+// GET the latest published bundle for a lesson
+export async function GET(request, { params }) {
+  try {
+    const bundle = await db.getLessonBundle(parseInt(params.id))
+
+    if (!bundle) {
+      return NextResponse.json(
+        { error: 'Lesson has not been published' },
+        { status: 404 }
+      )
+    }
+
+    return NextResponse.json({ success: true, bundle: { ...bundle, ...bundleUrls(bundle) } })
+  } catch (error) {
+    console.error('Get lesson bundle error:', error)
+    return NextResponse.json(
+      { error: error.message || 'Failed to fetch lesson bundle' },
+      { status: 500 }
+    )
+  }
+}
+
+// POST publish the lesson now
+export async function POST(request, { params }) {
+  try {
+    const { force = false } = await request.json().catch(() => ({}))
+    const bundle = await lessonBundle.publish(parseInt(params.id), { force })
+
+    return NextResponse.json({ success: true, bundle: { ...bundle, ...bundleUrls(bundle) } })
+  } catch (error) {
+    console.error('Publish lesson bundle error:', error)
+    return NextResponse.json(
+      { error: error.message || 'Failed to publish lesson bundle' },
+      { status: error.status || 500 }
+    )
+  }
+}
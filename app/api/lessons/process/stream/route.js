@@ -0,0 +1,80 @@
+import { NextResponse } from 'next/server'
+import jobWorker from '@/lib/services/jobWorker'
+import progressHub, { TERMINAL_STATUSES } from '@/lib/services/progressHub'
+
+export const runtime = 'nodejs'
+export const dynamic = 'force-dynamic'
+
+const HEARTBEAT_MS = 15000
+const RETRY_MS = 3000
+
+// GET a server-sent event stream of a lesson's processing status.
+// Sends the current status, then each change; closes once the job finishes.
+export async function GET(request) {
+  const { searchParams } = new URL(request.url)
+  const lessonId = parseInt(searchParams.get('lessonId'))
+
+  if (!lessonId) {
+    return NextResponse.json(
+      { error: 'lessonId required' },
+      { status: 400 }
+    )
+  }
+
+  const encoder = new TextEncoder()
+  let cleanup = () => {}
+
+  const stream = new ReadableStream({
+    start(controller) {
+      let closed = false
+
+      const send = (chunk) => {
+        if (!closed) controller.enqueue(encoder.encode(chunk))
+      }
+
+      const close = () => {
+        if (closed) return
+        closed = true
+        cleanup()
+        controller.close()
+      }
+
+      send(`retry: ${RETRY_MS}\n\n`)
+
+      // Comment lines keep proxies from timing out an idle connection
+      const heartbeat = setInterval(() => send(': heartbeat\n\n'), HEARTBEAT_MS)
+      let unsubscribe = () => {}
+      cleanup = () => {
+        clearInterval(heartbeat)
+        unsubscribe()
+      }
+
+      unsubscribe = progressHub.subscribe(lessonId, ({ version, status }) => {
+        send(`id: ${version}\nevent: progress\ndata: ${JSON.stringify(status)}\n\n`)
+        if (TERMINAL_STATUSES.includes(status.status)) {
+          send('event: done\ndata: {}\n\n')
+          close()
+        }
+      })
+      // The job may already have finished, in which case the snapshot closed the stream
+      if (closed) unsubscribe()
+
+      request.signal.addEventListener('abort', close)
+    },
+    cancel() {
+      cleanup()
+    }
+  })
+
+  // Watching a lesson also lets this instance pick up queued or abandoned jobs
+  jobWorker.poke()
+
+  return new Response(stream, {
+    headers: {
+      'Content-Type': 'text/event-stream; charset=utf-8',
+      'Cache-Control': 'no-cache, no-transform',
+      Connection: 'keep-alive',
+      'X-Accel-Buffering': 'no'
+    }
+  })
+}
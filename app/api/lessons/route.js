@@ -1,5 +1,6 @@
 import { NextResponse } from 'next/server'
 import { db } from '@/lib/db'
+import { jsonWithETag, listOptionsFromSearchParams } from '@/lib/http'
 
 export const runtime = 'nodejs'
 export const dynamic = 'force-dynamic'
@@ -9,14 +10,17 @@ export async function GET(request) {
     const { searchParams } = new URL(request.url)
     const bookId = searchParams.get('book_id') || searchParams.get('bookId')
 
-    const lessons = await db.getLessons(bookId || null)
+    const { items, nextCursor } = await db.listPage('lesson', {
+      ...listOptionsFromSearchParams(searchParams),
+      filters: { book_id: bookId || null }
+    })
     
-    return NextResponse.json({ success: true, lessons })
+    return jsonWithETag(request, { success: true, lessons: items, nextCursor })
   } catch (error) {
     console.error('Get lessons error:', error)
     return NextResponse.json(
       { error: error.message || 'Failed to fetch lessons' },
-      { status: 500 }
+      { status: error.status || 500 }
     )
   }
 }
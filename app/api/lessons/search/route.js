@@ -0,0 +1,37 @@
+import { NextResponse } from 'next/server'
+import { db } from '@/lib/db'
+import { jsonWithETag } from '@/lib/http'
+
+export const runtime = 'nodejs'
+export const dynamic = 'force-dynamic'
+
+// GET /api/lessons/search?q=&book_id=&limit=&cursor=
+// Ranked matches across lesson topics, subtopics and segment text
+export async function GET(request) {
+  try {
+    const { searchParams } = new URL(request.url)
+    const query = (searchParams.get('q') || '').trim()
+    const bookId = searchParams.get('book_id') || searchParams.get('bookId')
+
+    if (!query) {
+      return NextResponse.json(
+        { error: 'q is required' },
+        { status: 400 }
+      )
+    }
+
+    const { items, nextCursor } = await db.searchLessonTopics(query, {
+      limit: searchParams.get('limit'),
+      cursor: searchParams.get('cursor'),
+      bookId
+    })
+
+    return jsonWithETag(request, { success: true, results: items, nextCursor })
+  } catch (error) {
+    console.error('Search lessons error:', error)
+    return NextResponse.json(
+      { error: error.message || 'Failed to search lessons' },
+      { status: error.status || 500 }
+    )
+  }
+}
@@ -0,0 +1,163 @@
+import { NextResponse } from 'next/server'
+import { storage, db } from '@/lib/db'
+import { Sha256 } from '@/lib/sha256'
+
+export const runtime = 'nodejs'
+export const dynamic = 'force-dynamic'
+
+function uploadStatus(upload) {
+  return {
+    success: true,
+    uploadId: upload.id,
+    status: upload.status,
+    offset: upload.bytes_received,
+    size: upload.size,
+    chunkSize: upload.chunk_size,
+    checksum: upload.checksum
+  }
+}
+
+// Mark the upload complete and link the PDF to the lesson. The PDF moves to
+// its content-addressed path, which is immutable and shared by every lesson
+// whose upload hashed to the same checksum on the server. Each step can be
+// repeated, so a request that failed part way through is finished by a retry.
+async function completeUpload(upload) {
+  if (upload.status !== 'completing') {
+    // Bytes storage accepted without passing through the hash are read back
+    const checksum = upload.hash_state
+      ? new Sha256(upload.hash_state).digest()
+      : await storage.hashPDF(upload.storage_path)
+    upload = await db.updatePdfUpload(upload.id, { status: 'completing', checksum })
+  }
+
+  const contentPath = storage.pdfContentPath(upload.checksum)
+  if (upload.storage_path !== contentPath) {
+    let moved
+    try {
+      moved = await storage.movePDF(upload.storage_path, contentPath)
+    } catch (error) {
+      // Already moved by an earlier attempt that failed before recording it
+      if (!(await storage.pdfExists(contentPath))) throw error
+      moved = true
+    }
+    if (!moved) {
+      // An identical PDF is already stored there
+      await storage.removeFiles('lesson-pdfs', [upload.storage_path])
+    }
+    upload = await db.updatePdfUpload(upload.id, { storage_path: contentPath })
+  }
+
+  const pdfUrl = storage.getPublicUrl('lesson-pdfs', contentPath)
+  await db.updateLesson(parseInt(upload.lesson_id), { uploaded_pdf: pdfUrl })
+
+  return db.updatePdfUpload(upload.id, { status: 'completed' })
+}
+
+// GET upload status, used to resume from the last stored offset
+export async function GET(request, { params }) {
+  try {
+    const { id } = params
+    let upload = await db.getPdfUploadById(id)
+
+    if (!upload) {
+      return NextResponse.json(
+        { error: 'Upload not found' },
+        { status: 404 }
+      )
+    }
+
+    // Storage may have accepted bytes we never recorded (e.g. the server died
+    // mid-chunk); those never reached the hash, so completion reads the file back
+    if (upload.status === 'uploading') {
+      const offset = await storage.getResumablePDFUploadOffset(upload.upload_url)
+      if (offset !== null && offset !== upload.bytes_received) {
+        upload = await db.updatePdfUpload(id, { bytes_received: offset, hash_state: null })
+      }
+    }
+
+    return NextResponse.json(uploadStatus(upload))
+  } catch (error) {
+    console.error('Get upload error:', error)
+    return NextResponse.json(
+      { error: error.message || 'Failed to fetch upload' },
+      { status: 500 }
+    )
+  }
+}
+
+// PATCH append one chunk; the body is streamed straight to storage
+export async function PATCH(request, { params }) {
+  try {
+    const { id } = params
+    const offset = parseInt(request.headers.get('upload-offset'))
+    const upload = await db.getPdfUploadById(id)
+
+    if (!upload) {
+      return NextResponse.json(
+        { error: 'Upload not found' },
+        { status: 404 }
+      )
+    }
+
+    if (upload.status === 'completed') {
+      return NextResponse.json(uploadStatus(upload))
+    }
+
+    // Every byte is stored but completing failed; finish it
+    if (upload.bytes_received >= upload.size) {
+      return NextResponse.json(uploadStatus(await completeUpload(upload)))
+    }
+
+    if (offset !== upload.bytes_received) {
+      return NextResponse.json(
+        { error: 'Offset mismatch', ...uploadStatus(upload) },
+        { status: 409 }
+      )
+    }
+
+    if (!request.body) {
+      return NextResponse.json(
+        { error: 'Chunk body is required' },
+        { status: 400 }
+      )
+    }
+
+    // Extend the whole-file hash as the chunk streams through instead of buffering it
+    const hash = upload.hash_state ? new Sha256(upload.hash_state) : null
+    let received = 0
+    const hashing = new TransformStream({
+      transform(chunk, controller) {
+        hash?.update(chunk)
+        received += chunk.byteLength
+        controller.enqueue(chunk)
+      }
+    })
+
+    const newOffset = await storage.appendResumablePDFUpload(
+      upload.upload_url,
+      offset,
+      request.body.pipeThrough(hashing)
+    )
+
+    // If storage kept only part of the chunk the hash ran ahead of the file;
+    // completion then hashes the stored file instead
+    const hashState = hash && newOffset === offset + received ? hash.toJSON() : null
+
+    let updated = await db.updatePdfUpload(id, {
+      bytes_received: newOffset,
+      hash_state: hashState
+    })
+
+    if (newOffset >= upload.size) {
+      updated = await completeUpload(updated)
+    }
+
+    return NextResponse.json(uploadStatus(updated))
+  } catch (error) {
+    console.error('Chunk upload error:', error)
+    return NextResponse.json(
+      { error: error.message || 'Failed to upload chunk' },
+      { status: error.status === 409 ? 409 : 500 }
+    )
+  }
+}
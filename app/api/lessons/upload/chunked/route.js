@@ -0,0 +1,68 @@
+import { NextResponse } from 'next/server'
+import { randomUUID } from 'crypto'
+import { storage, db } from '@/lib/db'
+import { PDF_CHUNK_SIZE } from '@/lib/chunkedUpload'
+import { Sha256 } from '@/lib/sha256'
+
+export const runtime = 'nodejs'
+export const dynamic = 'force-dynamic'
+
+const MAX_PDF_SIZE = 500 * 1024 * 1024
+
+// POST start a chunked upload session
+export async function POST(request) {
+  try {
+    const body = await request.json()
+    const { lessonId, fileName, size } = body
+
+    if (!lessonId || !size) {
+      return NextResponse.json(
+        { error: 'lessonId and size are required' },
+        { status: 400 }
+      )
+    }
+
+    if (size > MAX_PDF_SIZE) {
+      return NextResponse.json(
+        { error: 'File size must be less than 500MB' },
+        { status: 400 }
+      )
+    }
+
+    // Verify lesson exists
+    const lesson = await db.getLessonById(parseInt(lessonId))
+    if (!lesson) {
+      return NextResponse.json(
+        { error: 'Lesson not found' },
+        { status: 404 }
+      )
+    }
+
+    const { uploadUrl, path } = await storage.createResumablePDFUpload(lessonId, size)
+    const upload = await db.createPdfUpload({
+      id: randomUUID(),
+      lesson_id: String(lessonId),
+      file_name: fileName || null,
+      size,
+      chunk_size: PDF_CHUNK_SIZE,
+      bytes_received: 0,
+      hash_state: new Sha256().toJSON(),
+      upload_url: uploadUrl,
+      storage_path: path,
+      status: 'uploading'
+    })
+
+    return NextResponse.json({
+      success: true,
+      uploadId: upload.id,
+      chunkSize: PDF_CHUNK_SIZE,
+      offset: 0
+    })
+  } catch (error) {
+    console.error('Chunked upload init error:', error)
+    return NextResponse.json(
+      { error: error.message || 'Failed to start upload' },
+      { status: 500 }
+    )
+  }
+}
@@ -0,0 +1,24 @@
+import { NextResponse } from 'next/server'
+import { registry } from '@/lib/metrics'
+
+export const runtime = 'nodejs'
+export const dynamic = 'force-dynamic'
+
+// GET pipeline metrics in the Prometheus text format.
+// Set METRICS_TOKEN to require `Authorization: Bearer <token>` from the scraper.
+export async function GET(request) {
+  const token = process.env.METRICS_TOKEN
+  if (token && request.headers.get('authorization') !== `Bearer ${token}`) {
+    return NextResponse.json(
+      { error: 'Unauthorized' },
+      { status: 401 }
+    )
+  }
+
+  return new Response(registry.render(), {
+    headers: {
+      'Content-Type': 'text/plain; version=0.0.4; charset=utf-8',
+      'Cache-Control': 'no-store'
+    }
+  })
+}
@@ -1,5 +1,6 @@
 import { NextResponse } from 'next/server'
 import { db } from '@/lib/db'
+import lessonBundle from '@/lib/services/lessonBundle'
 
 export const runtime = 'nodejs'
 export const dynamic = 'force-dynamic'
@@ -38,6 +39,8 @@ export async function PUT(request, { params }) {
       order: order || 1,
       updated_at: new Date().toISOString()
     })
+    lessonBundle.scheduleForSection(questionData.quiz_section_id)
+      .catch(error => console.error('Bundle schedule error:', error))
     
     return NextResponse.json({ success: true, question: questionData })
   } catch (error) {
@@ -53,6 +56,8 @@ export async function DELETE(request, { params }) {
   try {
     const { id } = params
     const question = await db.deleteQuizQuestion(id)
+    lessonBundle.scheduleForSection(question.quiz_section_id)
+      .catch(error => console.error('Bundle schedule error:', error))
     return NextResponse.json({ success: true, question })
   } catch (error) {
     console.error('Delete quiz question error:', error)
@@ -0,0 +1,55 @@
+import { NextResponse } from 'next/server'
+import { db } from '@/lib/db'
+import lessonBundle from '@/lib/services/lessonBundle'
+
+export const runtime = 'nodejs'
+export const dynamic = 'force-dynamic'
+
+const MAX_BATCH_ITEMS = 500
+
+// POST many question edits across one lesson's sections, applied atomically:
+// { lesson_id, questions: [{ id?, section_id?, question_type?, question?, answer?, order? }], deleted_question_ids?: [] }
+// Entries with an id are updated (a section_id moves the question), entries
+// without one are created and need section_id, question_type and question.
+export async function POST(request) {
+  try {
+    const body = await request.json()
+    const { lesson_id, questions = [], deleted_question_ids = [] } = body
+
+    if (!lesson_id) {
+      return NextResponse.json(
+        { error: 'lesson_id is required' },
+        { status: 400 }
+      )
+    }
+
+    if (!Array.isArray(questions) || !Array.isArray(deleted_question_ids) ||
+        !questions.every(question => question && typeof question === 'object')) {
+      return NextResponse.json(
+        { error: 'questions must be an array of objects and deleted_question_ids an array' },
+        { status: 400 }
+      )
+    }
+
+    if (questions.length + deleted_question_ids.length > MAX_BATCH_ITEMS) {
+      return NextResponse.json(
+        { error: `A batch can change at most ${MAX_BATCH_ITEMS} questions` },
+        { status: 400 }
+      )
+    }
+
+    const quiz = await db.saveQuizChanges(lesson_id, {
+      questions,
+      deletedQuestionIds: deleted_question_ids
+    })
+    lessonBundle.schedule(lesson_id, ['quiz'])
+
+    return NextResponse.json({ success: true, sections: quiz })
+  } catch (error) {
+    console.error('Batch quiz questions error:', error)
+    return NextResponse.json(
+      { error: error.message || 'Failed to save quiz questions' },
+      { status: error.status || 500 }
+    )
+  }
+}
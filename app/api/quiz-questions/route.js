@@ -1,5 +1,6 @@
 import { NextResponse } from 'next/server'
 import { db } from '@/lib/db'
+import lessonBundle from '@/lib/services/lessonBundle'
 
 export const runtime = 'nodejs'
 export const dynamic = 'force-dynamic'
@@ -47,6 +48,8 @@ export async function POST(request) {
       order: order || 1,
       active: true
     })
+    lessonBundle.scheduleForSection(questionData.quiz_section_id)
+      .catch(error => console.error('Bundle schedule error:', error))
     
     return NextResponse.json({ success: true, question: questionData })
   } catch (error) {
@@ -1,5 +1,6 @@
 import { NextResponse } from 'next/server'
 import { db } from '@/lib/db'
+import lessonBundle from '@/lib/services/lessonBundle'
 
 export const runtime = 'nodejs'
 export const dynamic = 'force-dynamic'
@@ -36,6 +37,7 @@ export async function PUT(request, { params }) {
       order,
       updated_at: new Date().toISOString()
     })
+    lessonBundle.schedule(section.lesson_id, ['quiz'])
     
     return NextResponse.json({ success: true, section })
   } catch (error) {
@@ -51,6 +53,7 @@ export async function DELETE(request, { params }) {
   try {
     const { id } = params
     const section = await db.deleteQuizSection(id)
+    lessonBundle.schedule(section.lesson_id, ['quiz'])
     return NextResponse.json({ success: true, section })
   } catch (error) {
     console.error('Delete quiz section error:', error)
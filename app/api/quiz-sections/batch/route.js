@@ -0,0 +1,63 @@
+import { NextResponse } from 'next/server'
+import { db } from '@/lib/db'
+import lessonBundle from '@/lib/services/lessonBundle'
+
+export const runtime = 'nodejs'
+export const dynamic = 'force-dynamic'
+
+const MAX_BATCH_ITEMS = 500
+
+// POST one lesson's quiz edits, applied atomically:
+// {
+//   lesson_id,
+//   sections: [{ id?, name?, order?, questions?: [{ id?, question_type?, question?, answer?, order? }] }],
+//   deleted_section_ids?: [], deleted_question_ids?: []
+// }
+// Entries with an id are updated (omitted fields are kept), entries without
+// one are created; reordering is [{ id, order }, ...].
+export async function POST(request) {
+  try {
+    const body = await request.json()
+    const { lesson_id, sections = [], deleted_section_ids = [], deleted_question_ids = [] } = body
+
+    if (!lesson_id) {
+      return NextResponse.json(
+        { error: 'lesson_id is required' },
+        { status: 400 }
+      )
+    }
+
+    if (![sections, deleted_section_ids, deleted_question_ids].every(Array.isArray) ||
+        !sections.every(section => section && typeof section === 'object' &&
+          (section.questions === undefined || Array.isArray(section.questions)))) {
+      return NextResponse.json(
+        { error: 'sections, sections[].questions, deleted_section_ids and deleted_question_ids must be arrays' },
+        { status: 400 }
+      )
+    }
+
+    const total = sections.reduce((sum, section) => sum + 1 + (section.questions?.length || 0), 0) +
+      deleted_section_ids.length + deleted_question_ids.length
+    if (total > MAX_BATCH_ITEMS) {
+      return NextResponse.json(
+        { error: `A batch can change at most ${MAX_BATCH_ITEMS} sections and questions` },
+        { status: 400 }
+      )
+    }
+
+    const quiz = await db.saveQuizChanges(lesson_id, {
+      sections,
+      deletedSectionIds: deleted_section_ids,
+      deletedQuestionIds: deleted_question_ids
+    })
+    lessonBundle.schedule(lesson_id, ['quiz'])
+
+    return NextResponse.json({ success: true, sections: quiz })
+  } catch (error) {
+    console.error('Batch quiz sections error:', error)
+    return NextResponse.json(
+      { error: error.message || 'Failed to save quiz sections' },
+      { status: error.status || 500 }
+    )
+  }
+}
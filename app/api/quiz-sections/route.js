@@ -1,5 +1,6 @@
 import { NextResponse } from 'next/server'
 import { db } from '@/lib/db'
+import lessonBundle from '@/lib/services/lessonBundle'
 
 export const runtime = 'nodejs'
 export const dynamic = 'force-dynamic'
@@ -16,7 +17,10 @@ export async function GET(request) {
       )
     }
 
-    const sections = await db.getQuizSections(lessonId)
+    // ?include=questions returns each section with its questions in the same query
+    const sections = searchParams.get('include') === 'questions'
+      ? await db.getQuizForLesson(lessonId)
+      : await db.getQuizSections(lessonId)
     return NextResponse.json({ success: true, sections })
   } catch (error) {
     console.error('Get quiz sections error:', error)
@@ -56,6 +60,7 @@ export async function POST(request) {
       num_questions: 0,
       active: true
     })
+    lessonBundle.schedule(section.lesson_id, ['quiz'])
     
     return NextResponse.json({ success: true, section })
   } catch (error) {
@@ -1,18 +1,30 @@
 import { NextResponse } from 'next/server'
 import { db } from '@/lib/db'
+import { jsonWithETag, listOptionsFromSearchParams } from '@/lib/http'
 
 export const runtime = 'nodejs'
 export const dynamic = 'force-dynamic'
 
-export async function GET() {
+export async function GET(request) {
   try {
-    const subjects = await db.getSubjects()
-    return NextResponse.json({ success: true, subjects })
+    const { searchParams } = new URL(request.url)
+    const filters = {
+      school_id: searchParams.get('school_id'),
+      curriculum_id: searchParams.get('curriculum_id'),
+      grade_id: searchParams.get('grade_id'),
+      book_id: searchParams.get('book_id')
+    }
+
+    const { items, nextCursor } = await db.listPage('subject', {
+      ...listOptionsFromSearchParams(searchParams),
+      filters
+    })
+    return jsonWithETag(request, { success: true, subjects: items, nextCursor })
   } catch (error) {
     console.error('Get subjects error:', error)
     return NextResponse.json(
       { error: error.message || 'Failed to fetch subjects' },
-      { status: 500 }
+      { status: error.status || 500 }
     )
   }
 }
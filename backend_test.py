@@ -8,15 +8,23 @@ import requests
 import json
 import sys
 import os
+import re
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Get base URL from environment
 BASE_URL = "https://learnbook-admin.preview.emergentagent.com/api"
 
 class APITester:
-    def __init__(self):
-        self.base_url = BASE_URL
+    def __init__(self, base_url=BASE_URL, verbose=True, metrics=None, rate_limiter=None):
+        self.base_url = base_url
         self.session = requests.Session()
+        self.verbose = verbose
+        self.metrics = metrics
+        self.rate_limiter = rate_limiter
         self.test_results = []
         self.created_entities = {
             'schools': [],
@@ -37,14 +45,23 @@ class APITester:
             'timestamp': datetime.now().isoformat()
         }
         self.test_results.append(result)
+        if not self.verbose:
+            return
         status = "✅ PASS" if success else "❌ FAIL"
         print(f"{status}: {test_name} - {message}")
         if details and not success:
             print(f"   Details: {details}")
     
-    def make_request(self, method, endpoint, data=None, params=None):
-        """Make HTTP request with error handling"""
+    def make_request(self, method, endpoint, data=None, params=None, expected_status=None):
+        """Make HTTP request with error handling
+
+        expected_status: status a deliberate rejection probe should get; any
+        other status is counted as an error in the load metrics
+        """
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        started = time.perf_counter()
         try:
             if method.upper() == 'GET':
                 response = self.session.get(url, params=params)
@@ -57,8 +74,12 @@ class APITester:
             else:
                 raise ValueError(f"Unsupported method: {method}")
             
+            if self.metrics:
+                self.metrics.record(method, endpoint, time.perf_counter() - started, response.status_code, expected_status)
             return response
         except Exception as e:
+            if self.metrics:
+                self.metrics.record(method, endpoint, time.perf_counter() - started, None, expected_status)
             return None, str(e)
     
     def test_schools_crud(self):
@@ -140,7 +161,7 @@ class APITester:
         
         # Test validation - missing required fields
         invalid_data = {"name": "Test School"}  # Missing state
-        response = self.make_request('POST', '/schools', invalid_data)
+        response = self.make_request('POST', '/schools', invalid_data, expected_status=400)
         if response and response.status_code == 400:
             self.log_result("Schools validation", True, "Correctly rejected invalid data (missing state)")
         else:
@@ -418,7 +439,7 @@ class APITester:
             "grade_id": grade_id
             # Missing book_id
         }
-        response = self.make_request('POST', '/subjects', invalid_subject_data)
+        response = self.make_request('POST', '/subjects', invalid_subject_data, expected_status=400)
         if response and response.status_code == 400:
             self.log_result("Subjects validation - missing book_id", True, "Correctly rejected subject without book_id")
         else:
@@ -464,7 +485,7 @@ class APITester:
                     "grade_id": grade_id
                     # Missing book_id
                 }
-                response = self.make_request('PUT', f'/subjects/{subject_id}', invalid_update_data)
+                response = self.make_request('PUT', f'/subjects/{subject_id}', invalid_update_data, expected_status=400)
                 if response and response.status_code == 400:
                     self.log_result("Subjects update validation - missing book_id", True, "Correctly rejected update without book_id")
                 else:
@@ -621,6 +642,201 @@ class APITester:
             if ids:
                 print(f"{entity_type}: {ids}")
 
+
+class RateLimiter:
+    """Spread requests evenly so all workers together stay at a target rate"""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class LoadMetrics:
+    """Thread-safe latency and error collection per endpoint"""
+    ID_SEGMENT = re.compile(r'^(\d+|[0-9a-f]{8}-[0-9a-f-]{27})$', re.IGNORECASE)
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+    
+    def endpoint_key(self, method, endpoint):
+        """Collapse ids so /schools/12 and /schools/34 share one bucket"""
+        parts = [
+            '{id}' if self.ID_SEGMENT.match(part) else part
+            for part in endpoint.strip('/').split('/')
+        ]
+        return f"{method.upper()} /{'/'.join(parts)}"
+    
+    def record(self, method, endpoint, elapsed, status_code, expected_status=None):
+        key = self.endpoint_key(method, endpoint)
+        if expected_status is not None:
+            failed = status_code != expected_status
+        else:
+            failed = status_code is None or status_code >= 400
+        with self.lock:
+            self.samples.setdefault(key, []).append(elapsed)
+            if failed:
+                self.errors[key] = self.errors.get(key, 0) + 1
+    
+    @staticmethod
+    def percentile(sorted_values, pct):
+        if not sorted_values:
+            return 0.0
+        index = max(0, int(round(pct / 100.0 * len(sorted_values))) - 1)
+        return sorted_values[min(index, len(sorted_values) - 1)]
+    
+    def summary(self, wall_time):
+        with self.lock:
+            samples = {key: sorted(values) for key, values in self.samples.items()}
+            errors = dict(self.errors)
+        
+        total_requests = sum(len(values) for values in samples.values())
+        total_errors = sum(errors.values())
+        endpoints = {}
+        for key, values in sorted(samples.items()):
+            endpoints[key] = {
+                'requests': len(values),
+                'errors': errors.get(key, 0),
+                'error_rate': errors.get(key, 0) / len(values),
+                'p50_ms': self.percentile(values, 50) * 1000,
+                'p95_ms': self.percentile(values, 95) * 1000,
+                'p99_ms': self.percentile(values, 99) * 1000
+            }
+        
+        return {
+            'wall_time_s': wall_time,
+            'total_requests': total_requests,
+            'total_errors': total_errors,
+            'error_rate': total_errors / total_requests if total_requests else 0.0,
+            'throughput_rps': total_requests / wall_time if wall_time > 0 else 0.0,
+            'endpoints': endpoints
+        }
+
+
+class LoadTester:
+    """Run the APITester CRUD scenarios from many concurrent workers"""
+    SCENARIOS = [
+        'test_schools_crud',
+        'test_grades_crud',
+        'test_curriculums_crud',
+        'test_books_crud',
+        'test_subjects_crud_with_validation',
+        'test_lessons_with_book_filter'
+    ]
+    
+    def __init__(self, base_url=BASE_URL, workers=4, rate=None, iterations=1, duration=None, scenarios=None):
+        self.base_url = base_url
+        self.workers = workers
+        self.iterations = iterations
+        self.duration = duration
+        self.scenarios = scenarios or self.SCENARIOS
+        self.metrics = LoadMetrics()
+        self.rate_limiter = RateLimiter(rate)
+        self.created_entities = {}
+        self.lock = threading.Lock()
+    
+    def worker(self, worker_id, deadline):
+        iteration = 0
+        while True:
+            if self.duration is not None:
+                if time.monotonic() >= deadline:
+                    break
+            elif iteration >= self.iterations:
+                break
+            
+            # Fresh tester per iteration: scenarios chain on the entities they create
+            tester = APITester(
+                base_url=self.base_url,
+                verbose=False,
+                metrics=self.metrics,
+                rate_limiter=self.rate_limiter
+            )
+            for scenario in self.scenarios:
+                try:
+                    getattr(tester, scenario)()
+                except Exception as e:
+                    tester.log_result(f"{scenario} (worker {worker_id})", False, str(e))
+            
+            with self.lock:
+                for entity_type, ids in tester.created_entities.items():
+                    self.created_entities.setdefault(entity_type, []).extend(ids)
+            iteration += 1
+    
+    def run(self):
+        print(f"Starting load run against {self.base_url}")
+        print(f"Workers: {self.workers}, target rate: "
+              f"{1.0 / self.rate_limiter.interval if self.rate_limiter.interval else 'unlimited'} req/s")
+        print("=" * 60)
+        
+        started = time.monotonic()
+        deadline = started + (self.duration or 0)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.worker, i, deadline) for i in range(self.workers)]
+            for future in futures:
+                future.result()
+        
+        return self.metrics.summary(time.monotonic() - started)
+    
+    def print_report(self, report):
+        print("\n" + "=" * 60)
+        print("LOAD TEST SUMMARY")
+        print("=" * 60)
+        print(f"Wall time: {report['wall_time_s']:.1f}s")
+        print(f"Requests: {report['total_requests']} ({report['throughput_rps']:.1f} req/s)")
+        print(f"Errors: {report['total_errors']} ({report['error_rate'] * 100:.1f}%)")
+        print()
+        print(f"{'ENDPOINT':<32} {'REQS':>6} {'ERR%':>6} {'P50ms':>8} {'P95ms':>8} {'P99ms':>8}")
+        for key, stats in report['endpoints'].items():
+            print(f"{key:<32} {stats['requests']:>6} {stats['error_rate'] * 100:>6.1f} "
+                  f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+        
+        print("\nCREATED ENTITIES (for cleanup):")
+        for entity_type, ids in self.created_entities.items():
+            if ids:
+                print(f"{entity_type}: {ids}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--base-url', default=BASE_URL, help='API base URL')
+    parser.add_argument('--load', action='store_true', help='Run the CRUD scenarios as a concurrent load test')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent workers in load mode')
+    parser.add_argument('--rate', type=float, default=None, help='Target requests/second across all workers')
+    parser.add_argument('--iterations', type=int, default=1, help='Scenario passes per worker')
+    parser.add_argument('--duration', type=float, default=None, help='Run for this many seconds instead of --iterations')
+    parser.add_argument('--scenarios', nargs='+', choices=LoadTester.SCENARIOS, help='Subset of scenarios to run')
+    parser.add_argument('--report', help='Write the load report as JSON to this path')
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    tester = APITester()
-    tester.run_all_tests()
\ No newline at end of file
+    args = parse_args()
+    if args.load:
+        load_tester = LoadTester(
+            base_url=args.base_url,
+            workers=args.workers,
+            rate=args.rate,
+            iterations=args.iterations,
+            duration=args.duration,
+            scenarios=args.scenarios
+        )
+        report = load_tester.run()
+        load_tester.print_report(report)
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(report, f, indent=2)
+    else:
+        tester = APITester(base_url=args.base_url)
+        tester.run_all_tests()
\ No newline at end of file
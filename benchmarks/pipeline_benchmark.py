@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the lesson processing pipeline.
+
+Starts the local service stand-ins (benchmarks/standins.py), optionally starts
+the Next.js app pointed at them, then uploads and processes N synthetic
+lessons through /api/lessons/upload and /api/lessons/process. Records
+lessons/hour, per-stage time, provider call counts and the app's peak memory,
+and compares the result with a saved JSON baseline.
+
+The app reads its Supabase URL at build time, so build it against the
+stand-ins first:
+
+    python -m benchmarks.pipeline_benchmark --print-env > .env.benchmark
+    env $(cat .env.benchmark | xargs) yarn build
+    python -m benchmarks.pipeline_benchmark --start-server --lessons 20 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.pipeline_benchmark --start-server --lessons 20 --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+from benchmarks.standins import DEFAULT_PROFILES, SERVICES, ServiceProfile, start_standins
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+STAGES = ['pdf_extraction', 'ocr_processing', 'ai_segmentation', 'tts_generation', 'database_save']
+
+# Metrics compared against the baseline, and whether higher is better
+BASELINE_METRICS = {
+    'lessons_per_hour': True,
+    'lesson_p50_s': False,
+    'lesson_p95_s': False,
+    'peak_rss_mb': False,
+    **{f'stage_{stage}_p50_ms': False for stage in STAGES}
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, int(round(pct / 100.0 * len(ordered))) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def synthetic_pdf(pages):
+    """Minimal multi-page PDF; the pipeline only needs a valid upload"""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>']
+    kids = ' '.join(f'{3 + i} 0 R' for i in range(pages))
+    objects.append(f'<< /Type /Pages /Kids [{kids}] /Count {pages} >>')
+    objects += ['<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>'] * pages
+
+    out = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n{body}\nendobj\n'.encode()
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    out += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode()
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return out
+
+
+class MemorySampler:
+    """Peak resident memory of a process and its children, sampled from /proc"""
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak_bytes = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    @staticmethod
+    def children(pid):
+        try:
+            tasks = Path(f'/proc/{pid}/task').iterdir()
+            return [int(child) for task in tasks for child in (task / 'children').read_text().split()]
+        except OSError:
+            return []
+
+    def rss(self):
+        total = 0
+        pending = [self.pid]
+        while pending:
+            pid = pending.pop()
+            try:
+                status = Path(f'/proc/{pid}/status').read_text()
+            except OSError:
+                continue
+            match = re.search(r'^VmRSS:\s+(\d+) kB', status, re.M)
+            total += int(match.group(1)) * 1024 if match else 0
+            pending.extend(self.children(pid))
+        return total
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.peak_bytes = max(self.peak_bytes, self.rss())
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        if Path(f'/proc/{self.pid}').exists():
+            self.thread.start()
+        else:
+            print(f"Memory sampling unavailable for pid {self.pid} (needs /proc)")
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        return self.peak_bytes
+
+
+class PipelineBenchmark:
+    """Drive N lessons through upload and processing and collect timings"""
+    def __init__(self, app_url, lessons=10, concurrency=4, pages=5, poll_interval=0.5, timeout=900):
+        self.api = f"{app_url.rstrip('/')}/api"
+        self.lessons = lessons
+        self.concurrency = concurrency
+        self.pages = pages
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.results = []
+        self.lock = threading.Lock()
+
+    def request(self, method, endpoint, **kwargs):
+        response = self.session.request(method, f"{self.api}/{endpoint.lstrip('/')}", timeout=60, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {endpoint} -> {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    def wait_until_ready(self, deadline=120):
+        started = time.monotonic()
+        while time.monotonic() - started < deadline:
+            try:
+                self.session.get(f"{self.api}/schools", params={'limit': 1}, timeout=5)
+                return
+            except requests.RequestException:
+                time.sleep(1)
+        raise RuntimeError(f"App at {self.api} did not answer within {deadline}s")
+
+    def create_book(self):
+        book = self.request('POST', '/books', json={'title': f'Benchmark Book {datetime.now():%Y%m%d%H%M%S}'})
+        return book['book']['id']
+
+    def run_lesson(self, book_id, index):
+        result = {'index': index, 'status': 'failed', 'stages': {}, 'error': None}
+        started = time.monotonic()
+        try:
+            lesson = self.request('POST', '/lessons', json={
+                'book_id': book_id,
+                'lesson_number': index + 1,
+                'name': f'Benchmark Lesson {index + 1}'
+            })['lesson']
+            result['lesson_id'] = lesson['id']
+
+            upload_started = time.monotonic()
+            self.request('POST', '/lessons/upload', data={'lessonId': str(lesson['id'])}, files={
+                'pdf': (f'lesson-{index + 1}.pdf', synthetic_pdf(self.pages), 'application/pdf')
+            })
+            result['upload_s'] = time.monotonic() - upload_started
+
+            self.request('POST', '/lessons/process', json={'lessonId': lesson['id']})
+            while time.monotonic() - started < self.timeout:
+                status = self.request('GET', '/lessons/process', params={'lessonId': lesson['id']})
+                if status.get('status') in ('completed', 'failed'):
+                    result['status'] = status['status']
+                    result['error'] = status.get('error')
+                    metadata = status.get('metadata') or {}
+                    result['stages'] = {span['stage']: span['durationMs'] for span in metadata.get('stageTimings') or []}
+                    result['attempts'] = status.get('attempts')
+                    break
+                time.sleep(self.poll_interval)
+            else:
+                result['error'] = f'Timed out after {self.timeout}s'
+        except Exception as e:
+            result['error'] = str(e)
+
+        result['total_s'] = time.monotonic() - started
+        with self.lock:
+            self.results.append(result)
+            done = len(self.results)
+        print(f"[{done}/{self.lessons}] lesson {index + 1}: {result['status']} in {result['total_s']:.1f}s"
+              + (f" ({result['error']})" if result['error'] else ''))
+        return result
+
+    def run(self):
+        self.wait_until_ready()
+        book_id = self.create_book()
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(lambda index: self.run_lesson(book_id, index), range(self.lessons)))
+        return time.monotonic() - started
+
+    def scrape_metrics(self):
+        """Provider call counts from the app's /api/metrics, if it is reachable"""
+        try:
+            text = self.session.get(f"{self.api}/metrics", timeout=10).text
+        except requests.RequestException:
+            return {}
+        calls = {}
+        pattern = r'^service_call_duration_seconds_(count|sum)\{service="(\w+)",operation="([\w-]+)",outcome="(\w+)"\} ([\d.e+-]+)$'
+        for kind, service, operation, outcome, value in re.findall(pattern, text, re.M):
+            entry = calls.setdefault(f'{service}.{operation}.{outcome}', {'count': 0, 'sum_s': 0.0})
+            entry['count' if kind == 'count' else 'sum_s'] = float(value)
+        return {
+            key: {'count': int(entry['count']), 'mean_ms': entry['sum_s'] / entry['count'] * 1000 if entry['count'] else 0.0}
+            for key, entry in sorted(calls.items())
+        }
+
+
+def summarize(results, wall_time, peak_bytes, config, standin_stats, provider_calls):
+    completed = [r for r in results if r['status'] == 'completed']
+    totals = [r['total_s'] for r in completed]
+    summary = {
+        'lessons': len(results),
+        'completed': len(completed),
+        'failed': len(results) - len(completed),
+        'wall_time_s': wall_time,
+        'lessons_per_hour': len(completed) / wall_time * 3600 if wall_time > 0 else 0.0,
+        'lesson_p50_s': percentile(totals, 50),
+        'lesson_p95_s': percentile(totals, 95),
+        'peak_rss_mb': peak_bytes / (1024 * 1024) if peak_bytes else None
+    }
+    for stage in STAGES:
+        durations = [r['stages'][stage] for r in completed if stage in r['stages']]
+        summary[f'stage_{stage}_p50_ms'] = percentile(durations, 50)
+        summary[f'stage_{stage}_p95_ms'] = percentile(durations, 95)
+
+    return {
+        'recorded_at': datetime.now().isoformat(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'config': config,
+        'summary': summary,
+        'standins': standin_stats,
+        'provider_calls': provider_calls,
+        'lessons': sorted(results, key=lambda r: r['index'])
+    }
+
+
+def compare_with_baseline(report, baseline, tolerance):
+    """Metrics that got worse than the baseline by more than `tolerance`"""
+    regressions = []
+    print(f"\n{'METRIC':<36} {'BASELINE':>12} {'CURRENT':>12} {'CHANGE':>8}")
+    for metric, higher_is_better in BASELINE_METRICS.items():
+        before = baseline['summary'].get(metric)
+        after = report['summary'].get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        flag = '  REGRESSION' if worse > tolerance else ''
+        print(f"{metric:<36} {before:>12.1f} {after:>12.1f} {change * 100:>7.1f}%{flag}")
+        if flag:
+            regressions.append(metric)
+    return regressions
+
+
+def print_report(report):
+    summary = report['summary']
+    print("\n" + "=" * 60)
+    print("PIPELINE BENCHMARK SUMMARY")
+    print("=" * 60)
+    print(f"Lessons: {summary['completed']}/{summary['lessons']} completed in {summary['wall_time_s']:.1f}s")
+    print(f"Throughput: {summary['lessons_per_hour']:.1f} lessons/hour")
+    print(f"Lesson time: p50 {summary['lesson_p50_s']:.1f}s, p95 {summary['lesson_p95_s']:.1f}s")
+    if summary['peak_rss_mb'] is not None:
+        print(f"Peak app memory: {summary['peak_rss_mb']:.0f} MB")
+    print(f"\n{'STAGE':<20} {'P50ms':>10} {'P95ms':>10}")
+    for stage in STAGES:
+        print(f"{stage:<20} {summary[f'stage_{stage}_p50_ms']:>10.0f} {summary[f'stage_{stage}_p95_ms']:>10.0f}")
+    print(f"\n{'STAND-IN':<12} {'REQS':>8} {'ERRORS':>8} {'429s':>8}")
+    for service, counts in report['standins'].items():
+        print(f"{service:<12} {counts['requests']:>8} {counts['errors']:>8} {counts['throttled']:>8}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app-url', default='http://localhost:3000', help='Base URL of the running app')
+    parser.add_argument('--start-server', action='store_true', help='Start the app with `next start` against the stand-ins')
+    parser.add_argument('--server-cmd', default='npx next start -p 3000', help='Command used by --start-server')
+    parser.add_argument('--server-pid', type=int, help='Sample memory of an already running app process')
+    parser.add_argument('--standin-host', default='127.0.0.1')
+    parser.add_argument('--standin-port', type=int, default=54321)
+    parser.add_argument('--print-env', action='store_true', help='Print the app environment for the stand-ins and exit')
+    parser.add_argument('--lessons', type=int, default=10, help='Synthetic lessons to process')
+    parser.add_argument('--concurrency', type=int, default=4, help='Lessons in flight at once')
+    parser.add_argument('--pages', type=int, default=5, help='Pages per synthetic PDF')
+    parser.add_argument('--timeout', type=float, default=900, help='Seconds to wait for one lesson')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for stand-in jitter, failures and content')
+    for service in SERVICES:
+        profile = DEFAULT_PROFILES[service]
+        parser.add_argument(f'--{service}-latency-ms', type=float, default=profile.latency_ms)
+        parser.add_argument(f'--{service}-jitter-ms', type=float, default=profile.jitter_ms)
+        parser.add_argument(f'--{service}-error-rate', type=float, default=profile.error_rate)
+        parser.add_argument(f'--{service}-rate-limit', type=float, default=profile.rate_limit,
+                            help=f'{service} requests/second before 429s (0 = unlimited)')
+    parser.add_argument('--report', help='Write the full report as JSON to this path')
+    parser.add_argument('--save-baseline', help='Write the report as the new baseline to this path')
+    parser.add_argument('--baseline', help='Compare with this baseline; exits 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative regression (0.1 = 10%%)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    profiles = {
+        service: ServiceProfile(
+            latency_ms=getattr(args, f'{service}_latency_ms'),
+            jitter_ms=getattr(args, f'{service}_jitter_ms'),
+            error_rate=getattr(args, f'{service}_error_rate'),
+            rate_limit=getattr(args, f'{service}_rate_limit')
+        )
+        for service in SERVICES
+    }
+
+    standins = start_standins(args.standin_host, args.standin_port, profiles=profiles, seed=args.seed)
+    if args.print_env:
+        for name, value in standins.app_env().items():
+            print(f'{name}={value}')
+        standins.shutdown()
+        return 0
+    print(f"Stand-ins listening on {standins.base_url}")
+
+    server = None
+    pid = args.server_pid
+    if args.start_server:
+        server = subprocess.Popen(args.server_cmd, shell=True, cwd=REPO_ROOT, env={**os.environ, **standins.app_env()},
+                                  start_new_session=True)
+        pid = server.pid
+    sampler = MemorySampler(pid).start() if pid else None
+
+    benchmark = PipelineBenchmark(args.app_url, lessons=args.lessons, concurrency=args.concurrency,
+                                  pages=args.pages, timeout=args.timeout)
+    try:
+        wall_time = benchmark.run()
+        provider_calls = benchmark.scrape_metrics()
+    finally:
+        peak_bytes = sampler.stop() if sampler else 0
+        if server:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait(timeout=30)
+        standins.shutdown()
+
+    config = {
+        'lessons': args.lessons,
+        'concurrency': args.concurrency,
+        'pages': args.pages,
+        'seed': args.seed,
+        'profiles': {service: profile.to_dict() for service, profile in profiles.items()}
+    }
+    report = summarize(benchmark.results, wall_time, peak_bytes, config, standins.stats.snapshot(), provider_calls)
+    print_report(report)
+
+    for path in filter(None, [args.report, args.save_baseline]):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != config:
+            print("\nWarning: baseline was recorded with a different configuration")
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressed beyond {args.tolerance * 100:.0f}%: {', '.join(regressions)}")
+            return 1
+    return 0 if report['summary']['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,876 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the services the lesson pipeline talks to:
+
+- Supabase REST (the PostgREST subset lib/db.js uses, plus the
+  claim_processing_job and save_lesson_topics functions) and Storage
+  (uploads, TUS resumable uploads, downloads, list, move, copy, remove)
+- Google Vision images:annotate
+- OpenAI chat completions (segmentation and image mapping prompts)
+- ElevenLabs text-to-speech
+
+Everything is served from one HTTP server and kept in memory. Each service
+has a latency/jitter/error-rate/rate-limit profile so a benchmark can model
+slow or throttled providers without calling them.
+"""
+
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / 'SUPABASE_SCHEMA.sql'
+
+# Tables the app creates outside SUPABASE_SCHEMA.sql; rows default to active
+ENTITY_TABLES = {
+    'school', 'curriculum', 'grade', 'subject', 'book', 'lesson',
+    'lesson_topic', 'quiz_section', 'quiz_question'
+}
+
+# Only bundles are read back by the app; other objects keep their size only
+RETAINED_BUCKETS = {'lesson-bundles'}
+
+SERVICES = ('supabase', 'ocr', 'llm', 'tts')
+
+# select=alias:table(columns) embeds related rows, as PostgREST does
+EMBED_PATTERN = re.compile(r'^(?:(\w+):)?(\w+)\((.*)\)$')
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+@dataclass
+class ServiceProfile:
+    """How a stand-in service behaves under load"""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rate_limit: float = 0.0  # Requests/second before answering 429; 0 = unlimited
+
+    def to_dict(self):
+        return {
+            'latency_ms': self.latency_ms,
+            'jitter_ms': self.jitter_ms,
+            'error_rate': self.error_rate,
+            'rate_limit': self.rate_limit
+        }
+
+
+DEFAULT_PROFILES = {
+    'supabase': ServiceProfile(latency_ms=5, jitter_ms=2),
+    'ocr': ServiceProfile(latency_ms=800, jitter_ms=200, rate_limit=10),
+    'llm': ServiceProfile(latency_ms=2500, jitter_ms=800),
+    'tts': ServiceProfile(latency_ms=400, jitter_ms=150, rate_limit=20)
+}
+
+
+class TokenBucket:
+    """Non-blocking limiter: callers over the rate are told how long to wait"""
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Take a token; returns 0 on success, else seconds until one is free"""
+        if not self.rate:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+class ServiceStats:
+    """Per-service request counters, reported alongside the benchmark results"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {service: {'requests': 0, 'errors': 0, 'throttled': 0} for service in SERVICES}
+
+    def record(self, service, outcome):
+        with self.lock:
+            self.counts[service]['requests'] += 1
+            if outcome in ('errors', 'throttled'):
+                self.counts[service][outcome] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.counts))
+
+
+# ---------------------------------------------------------------------------
+# In-memory PostgREST
+# ---------------------------------------------------------------------------
+
+def parse_schema_defaults(path=SCHEMA_PATH):
+    """Column defaults per table from SUPABASE_SCHEMA.sql (literals and NOW() only)"""
+    defaults = {}
+    if not path.exists():
+        return defaults
+    sql = path.read_text()
+
+    literal = r"(NOW\(\)|'(?:[^']*)'(?:::\w+)?|-?\d+(?:\.\d+)?|true|false)"
+    for match in re.finditer(r'CREATE TABLE IF NOT EXISTS (\w+) \((.*?)\n\);', sql, re.S):
+        table, body = match.groups()
+        for column in re.finditer(rf'^\s*"?(\w+)"?\s+[\w ()]+?\s+DEFAULT\s+{literal}', body, re.M | re.I):
+            defaults.setdefault(table, {})[column.group(1)] = column.group(2)
+    for match in re.finditer(rf'ALTER TABLE (\w+) ADD COLUMN IF NOT EXISTS (\w+) [\w ()]+? DEFAULT {literal}', sql, re.I):
+        table, column, value = match.groups()
+        defaults.setdefault(table, {})[column] = value
+    return defaults
+
+
+def default_value(literal):
+    if literal.upper() == 'NOW()':
+        return now_iso()
+    if literal.startswith("'"):
+        text = literal[1:literal.rindex("'")]
+        return json.loads(text) if literal.endswith('::jsonb') else text
+    if literal in ('true', 'false'):
+        return literal == 'true'
+    return float(literal) if '.' in literal else int(literal)
+
+
+def split_top_level(text, sep=','):
+    """Split on separators outside parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if char == sep and depth == 0 and not quoted:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def coerce(value, sample):
+    """Convert a filter string to the type of the row value it is compared with"""
+    if value is None or sample is None:
+        return value
+    if isinstance(sample, bool):
+        return value in ('true', True)
+    if isinstance(sample, int):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    if isinstance(sample, float):
+        return float(value)
+    return value
+
+
+def unquote_value(value):
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return value
+
+
+def compare(row_value, op, raw):
+    if op == 'is':
+        return row_value is None if raw == 'null' else row_value == (raw == 'true')
+    if op == 'in':
+        options = [unquote_value(v) for v in split_top_level(raw.strip('()'))]
+        return row_value in [coerce(v, row_value) for v in options]
+    value = coerce(unquote_value(raw), row_value)
+    if row_value is None:
+        return op == 'neq' and value is not None
+    try:
+        return {
+            'eq': row_value == value,
+            'neq': row_value != value,
+            'gt': row_value > value,
+            'gte': row_value >= value,
+            'lt': row_value < value,
+            'lte': row_value <= value
+        }[op]
+    except TypeError:
+        return False
+
+
+def parse_order(value):
+    """order=col.desc.nullsfirst,... -> [(column, descending, nulls_first)]"""
+    terms = []
+    for term in value.split(','):
+        parts = term.split('.')
+        terms.append((parts[0], 'desc' in parts[1:], 'nullsfirst' in parts[1:]))
+    return terms
+
+
+def condition(expression):
+    """Predicate for one or/and expression: col.op.value, or(...) and and(...)"""
+    for group in ('or', 'and'):
+        if expression.startswith(f'{group}(') and expression.endswith(')'):
+            parts = [condition(part) for part in split_top_level(expression[len(group) + 1:-1])]
+            return (lambda row: any(p(row) for p in parts)) if group == 'or' else \
+                (lambda row: all(p(row) for p in parts))
+    column, op, raw = expression.split('.', 2)
+    negate = False
+    if op == 'not':
+        op, raw = raw.split('.', 1)
+        negate = True
+    return lambda row: compare(row.get(column), op, raw) != negate
+
+
+class Database:
+    """Tables of rows keyed by table name, guarded by one lock"""
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables = {}
+        self.sequences = {}
+        self.defaults = parse_schema_defaults()
+
+    def table(self, name):
+        return self.tables.setdefault(name, [])
+
+    def new_row(self, table, values):
+        row = {}
+        for column, literal in self.defaults.get(table, {}).items():
+            row[column] = default_value(literal)
+        row.setdefault('created_at', now_iso())
+        row.setdefault('updated_at', row['created_at'])
+        if table in ENTITY_TABLES:
+            row.setdefault('active', True)
+        row.update(values)
+        if row.get('id') is None:
+            self.sequences[table] = self.sequences.get(table, 0) + 1
+            row['id'] = self.sequences[table]
+        return row
+
+    def select(self, table, filters, order=None, limit=None, offset=0):
+        rows = [row for row in self.table(table) if all(f(row) for f in filters)]
+        for column, descending, nulls_first in reversed(order or []):
+            rows.sort(key=lambda row: (
+                (row.get(column) is None) != nulls_first,
+                row.get(column) if row.get(column) is not None else 0
+            ), reverse=descending)
+        rows = rows[offset:]
+        return rows[:limit] if limit is not None else rows
+
+    def insert(self, table, values_list, on_conflict=None, merge=False):
+        inserted = []
+        rows = self.table(table)
+        for values in values_list:
+            existing = None
+            if on_conflict:
+                existing = next((row for row in rows if all(
+                    str(row.get(column)) == str(values.get(column)) for column in on_conflict
+                )), None)
+            if existing is not None:
+                if merge:
+                    existing.update(values)
+                    existing['updated_at'] = values.get('updated_at', now_iso())
+                inserted.append(existing)
+                continue
+            row = self.new_row(table, values)
+            rows.append(row)
+            inserted.append(row)
+        return inserted
+
+    # Functions defined in SUPABASE_SCHEMA.sql
+
+    def claim_processing_job(self, p_worker_id, p_lease_seconds, p_max_running):
+        jobs = self.table('processing_jobs')
+        now = now_iso()
+        for job in jobs:
+            if job.get('status') == 'processing' and (job.get('lease_expires_at') or '') < now:
+                exhausted = job.get('attempts', 0) >= job.get('max_attempts', 3)
+                backoff = min(600, 30 * 2 ** max(job.get('attempts', 0) - 1, 0))
+                job.update({
+                    'status': 'failed' if exhausted else 'pending',
+                    'stage': 'error' if exhausted else 'queued',
+                    'error': 'Worker lease expired' if exhausted else job.get('error'),
+                    'locked_by': None,
+                    'lease_expires_at': None,
+                    'not_before': (datetime.now(timezone.utc) + timedelta(seconds=backoff))
+                        .isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+                    'updated_at': now
+                })
+
+        if sum(1 for job in jobs if job.get('status') == 'processing') >= p_max_running:
+            return []
+        pending = sorted(
+            (job for job in jobs if job.get('status') == 'pending' and (job.get('not_before') or '') <= now),
+            key=lambda job: job['created_at']
+        )
+        if not pending:
+            return []
+
+        job = pending[0]
+        lease = datetime.now(timezone.utc) + timedelta(seconds=p_lease_seconds)
+        job.update({
+            'status': 'processing',
+            'locked_by': p_worker_id,
+            'lease_expires_at': lease.isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'heartbeat_at': now,
+            'started_at': job.get('started_at') or now,
+            'attempts': job.get('attempts', 0) + 1,
+            'updated_at': now
+        })
+        return [job]
+
+    def save_lesson_topics(self, p_lesson_id, p_topics):
+        lesson_id = int(p_lesson_id)
+        topic_ids = {topic['topic_id'] for topic in p_topics}
+        self.insert('lesson_topic', [{
+            'lesson_id': lesson_id,
+            'topic_id': topic['topic_id'],
+            'topic': topic.get('topic'),
+            'subtopic': topic.get('subtopic'),
+            'order': topic.get('order'),
+            'simplified_explanation': topic.get('simplified_explanation'),
+            'active': True
+        } for topic in p_topics], on_conflict=['lesson_id', 'topic_id'], merge=True)
+
+        for row in self.table('lesson_topic'):
+            if row['lesson_id'] == lesson_id and row.get('active') and row['topic_id'] not in topic_ids:
+                row.update({'active': False, 'updated_at': now_iso()})
+        for row in self.table('lesson'):
+            if row['id'] == lesson_id:
+                row.update({'num_topics': len(p_topics), 'updated_at': now_iso()})
+
+        topics = [row for row in self.table('lesson_topic') if row['lesson_id'] == lesson_id and row.get('active')]
+        return sorted(topics, key=lambda row: row.get('order') or 0)
+
+
+# ---------------------------------------------------------------------------
+# Provider stand-ins
+# ---------------------------------------------------------------------------
+
+WORDS = (
+    'energy matter plants water light cells heat force motion earth soil air '
+    'rock weather animals food chain habitat growth change system sound mass '
+    'volume density current circuit magnet surface pressure climate river'
+).split()
+
+
+class ContentGenerator:
+    """Synthetic page text. Every page is unique, so the app's LLM and TTS
+    caches see the same miss rate as with real books."""
+    def __init__(self, seed, paragraphs_per_page=4, words_per_paragraph=60):
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.pages = 0
+        self.paragraphs_per_page = paragraphs_per_page
+        self.words_per_paragraph = words_per_paragraph
+
+    def page(self):
+        with self.lock:
+            self.pages += 1
+            number = self.pages
+            paragraphs = [
+                ' '.join(self.random.choice(WORDS) for _ in range(self.words_per_paragraph)).capitalize() + '.'
+                for _ in range(self.paragraphs_per_page)
+            ]
+        heading = f'{number}. Section {number}'
+        return heading, [f'{paragraph} (page {number}, part {i + 1})' for i, paragraph in enumerate(paragraphs)]
+
+
+def vision_response(heading, paragraphs):
+    """images:annotate response with one text block per paragraph and one picture"""
+    def block(kind, text, y, height):
+        vertices = [{'x': 100, 'y': y}, {'x': 1500, 'y': y}, {'x': 1500, 'y': y + height}, {'x': 100, 'y': y + height}]
+        words = [{'symbols': [{'text': char} for char in word]} for word in text.split()]
+        return {
+            'blockType': kind,
+            'confidence': 0.97,
+            'boundingBox': {'vertices': vertices},
+            'paragraphs': [{'words': words}] if words else []
+        }
+
+    blocks = [block('TEXT', heading, 80, 60)]
+    y = 180
+    for index, paragraph in enumerate(paragraphs):
+        blocks.append(block('TEXT', paragraph, y, 240))
+        y += 260
+        if index == 0:
+            blocks.append(block('PICTURE', '', y, 400))
+            y += 420
+
+    return {'responses': [{'fullTextAnnotation': {
+        'text': '\n\n'.join([heading] + paragraphs),
+        'pages': [{'confidence': 0.96, 'blocks': blocks}]
+    }}]}
+
+
+HEADING = re.compile(r'^(\d+(\.\d+)*[.)]?\s+[A-Z]|(Chapter|Unit|Lesson|Section)\b)')
+
+
+def segmentation_answer(prompt):
+    """Topics per heading and segments per paragraph, like lib/services/localModel.js"""
+    match = re.search(r'Content:\n(.*)\n\nReturn as JSON', prompt, re.S)
+    content = match.group(1) if match else ''
+    topics = []
+    for paragraph in (p.strip() for p in re.split(r'\n\s*\n', content)):
+        if not paragraph:
+            continue
+        first, _, rest = paragraph.partition('\n')
+        if HEADING.match(first):
+            topics.append({'topic': first, 'subtopic': None, 'order': len(topics) + 1, 'pages': [], 'segments': []})
+            paragraph = rest.strip()
+        elif not topics:
+            topics.append({'topic': 'Introduction', 'subtopic': None, 'order': 1, 'pages': [], 'segments': []})
+        if paragraph:
+            sentence = re.match(r'^.*?[.!?](\s|$)', paragraph)
+            topics[-1]['segments'].append({
+                'originalText': paragraph,
+                'text': (sentence.group(0) if sentence else paragraph).strip()[:200]
+            })
+    return {'topics': [topic for topic in topics if topic['segments']]}
+
+
+def image_mapping_answer(prompt):
+    segments = re.findall(r'^\[(\d+)\.(\d+)\] ', prompt, re.M)
+    images = re.findall(r'^\[(\d+)\] \(page', prompt, re.M)
+    if not images or not segments:
+        return {'assignments': []}
+    return {'assignments': [
+        {'topic': int(segments[i % len(segments)][0]), 'segment': int(segments[i % len(segments)][1]), 'image': int(image)}
+        for i, image in enumerate(images)
+    ]}
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, profiles=None, seed=0):
+        super().__init__(address, StandInHandler)
+        self.profiles = {**DEFAULT_PROFILES, **(profiles or {})}
+        self.limiters = {service: TokenBucket(profile.rate_limit) for service, profile in self.profiles.items()}
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.stats = ServiceStats()
+        self.db = Database()
+        self.objects = {}  # (bucket, path) -> {'body', 'size', 'content_type', 'updated_at'}
+        self.uploads = {}  # TUS upload id -> {'bucket', 'path', 'length', 'offset', 'content_type'}
+        self.content = ContentGenerator(seed)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def app_env(self):
+        """Environment for the Next.js app so every external call lands here"""
+        return {
+            'NEXT_PUBLIC_SUPABASE_URL': self.base_url,
+            'NEXT_PUBLIC_SUPABASE_ANON_KEY': 'stand-in-anon-key',
+            'SUPABASE_SERVICE_ROLE_KEY': 'stand-in-service-key',
+            'OCR_PROVIDER': 'vision',
+            'GOOGLE_VISION_BASE_URL': self.base_url,
+            'GOOGLE_CLOUD_VISION_API_KEY': 'stand-in',
+            'LLM_PROVIDER': 'openai',
+            'OPENAI_BASE_URL': f'{self.base_url}/v1',
+            'OPENAI_API_KEY': 'stand-in',
+            'TTS_PROVIDER': 'elevenlabs',
+            'ELEVENLABS_BASE_URL': self.base_url,
+            'ELEVENLABS_API_KEY': 'stand-in'
+        }
+
+    def delay(self, service):
+        profile = self.profiles[service]
+        with self.random_lock:
+            jitter = self.random.uniform(-profile.jitter_ms, profile.jitter_ms) if profile.jitter_ms else 0
+            failed = self.random.random() < profile.error_rate
+        seconds = max(0.0, profile.latency_ms + jitter) / 1000
+        return seconds, failed
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    # -- plumbing ----------------------------------------------------------
+
+    def body(self):
+        length = int(self.headers.get('content-length') or 0)
+        if length:
+            return self.rfile.read(length)
+        if self.headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip() or b'0', 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b''.join(chunks)
+        return b''
+
+    def json_body(self):
+        raw = self.body()
+        return json.loads(raw) if raw else None
+
+    def send(self, status, payload=None, headers=None, content_type='application/json'):
+        data = b''
+        if payload is not None:
+            data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        if payload is not None:
+            self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if data and self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def service_for(self, path):
+        if path.startswith('/v1/images:annotate'):
+            return 'ocr'
+        if path.startswith('/v1/chat/completions'):
+            return 'llm'
+        if path.startswith('/v1/text-to-speech'):
+            return 'tts'
+        return 'supabase'
+
+    def handle_any(self):
+        url = urlsplit(self.path)
+        service = self.service_for(url.path)
+        server = self.server
+
+        retry_after = server.limiters[service].take()
+        if retry_after:
+            self.body()
+            server.stats.record(service, 'throttled')
+            self.send(429, {'error': 'rate limited'}, {'Retry-After': f'{retry_after:.3f}'})
+            return
+
+        seconds, failed = server.delay(service)
+        time.sleep(seconds)
+        if failed:
+            self.body()
+            server.stats.record(service, 'errors')
+            self.send(503, {'error': 'injected failure'})
+            return
+        server.stats.record(service, 'ok')
+
+        try:
+            if service == 'ocr':
+                self.body()
+                self.send(200, vision_response(*server.content.page()))
+            elif service == 'llm':
+                self.chat_completion()
+            elif service == 'tts':
+                self.text_to_speech()
+            elif url.path.startswith('/rest/v1/'):
+                self.rest(url)
+            elif url.path.startswith('/storage/v1/'):
+                self.storage(url)
+            elif url.path.startswith('/auth/v1/'):
+                self.body()
+                self.send(401, {'error': 'no session'})
+            else:
+                self.body()
+                self.send(404, {'error': f'Unknown path {url.path}'})
+        except Exception as error:  # Surface stand-in bugs to the app as 500s
+            self.send(500, {'message': str(error), 'code': 'STAND_IN_ERROR'})
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = do_HEAD = handle_any
+
+    # -- providers ---------------------------------------------------------
+
+    def chat_completion(self):
+        request = self.json_body() or {}
+        prompt = request.get('messages', [{}])[-1].get('content', '')
+        answer = image_mapping_answer(prompt) if prompt.startswith('Assign each image') \
+            else segmentation_answer(prompt)
+        content = json.dumps(answer)
+        self.send(200, {
+            'id': f'chatcmpl-{uuid.uuid4().hex[:12]}',
+            'object': 'chat.completion',
+            'model': request.get('model'),
+            'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(content) // 4}
+        })
+
+    def text_to_speech(self):
+        text = (self.json_body() or {}).get('text', '')
+        # ~15 characters of speech per second at 64 kbit/s
+        size = max(1, len(text) // 15) * 8000
+        self.send(200, hashlib.sha256(text.encode()).digest() * (size // 32), content_type='audio/mpeg')
+
+    # -- Supabase REST -----------------------------------------------------
+
+    def rest(self, url):
+        path = unquote(url.path[len('/rest/v1/'):])
+        params = parse_qsl(url.query, keep_blank_values=True)
+        prefer = self.headers.get('prefer', '')
+        single = 'vnd.pgrst.object' in self.headers.get('accept', '')
+        db = self.server.db
+
+        if path.startswith('rpc/'):
+            args = self.json_body() or {}
+            function = getattr(db, path[len('rpc/'):], None)
+            if function is None:
+                self.send(404, {'message': f'Unknown function {path}', 'code': 'PGRST202'})
+                return
+            with db.lock:
+                result = json.loads(json.dumps(function(**args)))
+            self.send(200, result)
+            return
+
+        table = path
+        select, filters, order, limit, offset, on_conflict = '*', [], [], None, 0, None
+        embedded = {}  # alias -> {'filters': [...], 'order': [...]} for embedded resources
+        for key, value in params:
+            if '.' in key:
+                alias, key = key.split('.', 1)
+                options = embedded.setdefault(alias, {'filters': [], 'order': []})
+                if key == 'order':
+                    options['order'].extend(parse_order(value))
+                else:
+                    options['filters'].append(condition(f'{key}.{value}'))
+            elif key == 'select':
+                select = value
+            elif key == 'order':
+                order.extend(parse_order(value))
+            elif key == 'limit':
+                limit = int(value)
+            elif key == 'offset':
+                offset = int(value)
+            elif key == 'on_conflict':
+                on_conflict = value.split(',')
+            elif key == 'columns':
+                continue
+            elif key in ('or', 'and'):
+                filters.append(condition(f'{key}{value}'))
+            else:
+                filters.append(condition(f'{key}.{value}'))
+
+        with db.lock:
+            if self.command in ('GET', 'HEAD'):
+                rows = db.select(table, filters, order, limit, offset)
+            elif self.command == 'POST':
+                payload = self.json_body()
+                values = payload if isinstance(payload, list) else [payload]
+                rows = db.insert(table, values, on_conflict, merge='merge-duplicates' in prefer)
+            elif self.command == 'PATCH':
+                updates = self.json_body() or {}
+                rows = db.select(table, filters)
+                for row in rows:
+                    row.update(updates)
+            elif self.command == 'DELETE':
+                rows = db.select(table, filters)
+                removed = {id(row) for row in rows}
+                db.tables[table] = [row for row in db.table(table) if id(row) not in removed]
+            else:
+                self.send(405, {'message': 'Method not allowed'})
+                return
+            rows = [self.project(row, select, table, embedded) for row in rows]
+
+        if self.command != 'GET' and 'return=representation' not in prefer:
+            self.send(204 if self.command != 'POST' else 201)
+            return
+        if single:
+            if len(rows) != 1:
+                self.send(406, {
+                    'code': 'PGRST116',
+                    'message': 'JSON object requested, multiple (or no) rows returned',
+                    'details': f'The result contains {len(rows)} rows'
+                })
+                return
+            self.send(200, rows[0])
+            return
+        self.send(200 if self.command != 'POST' else 201, rows)
+
+    def project(self, row, select, table=None, embedded=None):
+        projected = {}
+        for column in split_top_level(select):
+            column = column.strip()
+            match = EMBED_PATTERN.match(column)
+            if match:
+                # alias:child(*) -> child rows whose <table>_id points at this row
+                alias, child, child_select = match.group(1) or match.group(2), match.group(2), match.group(3)
+                options = (embedded or {}).get(alias, {'filters': [], 'order': []})
+                parent = [lambda child_row, key=f'{table}_id': child_row.get(key) == row.get('id')]
+                children = self.server.db.select(child, parent + options['filters'], options['order'])
+                projected[alias] = [self.project(child_row, child_select) for child_row in children]
+            elif column == '*':
+                projected.update(row)
+            else:
+                projected[column] = row.get(column)
+        return json.loads(json.dumps(projected))
+
+    # -- Supabase Storage --------------------------------------------------
+
+    def storage(self, url):
+        path = unquote(url.path[len('/storage/v1/'):])
+        objects = self.server.objects
+
+        if path.startswith('upload/resumable'):
+            self.resumable(url, path)
+            return
+
+        if path.startswith('object/list/'):
+            bucket = path[len('object/list/'):]
+            options = self.json_body() or {}
+            prefix = options.get('prefix', '').strip('/')
+            entries = {}
+            for (object_bucket, name), meta in list(objects.items()):
+                if object_bucket != bucket or not name.startswith(f'{prefix}/' if prefix else ''):
+                    continue
+                rest = name[len(prefix) + 1:] if prefix else name
+                child = rest.split('/')[0]
+                is_file = '/' not in rest
+                entries[child] = {
+                    'name': child,
+                    'id': str(uuid.uuid5(uuid.NAMESPACE_URL, f'{bucket}/{name}')) if is_file else None,
+                    'updated_at': meta['updated_at'] if is_file else None,
+                    'metadata': {'size': meta['size'], 'mimetype': meta['content_type']} if is_file else None
+                }
+            limit = options.get('limit', 100)
+            offset = options.get('offset', 0)
+            self.send(200, sorted(entries.values(), key=lambda entry: entry['name'])[offset:offset + limit])
+            return
+
+        if path in ('object/move', 'object/copy') and self.command == 'POST':
+            body = self.json_body() or {}
+            bucket = body.get('bucketId')
+            source = (bucket, body.get('sourceKey'))
+            destination = (bucket, body.get('destinationKey'))
+            if source not in objects:
+                self.send(400, {'statusCode': '404', 'error': 'not_found', 'message': 'Object not found'})
+            elif destination in objects:
+                self.send(400, {'statusCode': '409', 'error': 'Duplicate', 'message': 'The resource already exists'})
+            else:
+                objects[destination] = objects.pop(source) if path == 'object/move' else dict(objects[source])
+                self.send(200, {'message': 'Successfully moved'} if path == 'object/move' else {'Key': f'{bucket}/{destination[1]}'})
+            return
+
+        if path.startswith('object/public/'):
+            path = path[len('object/public/'):]
+        elif path.startswith('object/'):
+            path = path[len('object/'):]
+        bucket, _, name = path.partition('/')
+
+        if self.command in ('POST', 'PUT'):
+            body = self.body()
+            content_type = self.headers.get('content-type', 'application/octet-stream')
+            if content_type.startswith('multipart/form-data'):
+                body, content_type = self.multipart_file(body, content_type)
+            if (bucket, name) in objects and self.headers.get('x-upsert') != 'true' and self.command == 'POST':
+                self.send(400, {'statusCode': '409', 'error': 'Duplicate', 'message': 'The resource already exists'})
+                return
+            self.store(bucket, name, body, content_type)
+            self.send(200, {'Key': f'{bucket}/{name}', 'Id': str(uuid.uuid4()), 'path': name, 'fullPath': f'{bucket}/{name}'})
+        elif self.command == 'DELETE':
+            prefixes = (self.json_body() or {}).get('prefixes', [name])
+            removed = []
+            for prefix in prefixes:
+                if objects.pop((bucket, prefix), None) is not None:
+                    removed.append({'name': prefix, 'bucket_id': bucket})
+            self.send(200, removed)
+        elif self.command in ('GET', 'HEAD'):
+            meta = objects.get((bucket, name))
+            if meta is None or meta['body'] is None:
+                self.send(404, {'statusCode': '404', 'error': 'not_found', 'message': 'Object not found'})
+                return
+            self.send(200, meta['body'], content_type=meta['content_type'])
+        else:
+            self.send(405, {'message': 'Method not allowed'})
+
+    def store(self, bucket, name, body, content_type):
+        self.server.objects[(bucket, name)] = {
+            'body': body if bucket in RETAINED_BUCKETS else None,
+            'size': len(body),
+            'content_type': content_type,
+            'updated_at': now_iso()
+        }
+
+    @staticmethod
+    def multipart_file(body, content_type):
+        """The file part of a storage-js FormData upload"""
+        boundary = content_type.split('boundary=')[-1].strip('"').encode()
+        for part in body.split(b'--' + boundary):
+            head, _, data = part.partition(b'\r\n\r\n')
+            if b'filename=' in head or b'name=""' in head:
+                part_type = re.search(rb'Content-Type:\s*([^\r\n]+)', head, re.I)
+                return data[:-2] if data.endswith(b'\r\n') else data, \
+                    part_type.group(1).decode() if part_type else 'application/octet-stream'
+        return body, 'application/octet-stream'
+
+    def resumable(self, url, path):
+        uploads = self.server.uploads
+        upload_id = path[len('upload/resumable'):].strip('/')
+        headers = {'Tus-Resumable': '1.0.0'}
+
+        if self.command == 'POST' and not upload_id:
+            metadata = {}
+            for item in (self.headers.get('upload-metadata') or '').split(','):
+                key, _, value = item.strip().partition(' ')
+                if key:
+                    metadata[key] = base64.b64decode(value).decode()
+            upload_id = uuid.uuid4().hex
+            uploads[upload_id] = {
+                'bucket': metadata.get('bucketName'),
+                'path': metadata.get('objectName'),
+                'content_type': metadata.get('contentType', 'application/octet-stream'),
+                'length': int(self.headers.get('upload-length') or 0),
+                'offset': 0,
+                'chunks': []
+            }
+            self.body()
+            self.send(201, headers={**headers, 'Location': f'{self.server.base_url}/storage/v1/upload/resumable/{upload_id}'})
+            return
+
+        upload = uploads.get(upload_id)
+        if upload is None:
+            self.body()
+            self.send(404, {'message': 'Upload not found'})
+            return
+
+        if self.command == 'HEAD':
+            self.send(200, headers={**headers, 'Upload-Offset': str(upload['offset']), 'Upload-Length': str(upload['length'])})
+        elif self.command == 'PATCH':
+            offset = int(self.headers.get('upload-offset') or -1)
+            body = self.body()
+            if offset != upload['offset']:
+                self.send(409, {'message': 'Offset mismatch'}, {**headers, 'Upload-Offset': str(upload['offset'])})
+                return
+            upload['chunks'].append(body)
+            upload['offset'] += len(body)
+            if upload['offset'] >= upload['length']:
+                self.store(upload['bucket'], upload['path'], b''.join(upload['chunks']), upload['content_type'])
+                upload['chunks'] = []
+            self.send(204, headers={**headers, 'Upload-Offset': str(upload['offset'])})
+        else:
+            self.body()
+            self.send(405, {'message': 'Method not allowed'})
+
+
+def start_standins(host='127.0.0.1', port=54321, profiles=None, seed=0):
+    """Start the stand-in server on a background thread"""
+    server = StandInServer((host, port), profiles=profiles, seed=seed)
+    thread = threading.Thread(target=server.serve_forever, name='standins', daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,8 @@
+// Runs once when a server instance starts
+export async function register() {
+  // Web-only instances can leave job processing to dedicated worker instances
+  if (process.env.NEXT_RUNTIME === 'nodejs' && process.env.JOB_WORKER_ENABLED !== 'false') {
+    const { default: jobWorker } = await import('@/lib/services/jobWorker')
+    jobWorker.start()
+  }
+}
@@ -0,0 +1,86 @@
+// Browser client for the chunked, resumable PDF upload API
+
+// Supabase resumable uploads require 6MB chunks (the last chunk may be smaller)
+export const PDF_CHUNK_SIZE = 6 * 1024 * 1024
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms))
+
+async function getUploadStatus(uploadId) {
+  const res = await fetch(`/api/lessons/upload/chunked/${uploadId}`)
+  if (!res.ok) return null
+  return res.json()
+}
+
+/**
+ * Upload a PDF in chunks, resuming an earlier interrupted upload of the same file
+ * @param {File} file - PDF file
+ * @param {string|number} lessonId - Lesson the PDF belongs to
+ * @param {Object} options - { onProgress(percent), retries }
+ * @returns {Promise<Object>} Final upload status
+ */
+export async function uploadPdfInChunks(file, lessonId, options = {}) {
+  const { onProgress = () => {}, retries = 5 } = options
+  const resumeKey = `pdf-upload:${lessonId}:${file.name}:${file.size}:${file.lastModified}`
+
+  let status = null
+  const savedUploadId = localStorage.getItem(resumeKey)
+  if (savedUploadId) {
+    status = await getUploadStatus(savedUploadId)
+  }
+
+  if (!status) {
+    const res = await fetch('/api/lessons/upload/chunked', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ lessonId, fileName: file.name, size: file.size })
+    })
+    const data = await res.json()
+    if (!res.ok) throw new Error(data.error || 'Failed to start upload')
+
+    status = data
+    localStorage.setItem(resumeKey, data.uploadId)
+  }
+
+  const { uploadId, chunkSize } = status
+  let offset = status.offset
+  let failures = 0
+
+  // Once every byte is stored, an empty PATCH finishes an interrupted completion
+  while (status.status !== 'completed') {
+    onProgress(Math.floor((offset / file.size) * 100))
+
+    try {
+      const res = await fetch(`/api/lessons/upload/chunked/${uploadId}`, {
+        method: 'PATCH',
+        headers: {
+          'Content-Type': 'application/offset+octet-stream',
+          'Upload-Offset': String(offset)
+        },
+        body: file.slice(offset, offset + chunkSize)
+      })
+      const data = await res.json()
+
+      if (!res.ok && res.status !== 409) {
+        throw new Error(data.error || 'Chunk upload failed')
+      }
+
+      // On 409 the server tells us where to continue from
+      status = data
+      offset = data.offset
+      failures = 0
+    } catch (error) {
+      if (++failures > retries) throw error
+
+      await sleep(Math.min(30000, 1000 * 2 ** failures))
+      const current = await getUploadStatus(uploadId)
+      if (current) {
+        status = current
+        offset = current.offset
+      }
+    }
+  }
+
+  localStorage.removeItem(resumeKey)
+  onProgress(100)
+  return status
+}
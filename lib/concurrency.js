@@ -0,0 +1,268 @@
+// Concurrency helpers shared by the processing services
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms))
+
+/**
+ * Token bucket rate limiter
+ * Holds up to `capacity` tokens and refills at `ratePerSecond`.
+ */
+export class TokenBucket {
+  constructor(ratePerSecond, capacity = ratePerSecond) {
+    this.ratePerSecond = ratePerSecond
+    this.capacity = Math.max(1, capacity)
+    this.tokens = this.capacity
+    this.lastRefill = Date.now()
+  }
+
+  refill() {
+    const now = Date.now()
+    const elapsed = (now - this.lastRefill) / 1000
+    this.tokens = Math.min(this.capacity, this.tokens + elapsed * this.ratePerSecond)
+    this.lastRefill = now
+  }
+
+  /**
+   * Wait until a token is available and take it
+   * @returns {Promise<void>}
+   */
+  async take() {
+    if (!this.ratePerSecond || this.ratePerSecond <= 0) return
+
+    for (;;) {
+      this.refill()
+      if (this.tokens >= 1) {
+        this.tokens -= 1
+        return
+      }
+      const waitMs = ((1 - this.tokens) / this.ratePerSecond) * 1000
+      await sleep(Math.ceil(waitMs))
+    }
+  }
+}
+
+/**
+ * Check whether an error is a provider quota / rate-limit rejection
+ * @param {Error} error
+ * @returns {boolean}
+ */
+export function isQuotaError(error) {
+  if (!error) return false
+  if (error.status === 429 || error.code === 429) return true
+  return /RESOURCE_EXHAUSTED|quota|rate.?limit|too many requests/i.test(error.message || '')
+}
+
+/**
+ * Retry an async call with exponential backoff and jitter
+ * @param {Function} fn - Async function to call
+ * @param {Object} options - { retries, baseDelayMs, maxDelayMs, shouldRetry }
+ * @returns {Promise<any>} Result of fn
+ */
+export async function withRetry(fn, options = {}) {
+  const {
+    retries = 3,
+    baseDelayMs = 500,
+    maxDelayMs = 10000,
+    shouldRetry = isQuotaError
+  } = options
+
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await fn(attempt)
+    } catch (error) {
+      if (attempt >= retries || !shouldRetry(error)) throw error
+
+      const backoff = Math.min(maxDelayMs, baseDelayMs * 2 ** attempt)
+      const delay = error.retryAfterMs || backoff / 2 + Math.random() * backoff / 2
+      await sleep(delay)
+    }
+  }
+}
+
+/**
+ * Map over items with at most `concurrency` calls in flight.
+ * Results are returned in input order regardless of completion order.
+ * @param {Array} items - Items to process
+ * @param {number} concurrency - Maximum calls in flight
+ * @param {Function} fn - Async function (item, index) => result
+ * @returns {Promise<Array>} Results in input order
+ */
+export async function mapWithConcurrency(items, concurrency, fn) {
+  const results = new Array(items.length)
+  let next = 0
+
+  const worker = async () => {
+    while (next < items.length) {
+      const index = next++
+      results[index] = await fn(items[index], index)
+    }
+  }
+
+  const workerCount = Math.max(1, Math.min(concurrency, items.length))
+  await Promise.all(Array.from({ length: workerCount }, worker))
+
+  return results
+}
+
+/**
+ * Bounded async FIFO queue joining two pipeline stages.
+ * push() waits while the queue is full, so a fast producer cannot run
+ * ahead of a slow consumer; consumers iterate with `for await`.
+ */
+export class BoundedQueue {
+  constructor(capacity) {
+    this.capacity = Math.max(1, capacity)
+    this.items = []
+    this.waiters = []
+    this.closed = false
+    this.error = null
+  }
+
+  wakeAll() {
+    const waiters = this.waiters
+    this.waiters = []
+    waiters.forEach(resolve => resolve())
+  }
+
+  wait() {
+    return new Promise(resolve => this.waiters.push(resolve))
+  }
+
+  /**
+   * Add an item, waiting for space if the queue is full
+   * @param {any} item
+   * @returns {Promise<void>}
+   */
+  async push(item) {
+    while (this.items.length >= this.capacity && !this.closed && !this.error) {
+      await this.wait()
+    }
+    if (this.error) throw this.error
+    if (this.closed) throw new Error('Cannot push to a closed queue')
+
+    this.items.push(item)
+    this.wakeAll()
+  }
+
+  /**
+   * Take the next item, waiting until one is available or the queue closes
+   * @returns {Promise<{done: boolean, value: any}>}
+   */
+  async next() {
+    while (this.items.length === 0 && !this.closed && !this.error) {
+      await this.wait()
+    }
+    if (this.error) throw this.error
+    if (this.items.length === 0) return { done: true, value: undefined }
+
+    const value = this.items.shift()
+    this.wakeAll()
+    return { done: false, value }
+  }
+
+  /** Signal that no more items will be pushed */
+  close() {
+    this.closed = true
+    this.wakeAll()
+  }
+
+  /** Fail all pending and future push/next calls */
+  abort(error) {
+    this.error = error
+    this.wakeAll()
+  }
+
+  [Symbol.asyncIterator]() {
+    return { next: () => this.next() }
+  }
+}
+
+/**
+ * Concurrency limiter that adapts to provider rate-limit feedback (AIMD).
+ * The limit starts at initialLimit, grows by one after each success up to
+ * maxLimit, halves on a rate-limit rejection, and all calls pause until a
+ * reported reset time.
+ */
+export class AdaptiveLimiter {
+  /**
+   * @param {number} maxLimit - Ceiling on concurrent calls
+   * @param {number} initialLimit - Starting limit; defaults to half the ceiling
+   */
+  constructor(maxLimit, initialLimit = Math.ceil(maxLimit / 2)) {
+    this.maxLimit = Math.max(1, maxLimit)
+    this.limit = Math.min(this.maxLimit, Math.max(1, initialLimit))
+    this.inFlight = 0
+    this.pausedUntil = 0
+    this.waiters = []
+  }
+
+  async acquire() {
+    for (;;) {
+      const pauseMs = this.pausedUntil - Date.now()
+      if (pauseMs > 0) {
+        await sleep(pauseMs)
+        continue
+      }
+      if (this.inFlight < this.limit) {
+        this.inFlight++
+        return
+      }
+      await new Promise(resolve => this.waiters.push(resolve))
+    }
+  }
+
+  release() {
+    this.inFlight--
+    const waiters = this.waiters
+    this.waiters = []
+    waiters.forEach(resolve => resolve())
+  }
+
+  /**
+   * Feed back rate-limit information from a successful response
+   * @param {Object} rateLimit - { maxConcurrent, remaining, resetMs }
+   */
+  onSuccess(rateLimit = null) {
+    let ceiling = this.maxLimit
+    if (rateLimit?.maxConcurrent) {
+      ceiling = Math.min(ceiling, rateLimit.maxConcurrent)
+    }
+    this.limit = Math.min(ceiling, this.limit + 1)
+
+    if (rateLimit?.remaining === 0 && rateLimit.resetMs) {
+      this.pausedUntil = Math.max(this.pausedUntil, Date.now() + rateLimit.resetMs)
+    }
+  }
+
+  /**
+   * Back off after a rate-limit rejection
+   * @param {number} retryAfterMs - Provider supplied delay, if any
+   */
+  onRateLimited(retryAfterMs = 1000) {
+    this.limit = Math.max(1, Math.floor(this.limit / 2))
+    this.pausedUntil = Math.max(this.pausedUntil, Date.now() + retryAfterMs)
+  }
+
+  /**
+   * Run fn under the limiter, retrying rate-limit rejections
+   * @param {Function} fn - Async call returning an object with optional `rateLimit`
+   * @param {Object} options - { retries }
+   * @returns {Promise<any>} Result of fn
+   */
+  async run(fn, options = {}) {
+    const { retries = 5 } = options
+
+    for (let attempt = 0; ; attempt++) {
+      await this.acquire()
+      try {
+        const result = await fn()
+        this.onSuccess(result?.rateLimit)
+        return result
+      } catch (error) {
+        if (attempt >= retries || !isQuotaError(error)) throw error
+        this.onRateLimited(error.retryAfterMs || 1000 * 2 ** attempt)
+      } finally {
+        this.release()
+      }
+    }
+  }
+}
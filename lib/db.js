@@ -1,18 +1,353 @@
 // Database helper functions that use authenticated server client for RLS
-import { createClient } from '@/lib/supabase/server'
+import { createHash } from 'crypto'
+import { createClient, createServiceClient } from '@/lib/supabase/server'
+import { ReferenceCache } from '@/lib/referenceCache'
+
+const MAX_PAGE_SIZE = 500
+const DEFAULT_SEARCH_PAGE_SIZE = 20
+const MAX_SEARCH_PAGE_SIZE = 100
+
+// List endpoints: sort column (id breaks ties), filters, and relations
+// (relation -> foreign key) resolved from the reference cache
+const LIST_RESOURCES = {
+  school: { orderBy: 'name', filters: [] },
+  curriculum: { orderBy: 'name', filters: [] },
+  grade: { orderBy: 'id', filters: [] },
+  book: { orderBy: 'id', filters: [] },
+  subject: {
+    orderBy: 'id',
+    filters: ['school_id', 'curriculum_id', 'grade_id', 'book_id'],
+    relations: {
+      school: 'school_id',
+      curriculum: 'curriculum_id',
+      grade: 'grade_id',
+      book: 'book_id'
+    }
+  },
+  lesson: {
+    orderBy: 'lesson_number',
+    filters: ['book_id'],
+    relations: {
+      book: 'book_id'
+    }
+  }
+}
+
+class InvalidListOptionError extends Error {
+  constructor(message) {
+    super(message)
+    this.status = 400
+  }
+}
+
+function encodeCursor(row, orderBy) {
+  const key = orderBy === 'id' ? [row.id] : [row[orderBy], row.id]
+  return Buffer.from(JSON.stringify(key)).toString('base64url')
+}
+
+function decodeCursor(cursor, orderBy) {
+  try {
+    const key = JSON.parse(Buffer.from(cursor, 'base64url').toString())
+    if (Array.isArray(key) && key.length === (orderBy === 'id' ? 1 : 2)) return key
+  } catch {
+    // Fall through to the error below
+  }
+  throw new InvalidListOptionError('Invalid cursor')
+}
+
+// Quote a value for a PostgREST or() filter
+function quoteFilterValue(value) {
+  return `"${String(value).replace(/\\/g, '\\\\').replace(/"/g, '\\"')}"`
+}
+
+/**
+ * Columns and relations for a list request
+ * @returns {Object} { columns: Array|null (null selects '*'), relations }
+ */
+function parseFields(resource, fields) {
+  const relations = resource.relations || {}
+  if (!fields || fields.length === 0) {
+    return { columns: null, relations }
+  }
+
+  const columns = new Set(['id', resource.orderBy])
+  const requested = {}
+  for (const field of fields) {
+    if (!/^[a-z_][a-z0-9_]*$/.test(field)) {
+      throw new InvalidListOptionError(`Invalid field: ${field}`)
+    }
+    if (relations[field]) {
+      requested[field] = relations[field]
+      columns.add(relations[field])
+    } else {
+      columns.add(field)
+    }
+  }
+  return { columns: [...columns], relations: requested }
+}
+
+/**
+ * listPage over rows already in memory, with the same ordering, keyset
+ * cursor and projection as the database query. The rows are in the order the
+ * database sorted them, so text columns follow its collation rather than
+ * JavaScript's. Returns null when the cursor's row is no longer where the
+ * cursor says it was; the caller then asks the database.
+ */
+function pageFromRows(rows, resource, { limit, cursor, columns, filters }) {
+  const { orderBy } = resource
+  // Ids are numbers, which compare the same everywhere
+  let ordered = orderBy === 'id' ? [...rows].sort((a, b) => a.id - b.id) : rows
+
+  if (cursor) {
+    const key = decodeCursor(cursor, orderBy)
+    if (orderBy === 'id') {
+      ordered = ordered.filter(row => row.id > Number(key[0]))
+    } else {
+      const index = ordered.findIndex(row => String(row.id) === String(key[1]) && row[orderBy] === key[0])
+      if (index === -1) return null
+      ordered = ordered.slice(index + 1)
+    }
+  }
+
+  const matching = ordered
+    .filter(row => row.active)
+    .filter(row => resource.filters.every(column =>
+      !filters[column] || String(row[column]) === String(filters[column])
+    ))
+
+  const hasMore = limit !== null && matching.length > limit
+  const items = (hasMore ? matching.slice(0, limit) : matching).map(row =>
+    columns ? Object.fromEntries(columns.map(column => [column, row[column] ?? null])) : row
+  )
+
+  return {
+    items,
+    nextCursor: hasMore ? encodeCursor(items[items.length - 1], orderBy) : null
+  }
+}
+
+// Reference tables are read whole and shared by every request in the process.
+// They are loaded with the server-only service client, not the requesting
+// client whose RLS view is that user's alone (see RLS_SETUP.md), and kept in
+// the order listPage pages them in.
+const referenceCache = new ReferenceCache(async (table) => {
+  const { orderBy } = LIST_RESOURCES[table]
+  let query = createServiceClient()
+    .from(table)
+    .select('*')
+    .order(orderBy, { ascending: true })
+  if (orderBy !== 'id') {
+    query = query.order('id', { ascending: true })
+  }
+
+  const { data, error } = await query
+  
+  if (error) throw error
+  return data || []
+}, {
+  orderBy: Object.fromEntries(Object.entries(LIST_RESOURCES).map(([table, resource]) => [table, resource.orderBy]))
+})
+
+// Ids per `id=in.(...)` query, keeping the request URL short
+const MAX_BATCH_SIZE = 100
+
+class RowNotFoundError extends Error {
+  constructor(table, id) {
+    super(`No ${table} found with id ${id}`)
+    this.status = 404
+  }
+}
+
+/**
+ * DataLoader-style batcher for one table.
+ * Lookups made in the same tick are deduplicated and fetched with a single
+ * `id=in.(...)` query; results are memoized for the rest of the request.
+ */
+class BatchLoader {
+  constructor(supabase, table) {
+    this.supabase = supabase
+    this.table = table
+    this.cache = new Map()
+    this.batch = null
+  }
+
+  load(id) {
+    const key = String(id)
+    if (this.cache.has(key)) return this.cache.get(key)
+
+    if (!this.batch) {
+      const batch = new Map()
+      this.batch = batch
+      // Same scheduling as DataLoader: collect loads issued across a few promise hops
+      Promise.resolve().then(() => process.nextTick(() => {
+        this.batch = null
+        this.dispatch(batch)
+      }))
+    }
+
+    const promise = new Promise((resolve, reject) => {
+      this.batch.set(key, { resolve, reject })
+    })
+    this.cache.set(key, promise)
+    return promise
+  }
+
+  loadMany(ids) {
+    return Promise.all(ids.map(id => this.load(id)))
+  }
+
+  /** Forget a row so the next load refetches it (call after writes) */
+  clear(id) {
+    this.cache.delete(String(id))
+  }
+
+  async dispatch(batch) {
+    const keys = [...batch.keys()]
+    const chunks = []
+    for (let i = 0; i < keys.length; i += MAX_BATCH_SIZE) {
+      chunks.push(keys.slice(i, i + MAX_BATCH_SIZE))
+    }
+    await Promise.all(chunks.map(chunk => this.dispatchChunk(batch, chunk)))
+  }
+
+  async dispatchChunk(batch, keys) {
+    try {
+      const { data, error } = await this.supabase
+        .from(this.table)
+        .select('*')
+        .in('id', keys)
+      
+      if (error) throw error
+      await referenceCache.attach(data || [], LIST_RESOURCES[this.table]?.relations || {})
+
+      const rows = new Map((data || []).map(row => [String(row.id), row]))
+      for (const key of keys) {
+        const { resolve, reject } = batch.get(key)
+        if (rows.has(key)) {
+          resolve(rows.get(key))
+        } else {
+          this.cache.delete(key)
+          reject(new RowNotFoundError(this.table, key))
+        }
+      }
+    } catch (error) {
+      // Failed lookups are not memoized, so a retry goes back to the database
+      for (const key of keys) {
+        this.cache.delete(key)
+        batch.get(key).reject(error)
+      }
+    }
+  }
+}
+
+// Loaders live as long as the request's client (see createClient)
+const requestLoaders = new WeakMap()
 
 export const db = {
-  // Schools
-  async getSchools() {
+  /**
+   * Per-request batching loader for single-row lookups by id
+   * @param {string} table - Table name
+   * @returns {BatchLoader} Loader with load(id), loadMany(ids) and clear(id)
+   */
+  loader(table) {
     const supabase = createClient()
-    const { data, error } = await supabase
-      .from('school')
-      .select('*')
+    let loaders = requestLoaders.get(supabase)
+    if (!loaders) {
+      loaders = new Map()
+      requestLoaders.set(supabase, loaders)
+    }
+    if (!loaders.has(table)) {
+      loaders.set(table, new BatchLoader(supabase, table))
+    }
+    return loaders.get(table)
+  },
+
+  getReferenceCacheStats() {
+    return referenceCache.getStats()
+  },
+
+  /**
+   * Drop cached reference rows here and, when broadcasting, on every instance
+   * @param {string} table - 'school', 'curriculum', 'grade' or 'book'; omit for all
+   */
+  invalidateReferenceCache(table = null) {
+    referenceCache.invalidate(table)
+  },
+
+  /**
+   * Keyset-paginated list of active rows.
+   * Without a limit every row is returned, matching the original getX helpers.
+   * @param {string} table - Key of LIST_RESOURCES
+   * @param {Object} options - { limit, cursor, fields, filters }
+   * @returns {Promise<Object>} { items, nextCursor }
+   */
+  async listPage(table, options = {}) {
+    const resource = LIST_RESOURCES[table]
+    const { cursor, fields, filters = {} } = options
+    const limit = options.limit ? Math.min(parseInt(options.limit), MAX_PAGE_SIZE) : null
+    const { orderBy } = resource
+
+    if (options.limit && !(limit > 0)) {
+      throw new InvalidListOptionError('Invalid limit')
+    }
+
+    const { columns, relations } = parseFields(resource, fields)
+
+    if (referenceCache.has(table)) {
+      const rows = await referenceCache.rows(table)
+      const page = pageFromRows(rows, resource, { limit, cursor, columns, filters })
+      if (page) return page
+    }
+
+    const supabase = createClient()
+    let query = supabase
+      .from(table)
+      .select(columns ? columns.join(', ') : '*')
       .eq('active', true)
-      .order('name', { ascending: true })
+
+    for (const column of resource.filters) {
+      if (filters[column]) {
+        query = query.eq(column, filters[column])
+      }
+    }
+
+    if (cursor) {
+      const key = decodeCursor(cursor, orderBy)
+      query = orderBy === 'id'
+        ? query.gt('id', key[0])
+        : query.or(
+          `${orderBy}.gt.${quoteFilterValue(key[0])},` +
+          `and(${orderBy}.eq.${quoteFilterValue(key[0])},id.gt.${quoteFilterValue(key[1])})`
+        )
+    }
+
+    query = query.order(orderBy, { ascending: true })
+    if (orderBy !== 'id') {
+      query = query.order('id', { ascending: true })
+    }
+    if (limit) {
+      // One extra row tells us whether there is a next page
+      query = query.limit(limit + 1)
+    }
+
+    const { data, error } = await query
     
     if (error) throw error
-    return data || []
+
+    const rows = await referenceCache.attach(data || [], relations)
+    const hasMore = limit !== null && rows.length > limit
+    const items = hasMore ? rows.slice(0, limit) : rows
+
+    return {
+      items,
+      nextCursor: hasMore ? encodeCursor(items[items.length - 1], orderBy) : null
+    }
+  },
+
+  // Schools
+  async getSchools(options = {}) {
+    const { items } = await this.listPage('school', options)
+    return items
   },
 
   async createSchool(school) {
@@ -24,19 +359,14 @@ export const db = {
       .single()
     
     if (error) throw error
+    referenceCache.write('school', data)
     return data
   },
 
   async getSchoolById(id) {
-    const supabase = createClient()
-    const { data, error } = await supabase
-      .from('school')
-      .select('*')
-      .eq('id', id)
-      .single()
-    
-    if (error) throw error
-    return data
+    const row = await referenceCache.get('school', id)
+    if (!row) throw new RowNotFoundError('school', id)
+    return row
   },
 
   async updateSchool(id, updates) {
@@ -49,6 +379,7 @@ export const db = {
       .single()
     
     if (error) throw error
+    referenceCache.write('school', data)
     return data
   },
 
@@ -62,20 +393,14 @@ export const db = {
       .single()
     
     if (error) throw error
+    referenceCache.write('school', data)
     return data
   },
 
   // Curriculums
-  async getCurriculums() {
-    const supabase = createClient()
-    const { data, error } = await supabase
-      .from('curriculum')
-      .select('*')
-      .eq('active', true)
-      .order('name', { ascending: true })
-    
-    if (error) throw error
-    return data || []
+  async getCurriculums(options = {}) {
+    const { items } = await this.listPage('curriculum', options)
+    return items
   },
 
   async createCurriculum(curriculum) {
@@ -87,19 +412,14 @@ export const db = {
       .single()
     
     if (error) throw error
+    referenceCache.write('curriculum', data)
     return data
   },
 
   async getCurriculumById(id) {
-    const supabase = createClient()
-    const { data, error } = await supabase
-      .from('curriculum')
-      .select('*')
-      .eq('id', id)
-      .single()
-    
-    if (error) throw error
-    return data
+    const row = await referenceCache.get('curriculum', id)
+    if (!row) throw new RowNotFoundError('curriculum', id)
+    return row
   },
 
   async updateCurriculum(id, updates) {
@@ -112,6 +432,7 @@ export const db = {
       .single()
     
     if (error) throw error
+    referenceCache.write('curriculum', data)
     return data
   },
 
@@ -125,20 +446,14 @@ export const db = {
       .single()
     
     if (error) throw error
+    referenceCache.write('curriculum', data)
     return data
   },
 
   // Grades
-  async getGrades() {
-    const supabase = createClient()
-    const { data, error } = await supabase
-      .from('grade')
-      .select('*')
-      .eq('active', true)
-      .order('id', { ascending: true })
-    
-    if (error) throw error
-    return data || []
+  async getGrades(options = {}) {
+    const { items } = await this.listPage('grade', options)
+    return items
   },
 
   async createGrade(grade) {
@@ -150,19 +465,14 @@ export const db = {
       .single()
     
     if (error) throw error
+    referenceCache.write('grade', data)
     return data
   },
 
   async getGradeById(id) {
-    const supabase = createClient()
-    const { data, error } = await supabase
-      .from('grade')
-      .select('*')
-      .eq('id', id)
-      .single()
-    
-    if (error) throw error
-    return data
+    const row = await referenceCache.get('grade', id)
+    if (!row) throw new RowNotFoundError('grade', id)
+    return row
   },
 
   async updateGrade(id, updates) {
@@ -175,6 +485,7 @@ export const db = {
       .single()
     
     if (error) throw error
+    referenceCache.write('grade', data)
     return data
   },
 
@@ -188,26 +499,14 @@ export const db = {
       .single()
     
     if (error) throw error
+    referenceCache.write('grade', data)
     return data
   },
 
   // Subjects
-  async getSubjects() {
-    const supabase = createClient()
-    const { data, error } = await supabase
-      .from('subject')
-      .select(`
-        *,
-        school:school_id(*),
-        curriculum:curriculum_id(*),
-        grade:grade_id(*),
-        book:book_id(*)
-      `)
-      .eq('active', true)
-      .order('id', { ascending: true })
-    
-    if (error) throw error
-    return data || []
+  async getSubjects(options = {}) {
+    const { items } = await this.listPage('subject', options)
+    return items
   },
 
   async createSubject(subject) {
@@ -223,24 +522,11 @@ export const db = {
   },
 
   async getSubjectById(id) {
-    const supabase = createClient()
-    const { data, error } = await supabase
-      .from('subject')
-      .select(`
-        *,
-        school:school_id(*),
-        curriculum:curriculum_id(*),
-        grade:grade_id(*),
-        book:book_id(*)
-      `)
-      .eq('id', id)
-      .single()
-    
-    if (error) throw error
-    return data
+    return this.loader('subject').load(id)
   },
 
   async updateSubject(id, updates) {
+    this.loader('subject').clear(id)
     const supabase = createClient()
     const { data, error } = await supabase
       .from('subject')
@@ -254,6 +540,7 @@ export const db = {
   },
 
   async deleteSubject(id) {
+    this.loader('subject').clear(id)
     const supabase = createClient()
     const { data, error } = await supabase
       .from('subject')
@@ -267,16 +554,9 @@ export const db = {
   },
 
   // Books
-  async getBooks() {
-    const supabase = createClient()
-    const { data, error } = await supabase
-      .from('book')
-      .select('*')
-      .eq('active', true)
-      .order('id', { ascending: true })
-    
-    if (error) throw error
-    return data || []
+  async getBooks(options = {}) {
+    const { items } = await this.listPage('book', options)
+    return items
   },
 
   async createBook(book) {
@@ -288,19 +568,14 @@ export const db = {
       .single()
     
     if (error) throw error
+    referenceCache.write('book', data)
     return data
   },
 
   async getBookById(id) {
-    const supabase = createClient()
-    const { data, error } = await supabase
-      .from('book')
-      .select('*')
-      .eq('id', id)
-      .single()
-    
-    if (error) throw error
-    return data
+    const row = await referenceCache.get('book', id)
+    if (!row) throw new RowNotFoundError('book', id)
+    return row
   },
 
   async updateBook(id, updates) {
@@ -313,6 +588,7 @@ export const db = {
       .single()
     
     if (error) throw error
+    referenceCache.write('book', data)
     return data
   },
 
@@ -326,43 +602,21 @@ export const db = {
       .single()
     
     if (error) throw error
+    referenceCache.write('book', data)
     return data
   },
 
   // Lessons
-  async getLessons(bookId = null) {
-    const supabase = createClient()
-    let query = supabase
-      .from('lesson')
-      .select(`
-        *,
-        book:book_id(*)
-      `)
-      .eq('active', true)
-    
-    if (bookId) {
-      query = query.eq('book_id', bookId)
-    }
-    
-    const { data, error } = await query.order('lesson_number', { ascending: true })
-    
-    if (error) throw error
-    return data || []
+  async getLessons(bookId = null, options = {}) {
+    const { items } = await this.listPage('lesson', {
+      ...options,
+      filters: { ...options.filters, book_id: bookId }
+    })
+    return items
   },
 
   async getLessonById(id) {
-    const supabase = createClient()
-    const { data, error } = await supabase
-      .from('lesson')
-      .select(`
-        *,
-        book:book_id(*)
-      `)
-      .eq('id', id)
-      .single()
-    
-    if (error) throw error
-    return data
+    return this.loader('lesson').load(id)
   },
 
   async createLesson(lesson) {
@@ -378,6 +632,7 @@ export const db = {
   },
 
   async updateLesson(id, updates) {
+    this.loader('lesson').clear(id)
     const supabase = createClient()
     const { data, error } = await supabase
       .from('lesson')
@@ -416,6 +671,20 @@ export const db = {
     return data
   },
 
+  async createLessonTopics(lessonId, topics) {
+    this.loader('lesson').clear(lessonId)
+    const supabase = createClient()
+    // Upserts every topic, soft-deletes stale ones and sets num_topics in one transaction
+    const { data, error } = await supabase
+      .rpc('save_lesson_topics', {
+        p_lesson_id: lessonId,
+        p_topics: topics
+      })
+    
+    if (error) throw error
+    return data || []
+  },
+
   async updateLessonTopic(id, updates) {
     const supabase = createClient()
     const { data, error } = await supabase
@@ -429,6 +698,42 @@ export const db = {
     return data
   },
 
+  /**
+   * Ranked full-text search over active lesson topics and their segments
+   * @param {string} query - Web-search style query ("quoted phrases", -excluded, or)
+   * @param {Object} options - { limit, cursor, bookId }
+   * @returns {Promise<Object>} { items, nextCursor }
+   */
+  async searchLessonTopics(query, options = {}) {
+    const limit = Math.min(parseInt(options.limit) || DEFAULT_SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE)
+    if (!(limit > 0)) {
+      throw new InvalidListOptionError('Invalid limit')
+    }
+    const after = options.cursor ? decodeCursor(options.cursor, 'rank') : [null, null]
+
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .rpc('search_lesson_topics', {
+        p_query: query,
+        p_book_id: options.bookId ? parseInt(options.bookId) : null,
+        // One extra row tells us whether there is a next page
+        p_limit: limit + 1,
+        p_after_rank: after[0],
+        p_after_id: after[1]
+      })
+
+    if (error) throw error
+
+    const rows = data || []
+    const hasMore = rows.length > limit
+    const items = hasMore ? rows.slice(0, limit) : rows
+
+    return {
+      items,
+      nextCursor: hasMore ? encodeCursor(items[items.length - 1], 'rank') : null
+    }
+  },
+
   // Quiz Sections
   async getQuizSections(lessonId) {
     const supabase = createClient()
@@ -456,18 +761,11 @@ export const db = {
   },
 
   async getQuizSectionById(id) {
-    const supabase = createClient()
-    const { data, error } = await supabase
-      .from('quiz_section')
-      .select('*')
-      .eq('id', id)
-      .single()
-    
-    if (error) throw error
-    return data
+    return this.loader('quiz_section').load(id)
   },
 
   async updateQuizSection(id, updates) {
+    this.loader('quiz_section').clear(id)
     const supabase = createClient()
     const { data, error } = await supabase
       .from('quiz_section')
@@ -481,6 +779,7 @@ export const db = {
   },
 
   async deleteQuizSection(id) {
+    this.loader('quiz_section').clear(id)
     const supabase = createClient()
     const { data, error } = await supabase
       .from('quiz_section')
@@ -508,15 +807,7 @@ export const db = {
   },
 
   async getQuizQuestionById(id) {
-    const supabase = createClient()
-    const { data, error } = await supabase
-      .from('quiz_question')
-      .select('*')
-      .eq('id', id)
-      .single()
-    
-    if (error) throw error
-    return data
+    return this.loader('quiz_question').load(id)
   },
 
   async createQuizQuestion(question) {
@@ -532,6 +823,7 @@ export const db = {
   },
 
   async updateQuizQuestion(id, updates) {
+    this.loader('quiz_question').clear(id)
     const supabase = createClient()
     const { data, error } = await supabase
       .from('quiz_question')
@@ -545,6 +837,7 @@ export const db = {
   },
 
   async deleteQuizQuestion(id) {
+    this.loader('quiz_question').clear(id)
     const supabase = createClient()
     const { data, error } = await supabase
       .from('quiz_question')
@@ -555,35 +848,564 @@ export const db = {
     
     if (error) throw error
     return data
-  }
-}
+  },
 
-// Storage helpers with authenticated client
-export const storage = {
-  async uploadPDF(file, lessonId) {
+  // Quizzes
+  /**
+   * A lesson's active quiz sections, each with its active questions, in one query
+   * @param {number} lessonId - Lesson ID
+   * @returns {Promise<Array>} Sections by order, each with `questions` by order
+   */
+  async getQuizForLesson(lessonId) {
     const supabase = createClient()
-    const fileName = `lessons/${lessonId}/original.pdf`
-    const { data, error } = await supabase.storage
-      .from('lesson-pdfs')
-      .upload(fileName, file, {
-        cacheControl: '3600',
-        upsert: true
-      })
-    
+    const { data, error } = await supabase
+      .from('quiz_section')
+      .select('*, questions:quiz_question(*)')
+      .eq('lesson_id', lessonId)
+      .eq('active', true)
+      .eq('questions.active', true)
+      .order('order', { ascending: true })
+      .order('order', { referencedTable: 'questions', ascending: true })
+      .order('created_at', { referencedTable: 'questions', ascending: true })
+
     if (error) throw error
-    return data
+    return (data || []).map(section => ({ ...section, questions: section.questions || [] }))
   },
 
-  async uploadImage(file, lessonId, pageNumber) {
+  /**
+   * Create, update, reorder and delete many quiz sections and questions of
+   * one lesson in a single transaction
+   * @param {number} lessonId - Lesson ID
+   * @param {Object} changes - { sections, questions, deletedSectionIds, deletedQuestionIds }
+   * @returns {Promise<Array>} The lesson's quiz afterwards, shaped like getQuizForLesson
+   */
+  async saveQuizChanges(lessonId, changes) {
+    const { sections = [], questions = [], deletedSectionIds = [], deletedQuestionIds = [] } = changes
     const supabase = createClient()
-    const fileName = `lessons/${lessonId}/pages/page-${pageNumber}.png`
-    const { data, error } = await supabase.storage
-      .from('lesson-images')
-      .upload(fileName, file, {
-        cacheControl: '3600',
-        upsert: true
+    const { data, error } = await supabase
+      .rpc('save_quiz_changes', {
+        p_lesson_id: lessonId,
+        p_sections: sections,
+        p_questions: questions,
+        p_deleted_section_ids: deletedSectionIds,
+        p_deleted_question_ids: deletedQuestionIds
       })
-    
+
+    if (error) {
+      // Raised by the function for ids outside the lesson or incomplete new rows
+      if (error.code === '22023') error.status = 400
+      throw error
+    }
+
+    for (const id of [...sections.map(section => section.id), ...deletedSectionIds]) {
+      if (id) this.loader('quiz_section').clear(id)
+    }
+    const nested = sections.flatMap(section => section.questions || [])
+    for (const id of [...nested, ...questions].map(question => question.id).concat(deletedQuestionIds)) {
+      if (id) this.loader('quiz_question').clear(id)
+    }
+    return data || []
+  },
+
+  // Processing Jobs
+  async createProcessingJob(job) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('processing_jobs')
+      .insert([job])
+      .select()
+      .single()
+    
+    if (error) throw error
+    return data
+  },
+
+  async getLatestProcessingJob(lessonId) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('processing_jobs')
+      .select('*')
+      .eq('lesson_id', lessonId)
+      .order('created_at', { ascending: false })
+      .limit(1)
+      .maybeSingle()
+    
+    if (error) throw error
+    return data
+  },
+
+  async getLatestProcessingJobs(lessonIds) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('processing_jobs')
+      .select('*')
+      .in('lesson_id', lessonIds)
+      .order('created_at', { ascending: false })
+    
+    if (error) throw error
+
+    // lesson_id -> newest job
+    const latest = new Map()
+    for (const job of data || []) {
+      if (!latest.has(String(job.lesson_id))) latest.set(String(job.lesson_id), job)
+    }
+    return latest
+  },
+
+  async updateProcessingJob(id, updates, workerId = null) {
+    const supabase = createClient()
+    let query = supabase
+      .from('processing_jobs')
+      .update({ ...updates, updated_at: new Date().toISOString() })
+      .eq('id', id)
+
+    // A worker only writes to jobs it still holds; null once the lease is lost
+    if (workerId) {
+      query = query.eq('locked_by', workerId)
+    }
+
+    const { data, error } = await query.select().maybeSingle()
+    
+    if (error) throw error
+    if (!data && !workerId) throw new RowNotFoundError('processing_jobs', id)
+    return data
+  },
+
+  async claimProcessingJob(workerId, leaseSeconds, maxRunning) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .rpc('claim_processing_job', {
+        p_worker_id: workerId,
+        p_lease_seconds: leaseSeconds,
+        p_max_running: maxRunning
+      })
+    
+    if (error) throw error
+    return data?.[0] || null
+  },
+
+  async renewProcessingJobLease(id, workerId, leaseSeconds) {
+    const supabase = createClient()
+    const now = new Date()
+    const { data, error } = await supabase
+      .from('processing_jobs')
+      .update({
+        heartbeat_at: now.toISOString(),
+        lease_expires_at: new Date(now.getTime() + leaseSeconds * 1000).toISOString()
+      })
+      .eq('id', id)
+      .eq('locked_by', workerId)
+      .select()
+      .maybeSingle()
+    
+    if (error) throw error
+    return data
+  },
+
+  // PDF Uploads (chunked / resumable)
+  async createPdfUpload(upload) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('pdf_uploads')
+      .insert([upload])
+      .select()
+      .single()
+    
+    if (error) throw error
+    return data
+  },
+
+  async getPdfUploadById(id) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('pdf_uploads')
+      .select('*')
+      .eq('id', id)
+      .maybeSingle()
+    
+    if (error) throw error
+    return data
+  },
+
+  async updatePdfUpload(id, updates) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('pdf_uploads')
+      .update({ ...updates, updated_at: new Date().toISOString() })
+      .eq('id', id)
+      .select()
+      .single()
+    
+    if (error) throw error
+    return data
+  },
+
+  // Pipeline Artifacts (per-stage checkpoints)
+  async getPipelineArtifacts(lessonId, stage) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('pipeline_artifacts')
+      .select('*')
+      .eq('lesson_id', lessonId)
+      .eq('stage', stage)
+    
+    if (error) throw error
+    return data || []
+  },
+
+  async upsertPipelineArtifacts(artifacts) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('pipeline_artifacts')
+      .upsert(artifacts, { onConflict: 'lesson_id,stage,artifact_key' })
+      .select()
+    
+    if (error) throw error
+    return data || []
+  },
+
+  async deletePipelineArtifacts(lessonId, stage, artifactKeys) {
+    const supabase = createClient()
+    const { error } = await supabase
+      .from('pipeline_artifacts')
+      .delete()
+      .eq('lesson_id', lessonId)
+      .eq('stage', stage)
+      .in('artifact_key', artifactKeys)
+    
+    if (error) throw error
+  },
+
+  // TTS Audio Cache
+  async getTtsCacheEntry(cacheKey) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('tts_audio_cache')
+      .select('*')
+      .eq('cache_key', cacheKey)
+      .maybeSingle()
+    
+    if (error) throw error
+    return data
+  },
+
+  async upsertTtsCacheEntry(entry) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('tts_audio_cache')
+      .upsert([entry], { onConflict: 'cache_key' })
+      .select()
+      .single()
+    
+    if (error) throw error
+    return data
+  },
+
+  async touchTtsCacheEntry(cacheKey) {
+    const supabase = createClient()
+    const { error } = await supabase
+      .from('tts_audio_cache')
+      .update({ last_used_at: new Date().toISOString() })
+      .eq('cache_key', cacheKey)
+    
+    if (error) throw error
+  },
+
+  async deleteTtsCacheEntry(cacheKey) {
+    const supabase = createClient()
+    const { error } = await supabase
+      .from('tts_audio_cache')
+      .delete()
+      .eq('cache_key', cacheKey)
+    
+    if (error) throw error
+  },
+
+  async evictTtsCacheEntries(maxEntries) {
+    const supabase = createClient()
+    // Everything past the newest maxEntries (by last use) is evicted
+    const { data, error } = await supabase
+      .from('tts_audio_cache')
+      .select('cache_key, audio_path')
+      .order('last_used_at', { ascending: false })
+      .range(maxEntries, maxEntries + 999)
+    
+    if (error) throw error
+    if (!data || data.length === 0) return []
+
+    const { error: deleteError } = await supabase
+      .from('tts_audio_cache')
+      .delete()
+      .in('cache_key', data.map(entry => entry.cache_key))
+    
+    if (deleteError) throw deleteError
+    return data
+  },
+
+  // LLM Response Cache
+  async getLlmCacheEntry(cacheKey) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('llm_response_cache')
+      .select('*')
+      .eq('cache_key', cacheKey)
+      .gt('expires_at', new Date().toISOString())
+      .maybeSingle()
+    
+    if (error) throw error
+    return data
+  },
+
+  async upsertLlmCacheEntry(entry) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('llm_response_cache')
+      .upsert([entry], { onConflict: 'cache_key' })
+      .select()
+      .single()
+    
+    if (error) throw error
+    return data
+  },
+
+  async touchLlmCacheEntry(cacheKey) {
+    const supabase = createClient()
+    const { error } = await supabase
+      .from('llm_response_cache')
+      .update({ last_used_at: new Date().toISOString() })
+      .eq('cache_key', cacheKey)
+    
+    if (error) throw error
+  },
+
+  async evictLlmCacheEntries(maxEntries) {
+    const supabase = createClient()
+    const { data: expired, error: expiredError } = await supabase
+      .from('llm_response_cache')
+      .delete()
+      .lt('expires_at', new Date().toISOString())
+      .select('cache_key')
+    
+    if (expiredError) throw expiredError
+
+    // Everything past the newest maxEntries (by last use) is evicted
+    const { data, error } = await supabase
+      .from('llm_response_cache')
+      .select('cache_key')
+      .order('last_used_at', { ascending: false })
+      .range(maxEntries, maxEntries + 999)
+    
+    if (error) throw error
+
+    const keys = (data || []).map(entry => entry.cache_key)
+    if (keys.length > 0) {
+      const { error: deleteError } = await supabase
+        .from('llm_response_cache')
+        .delete()
+        .in('cache_key', keys)
+      
+      if (deleteError) throw deleteError
+    }
+    return [...(expired || []).map(entry => entry.cache_key), ...keys]
+  },
+
+  // Lesson Bundles (published, precompiled lesson JSON)
+  async getLessonBundle(lessonId) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('lesson_bundles')
+      .select('*')
+      .eq('lesson_id', lessonId)
+      .maybeSingle()
+    
+    if (error) throw error
+    return data
+  },
+
+  async upsertLessonBundle(bundle) {
+    const supabase = createClient()
+    const { data, error } = await supabase
+      .from('lesson_bundles')
+      .upsert([{ ...bundle, updated_at: new Date().toISOString() }], { onConflict: 'lesson_id' })
+      .select()
+      .single()
+    
+    if (error) throw error
+    return data
+  }
+}
+
+// Headers for the Supabase Storage resumable (TUS) upload endpoint
+async function resumableUploadHeaders(supabase, extra = {}) {
+  const { data: { session } } = await supabase.auth.getSession()
+  return {
+    apikey: process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY,
+    Authorization: `Bearer ${session?.access_token || process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY}`,
+    'Tus-Resumable': '1.0.0',
+    ...extra
+  }
+}
+
+// Storage helpers with authenticated client
+export const storage = {
+  async uploadPDF(file, lessonId) {
+    const supabase = createClient()
+    const fileName = `lessons/${lessonId}/original.pdf`
+    const { data, error } = await supabase.storage
+      .from('lesson-pdfs')
+      .upload(fileName, file, {
+        cacheControl: '3600',
+        upsert: true
+      })
+    
+    if (error) throw error
+    return data
+  },
+
+  // Deduplicated PDFs live at a path derived from their checksum, which
+  // per-lesson uploads never write to, so a shared object never changes
+  pdfContentPath(checksum) {
+    return `pdfs/${checksum}.pdf`
+  },
+
+  /**
+   * Move an uploaded PDF to its content-addressed path
+   * @returns {Promise<boolean>} false if an identical PDF is already stored there
+   */
+  async movePDF(from, to) {
+    const supabase = createClient()
+    const { error } = await supabase.storage
+      .from('lesson-pdfs')
+      .move(from, to)
+    
+    if (error) {
+      if (error.statusCode === '409' || /already exists/i.test(error.message)) return false
+      throw error
+    }
+    return true
+  },
+
+  async pdfExists(path) {
+    const supabase = createClient()
+    const folder = path.split('/').slice(0, -1).join('/')
+    const name = path.split('/').pop()
+    const { data, error } = await supabase.storage
+      .from('lesson-pdfs')
+      .list(folder, { search: name })
+    
+    if (error) throw error
+    return (data || []).some(file => file.name === name)
+  },
+
+  /**
+   * Hash a stored PDF, streaming it rather than loading it into memory
+   * @returns {Promise<string>} Hex sha256 digest
+   */
+  async hashPDF(path) {
+    const supabase = createClient()
+    const { data: { session } } = await supabase.auth.getSession()
+    const response = await fetch(
+      `${process.env.NEXT_PUBLIC_SUPABASE_URL}/storage/v1/object/lesson-pdfs/${path}`,
+      {
+        headers: {
+          apikey: process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY,
+          Authorization: `Bearer ${session?.access_token || process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY}`
+        }
+      }
+    )
+    
+    if (!response.ok) {
+      throw new Error(`Failed to read PDF: ${response.status} ${await response.text()}`)
+    }
+    const hash = createHash('sha256')
+    for await (const chunk of response.body) {
+      hash.update(chunk)
+    }
+    return hash.digest('hex')
+  },
+
+  async createResumablePDFUpload(lessonId, size) {
+    const supabase = createClient()
+    const fileName = `lessons/${lessonId}/original.pdf`
+    const encode = value => Buffer.from(value).toString('base64')
+    const response = await fetch(
+      `${process.env.NEXT_PUBLIC_SUPABASE_URL}/storage/v1/upload/resumable`,
+      {
+        method: 'POST',
+        headers: await resumableUploadHeaders(supabase, {
+          'Upload-Length': String(size),
+          'Upload-Metadata': [
+            `bucketName ${encode('lesson-pdfs')}`,
+            `objectName ${encode(fileName)}`,
+            `contentType ${encode('application/pdf')}`,
+            `cacheControl ${encode('3600')}`
+          ].join(','),
+          'x-upsert': 'true'
+        })
+      }
+    )
+    
+    if (!response.ok) {
+      throw new Error(`Failed to create resumable upload: ${response.status} ${await response.text()}`)
+    }
+    return { uploadUrl: response.headers.get('location'), path: fileName }
+  },
+
+  async appendResumablePDFUpload(uploadUrl, offset, body) {
+    const supabase = createClient()
+    const response = await fetch(uploadUrl, {
+      method: 'PATCH',
+      headers: await resumableUploadHeaders(supabase, {
+        'Upload-Offset': String(offset),
+        'Content-Type': 'application/offset+octet-stream'
+      }),
+      body,
+      duplex: 'half'
+    })
+    
+    if (!response.ok) {
+      const error = new Error(`Failed to upload chunk: ${response.status} ${await response.text()}`)
+      error.status = response.status
+      throw error
+    }
+    return parseInt(response.headers.get('upload-offset'))
+  },
+
+  async getResumablePDFUploadOffset(uploadUrl) {
+    const supabase = createClient()
+    const response = await fetch(uploadUrl, {
+      method: 'HEAD',
+      headers: await resumableUploadHeaders(supabase)
+    })
+    
+    if (!response.ok) return null
+    return parseInt(response.headers.get('upload-offset'))
+  },
+
+  async uploadImage(file, lessonId, pageNumber) {
+    const supabase = createClient()
+    const fileName = `lessons/${lessonId}/pages/page-${pageNumber}.png`
+    const { data, error } = await supabase.storage
+      .from('lesson-images')
+      .upload(fileName, file, {
+        cacheControl: '3600',
+        upsert: true
+      })
+    
+    if (error) throw error
+    return data
+  },
+
+  async uploadWebP(buffer, path, { immutable = false } = {}) {
+    const supabase = createClient()
+    const { data, error } = await supabase.storage
+      .from('lesson-images')
+      .upload(path, buffer, {
+        cacheControl: immutable ? '31536000' : '3600',
+        contentType: 'image/webp',
+        upsert: true
+      })
+    
     if (error) throw error
     return data
   },
@@ -602,6 +1424,103 @@ export const storage = {
     return data
   },
 
+  async uploadCachedAudio(file, cacheKey) {
+    const supabase = createClient()
+    const fileName = `cache/${cacheKey}.mp3`
+    const { data, error } = await supabase.storage
+      .from('lesson-audio')
+      .upload(fileName, file, {
+        cacheControl: '31536000',
+        contentType: 'audio/mpeg',
+        upsert: true
+      })
+    
+    if (error) throw error
+    return data
+  },
+
+  // Joined topic audio is content-addressed, so it never changes once stored
+  async uploadTopicAudio(buffer, path) {
+    const supabase = createClient()
+    const { data, error } = await supabase.storage
+      .from('lesson-audio')
+      .upload(path, buffer, {
+        cacheControl: '31536000',
+        contentType: 'audio/mpeg',
+        upsert: true
+      })
+    
+    if (error) throw error
+    return data
+  },
+
+  async copyAudio(from, to) {
+    const supabase = createClient()
+    const { error } = await supabase.storage
+      .from('lesson-audio')
+      .copy(from, to)
+    
+    if (error) {
+      if (error.statusCode === '409' || /already exists/i.test(error.message)) return false
+      throw error
+    }
+    return true
+  },
+
+  async downloadAudio(path) {
+    const supabase = createClient()
+    const { data, error } = await supabase.storage
+      .from('lesson-audio')
+      .download(path)
+    
+    if (error) throw error
+    return Buffer.from(await data.arrayBuffer())
+  },
+
+  async uploadBundle(path, body, contentType, cacheControl) {
+    const supabase = createClient()
+    const { data, error } = await supabase.storage
+      .from('lesson-bundles')
+      .upload(path, body, {
+        cacheControl,
+        contentType,
+        upsert: true
+      })
+    
+    if (error) throw error
+    return data
+  },
+
+  async downloadBundle(path) {
+    const supabase = createClient()
+    const { data, error } = await supabase.storage
+      .from('lesson-bundles')
+      .download(path)
+    
+    if (error) throw error
+    return JSON.parse(await data.text())
+  },
+
+  async listFiles(bucket, folder) {
+    const supabase = createClient()
+    const { data, error } = await supabase.storage
+      .from(bucket)
+      .list(folder, { limit: 1000 })
+    
+    if (error) throw error
+    return data || []
+  },
+
+  async removeFiles(bucket, paths) {
+    const supabase = createClient()
+    const { data, error } = await supabase.storage
+      .from(bucket)
+      .remove(paths)
+    
+    if (error) throw error
+    return data
+  },
+
   getPublicUrl(bucket, path) {
     const supabase = createClient()
     const { data } = supabase.storage
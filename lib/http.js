@@ -0,0 +1,42 @@
+// HTTP helpers shared by API route handlers
+import { NextResponse } from 'next/server'
+import { createHash } from 'crypto'
+
+/**
+ * Read list options (?limit=&cursor=&fields=a,b) from a query string
+ * @param {URLSearchParams} searchParams
+ * @returns {Object} { limit, cursor, fields }
+ */
+export function listOptionsFromSearchParams(searchParams) {
+  const fields = searchParams.get('fields')
+  return {
+    limit: searchParams.get('limit') || null,
+    cursor: searchParams.get('cursor') || null,
+    fields: fields ? fields.split(',').map(field => field.trim()).filter(Boolean) : null
+  }
+}
+
+/**
+ * JSON response with a weak ETag; answers 304 when If-None-Match matches
+ * @param {Request} request - Incoming request
+ * @param {Object} body - Response body
+ * @returns {NextResponse}
+ */
+export function jsonWithETag(request, body) {
+  const payload = JSON.stringify(body)
+  const etag = `W/"${createHash('sha1').update(payload).digest('base64url')}"`
+  const headers = {
+    ETag: etag,
+    'Cache-Control': 'private, no-cache'
+  }
+
+  const ifNoneMatch = request.headers.get('if-none-match')
+  if (ifNoneMatch && ifNoneMatch.split(',').map(tag => tag.trim()).includes(etag)) {
+    return new NextResponse(null, { status: 304, headers })
+  }
+
+  return new NextResponse(payload, {
+    status: 200,
+    headers: { ...headers, 'Content-Type': 'application/json' }
+  })
+}
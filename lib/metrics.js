@@ -0,0 +1,238 @@
+// In-process metrics, exposed in the Prometheus text format by /api/metrics.
+// Each instance reports its own counters; Prometheus sums them across instances.
+
+// Seconds; spans a cached lookup (ms) up to a slow model call or a whole run
+const DEFAULT_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600]
+
+function labelKey(labelNames, labels) {
+  return JSON.stringify(labelNames.map(name => String(labels[name] ?? '')))
+}
+
+function formatLabels(labelNames, values, extra = '') {
+  const pairs = labelNames.map((name, i) =>
+    `${name}="${values[i].replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n')}"`
+  )
+  if (extra) pairs.push(extra)
+  return pairs.length > 0 ? `{${pairs.join(',')}}` : ''
+}
+
+class Counter {
+  constructor(name, help, labelNames = []) {
+    this.type = 'counter'
+    this.name = name
+    this.help = help
+    this.labelNames = labelNames
+    this.values = new Map()
+  }
+
+  inc(labels = {}, value = 1) {
+    const key = labelKey(this.labelNames, labels)
+    this.values.set(key, (this.values.get(key) || 0) + value)
+  }
+
+  render() {
+    return [...this.values].map(([key, value]) =>
+      `${this.name}${formatLabels(this.labelNames, JSON.parse(key))} ${value}`
+    )
+  }
+}
+
+class Gauge extends Counter {
+  constructor(name, help, labelNames = []) {
+    super(name, help, labelNames)
+    this.type = 'gauge'
+  }
+
+  set(labels = {}, value) {
+    this.values.set(labelKey(this.labelNames, labels), value)
+  }
+
+  dec(labels = {}, value = 1) {
+    this.inc(labels, -value)
+  }
+}
+
+class Histogram {
+  constructor(name, help, labelNames = [], buckets = DEFAULT_BUCKETS) {
+    this.type = 'histogram'
+    this.name = name
+    this.help = help
+    this.labelNames = labelNames
+    this.buckets = buckets
+    this.values = new Map() // key -> { counts, sum, count }
+  }
+
+  observe(labels = {}, value) {
+    const key = labelKey(this.labelNames, labels)
+    let series = this.values.get(key)
+    if (!series) {
+      series = { counts: new Array(this.buckets.length).fill(0), sum: 0, count: 0 }
+      this.values.set(key, series)
+    }
+    const bucket = this.buckets.findIndex(bound => value <= bound)
+    if (bucket !== -1) series.counts[bucket]++
+    series.sum += value
+    series.count++
+  }
+
+  render() {
+    return [...this.values].flatMap(([key, series]) => {
+      const values = JSON.parse(key)
+      let cumulative = 0
+      const lines = this.buckets.map((bound, i) => {
+        cumulative += series.counts[i]
+        return `${this.name}_bucket${formatLabels(this.labelNames, values, `le="${bound}"`)} ${cumulative}`
+      })
+      lines.push(`${this.name}_bucket${formatLabels(this.labelNames, values, 'le="+Inf"')} ${series.count}`)
+      lines.push(`${this.name}_sum${formatLabels(this.labelNames, values)} ${series.sum}`)
+      lines.push(`${this.name}_count${formatLabels(this.labelNames, values)} ${series.count}`)
+      return lines
+    })
+  }
+}
+
+export class MetricsRegistry {
+  constructor() {
+    this.metrics = new Map()
+  }
+
+  register(metric) {
+    // Re-registering (e.g. a module loaded twice) returns the existing series
+    if (!this.metrics.has(metric.name)) this.metrics.set(metric.name, metric)
+    return this.metrics.get(metric.name)
+  }
+
+  counter(name, help, labelNames) {
+    return this.register(new Counter(name, help, labelNames))
+  }
+
+  gauge(name, help, labelNames) {
+    return this.register(new Gauge(name, help, labelNames))
+  }
+
+  histogram(name, help, labelNames, buckets) {
+    return this.register(new Histogram(name, help, labelNames, buckets))
+  }
+
+  /**
+   * All metrics in the Prometheus text exposition format
+   * @returns {string}
+   */
+  render() {
+    const lines = []
+    for (const metric of this.metrics.values()) {
+      lines.push(`# HELP ${metric.name} ${metric.help}`)
+      lines.push(`# TYPE ${metric.name} ${metric.type}`)
+      lines.push(...metric.render())
+    }
+    return `${lines.join('\n')}\n`
+  }
+}
+
+export const registry = new MetricsRegistry()
+
+export const stageDuration = registry.histogram(
+  'pipeline_stage_duration_seconds',
+  'Wall time of each lesson pipeline stage',
+  ['stage']
+)
+export const runDuration = registry.histogram(
+  'pipeline_run_duration_seconds',
+  'Wall time of a lesson processing run',
+  ['outcome']
+)
+export const callDuration = registry.histogram(
+  'service_call_duration_seconds',
+  'Latency of individual OCR, LLM and TTS provider calls',
+  ['service', 'operation', 'outcome']
+)
+export const pagesTotal = registry.counter(
+  'pipeline_pages_total',
+  'Pages read, by whether OCR ran or a checkpoint was reused',
+  ['source']
+)
+export const segmentsTotal = registry.counter(
+  'pipeline_segments_total',
+  'Lesson segments produced by segmentation'
+)
+export const ttsCharactersTotal = registry.counter(
+  'tts_characters_total',
+  'Characters of narration, by whether they were synthesized or served from the audio cache',
+  ['cached']
+)
+export const llmTokensTotal = registry.counter(
+  'llm_tokens_total',
+  'Model tokens used by uncached calls',
+  ['task', 'type']
+)
+export const jobsRunning = registry.gauge(
+  'pipeline_jobs_running',
+  'Processing jobs currently running on this instance'
+)
+
+/**
+ * Time an async provider call into service_call_duration_seconds
+ * @param {string} service - 'ocr', 'llm' or 'tts'
+ * @param {string} operation - Call name
+ * @param {Function} fn - Async function making the call
+ * @returns {Promise<any>} The call's result
+ */
+export async function timeCall(service, operation, fn) {
+  const started = performance.now()
+  let outcome = 'error'
+  try {
+    const result = await fn()
+    outcome = 'ok'
+    return result
+  } finally {
+    callDuration.observe({ service, operation, outcome }, (performance.now() - started) / 1000)
+  }
+}
+
+/**
+ * Timing spans for the stages of one pipeline run. Stages overlap, so each
+ * span runs from the stage's first work to its last.
+ */
+export class StageSpans {
+  constructor() {
+    this.spans = new Map() // stage -> { startedAt, start, durationMs }
+  }
+
+  start(stage) {
+    if (!this.spans.has(stage)) {
+      this.spans.set(stage, { startedAt: new Date().toISOString(), start: performance.now(), durationMs: null })
+    }
+  }
+
+  end(stage) {
+    const span = this.spans.get(stage)
+    if (!span || span.durationMs !== null) return
+    span.durationMs = Math.round(performance.now() - span.start)
+    stageDuration.observe({ stage }, span.durationMs / 1000)
+  }
+
+  /**
+   * Wrap one stage's work in a span
+   * @param {string} stage - Stage name
+   * @param {Function} fn - Async stage body
+   * @returns {Promise<any>}
+   */
+  async run(stage, fn) {
+    this.start(stage)
+    try {
+      return await fn()
+    } finally {
+      this.end(stage)
+    }
+  }
+
+  /**
+   * Finished spans, for the job's progress metadata
+   * @returns {Array} [{ stage, startedAt, durationMs }]
+   */
+  toJSON() {
+    return [...this.spans]
+      .filter(([, span]) => span.durationMs !== null)
+      .map(([stage, { startedAt, durationMs }]) => ({ stage, startedAt, durationMs }))
+  }
+}
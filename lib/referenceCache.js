@@ -0,0 +1,189 @@
+// In-process cache for small, rarely changing reference tables.
+// Each table is loaded whole, kept for a TTL, and updated write-through by
+// the db helpers that change it. Other server instances can optionally be
+// told to drop their copy over a Supabase Realtime broadcast channel.
+
+import { randomUUID } from 'crypto'
+import { createClient } from '@supabase/supabase-js'
+
+export const REFERENCE_TABLES = ['school', 'curriculum', 'grade', 'book']
+
+const TTL_MS = (parseInt(process.env.REFERENCE_CACHE_TTL_SECONDS) || 300) * 1000
+const CHANNEL = 'reference-cache'
+
+export class ReferenceCache {
+  /**
+   * @param {Function} load - async (table) => every row of the table, in list order
+   * @param {Object} options - { ttlMs, broadcast, orderBy: table -> column load sorts by }
+   */
+  constructor(load, options = {}) {
+    this.load = load
+    this.orderBy = options.orderBy || {}
+    this.ttlMs = options.ttlMs ?? TTL_MS
+    this.broadcast = options.broadcast ?? process.env.REFERENCE_CACHE_BROADCAST === 'true'
+    this.instanceId = randomUUID()
+    this.entries = new Map() // table -> { byId, expiresAt }
+    this.loading = new Map() // table -> in-flight load shared by concurrent misses
+    this.generations = new Map() // bumped on invalidation so stale loads are discarded
+    this.channel = null
+    this.stats = { hits: 0, misses: 0, evictions: 0, invalidations: 0, remoteInvalidations: 0 }
+  }
+
+  has(table) {
+    return REFERENCE_TABLES.includes(table)
+  }
+
+  async entry(table) {
+    this.subscribe()
+
+    const cached = this.entries.get(table)
+    if (cached && cached.expiresAt > Date.now()) {
+      this.stats.hits++
+      return cached
+    }
+    if (cached) {
+      this.entries.delete(table)
+      this.stats.evictions++
+    }
+
+    this.stats.misses++
+    if (!this.loading.has(table)) {
+      const generation = this.generations.get(table) || 0
+      const loading = this.load(table)
+        .then(rows => {
+          const entry = {
+            byId: new Map(rows.map(row => [String(row.id), row])),
+            expiresAt: Date.now() + this.ttlMs
+          }
+          // A write landed while we were loading; serve this result once but don't keep it
+          if ((this.generations.get(table) || 0) === generation) {
+            this.entries.set(table, entry)
+          }
+          return entry
+        })
+        .finally(() => {
+          if (this.loading.get(table) === loading) this.loading.delete(table)
+        })
+      this.loading.set(table, loading)
+    }
+    return this.loading.get(table)
+  }
+
+  /**
+   * Every row of a reference table, active or not
+   * @param {string} table - One of REFERENCE_TABLES
+   * @returns {Promise<Array>}
+   */
+  async rows(table) {
+    const { byId } = await this.entry(table)
+    return [...byId.values()]
+  }
+
+  /**
+   * One row by id
+   * @param {string} table - One of REFERENCE_TABLES
+   * @param {number|string} id - Row id
+   * @returns {Promise<Object|null>}
+   */
+  async get(table, id) {
+    const { byId } = await this.entry(table)
+    return byId.get(String(id)) ?? null
+  }
+
+  /**
+   * Resolve foreign keys to cached rows, e.g. { school: 'school_id' }
+   * sets row.school from row.school_id
+   * @param {Array} rows - Rows to decorate in place
+   * @param {Object} relations - relation name (= table) -> foreign key column
+   * @returns {Promise<Array>} The same rows
+   */
+  async attach(rows, relations) {
+    for (const [name, column] of Object.entries(relations)) {
+      const { byId } = await this.entry(name)
+      for (const row of rows) {
+        if (column in row) {
+          row[name] = row[column] == null ? null : byId.get(String(row[column])) ?? null
+        }
+      }
+    }
+    return rows
+  }
+
+  /**
+   * Write-through after a successful create/update/delete
+   * @param {string} table - One of REFERENCE_TABLES
+   * @param {Object} row - Row as returned by the write
+   */
+  write(table, row) {
+    this.generations.set(table, (this.generations.get(table) || 0) + 1)
+    this.loading.delete(table)
+
+    const entry = this.entries.get(table)
+    const column = this.orderBy[table]
+    const previous = entry?.byId.get(String(row.id))
+    if (entry && column && column !== 'id' && previous?.[column] !== row[column]) {
+      // Only the database can place a new or re-sorted row in its collation order
+      this.drop(table)
+    } else {
+      entry?.byId.set(String(row.id), row)
+    }
+    this.publish(table)
+  }
+
+  /**
+   * Drop a table (or every table) from this instance and, if broadcasting,
+   * from every other instance
+   * @param {string} table - Table name, or omit for all
+   */
+  invalidate(table = null) {
+    const tables = table ? [table] : REFERENCE_TABLES
+    tables.forEach(name => this.drop(name))
+    tables.forEach(name => this.publish(name))
+  }
+
+  drop(table) {
+    this.generations.set(table, (this.generations.get(table) || 0) + 1)
+    this.loading.delete(table)
+    if (this.entries.delete(table)) {
+      this.stats.invalidations++
+    }
+  }
+
+  subscribe() {
+    if (!this.broadcast || this.channel) return
+
+    const client = createClient(
+      process.env.NEXT_PUBLIC_SUPABASE_URL,
+      process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY,
+      { auth: { persistSession: false, autoRefreshToken: false } }
+    )
+    this.channel = client
+      .channel(CHANNEL)
+      .on('broadcast', { event: 'invalidate' }, ({ payload }) => {
+        if (!payload || payload.instanceId === this.instanceId) return
+        this.stats.remoteInvalidations++
+        this.drop(payload.table)
+      })
+      .subscribe()
+  }
+
+  publish(table) {
+    if (!this.broadcast) return
+    this.subscribe()
+
+    this.channel
+      .send({ type: 'broadcast', event: 'invalidate', payload: { table, instanceId: this.instanceId } })
+      .catch(error => console.error('Reference cache broadcast error:', error))
+  }
+
+  getStats() {
+    const tables = {}
+    for (const [table, entry] of this.entries) {
+      tables[table] = {
+        rows: entry.byId.size,
+        expiresInMs: Math.max(0, entry.expiresAt - Date.now())
+      }
+    }
+    return { ...this.stats, broadcast: this.broadcast, tables }
+  }
+}
@@ -1,139 +1,482 @@
 // OpenAI AI Segmentation Service
 // Divides OCR text into topics, subtopics, and segments
+//
+// Long lessons are segmented map-reduce style: OCR output is split into
+// token-budgeted windows on page/heading boundaries, the windows are
+// segmented in parallel, and a merge pass joins topics cut at window edges.
+
+import { mapWithConcurrency, withRetry } from '@/lib/concurrency'
+import { CHARS_PER_TOKEN, estimateTokens, isHeading } from '@/lib/text'
+import { llmTokensTotal, timeCall } from '@/lib/metrics'
+import llmCache from '@/lib/services/llmCache'
+import localModel from '@/lib/services/localModel'
+import imageAssignment from '@/lib/services/imageAssignment'
+
+function normalizeTitle(title) {
+  return (title || '').toLowerCase().replace(/[^a-z0-9]+/g, ' ').trim()
+}
 
 export class AISegmentationService {
   constructor() {
     this.apiKey = process.env.OPENAI_API_KEY
+    this.baseUrl = process.env.OPENAI_BASE_URL || 'https://api.openai.com/v1'
     this.model = 'gpt-4o' // or 'gpt-3.5-turbo'
+    this.mode = process.env.SEGMENTATION_MODE || 'auto' // 'auto', 'single' or 'chunked'
+    this.windowTokens = parseInt(process.env.SEGMENTATION_WINDOW_TOKENS) || 6000
+    this.concurrency = parseInt(process.env.SEGMENTATION_CONCURRENCY) || 4
+    this.maxRetries = 3
+    this.provider = process.env.LLM_PROVIDER || 'local' // 'openai' or 'local'
+  }
+
+  // Model id the responses come from; part of every cache key
+  get activeModel() {
+    return this.provider === 'openai' ? this.model : localModel.id
+  }
+
+  /**
+   * Segment OCR results into topics, windowing long lessons
+   * @param {Array} ocrResults - OCR results in page order
+   * @param {Object} options - { mode } overriding SEGMENTATION_MODE, { bypassCache } for forced re-runs
+   * @returns {Promise<Object>} { topics, report } where report has token usage and per-chunk latency
+   */
+  async segment(ocrResults, options = {}) {
+    const mode = options.mode || this.mode
+    const totalTokens = ocrResults.reduce((sum, r) => sum + estimateTokens(r.fullText), 0)
+    const chunked = mode === 'chunked' || (mode === 'auto' && totalTokens > this.windowTokens)
+
+    const windows = chunked
+      ? this.buildWindows(ocrResults)
+      : [{ text: ocrResults.map(r => r.fullText).join('\n\n'), ocrResults, startsAtHeading: true }]
+
+    const started = Date.now()
+    const results = await mapWithConcurrency(windows, this.concurrency, (window, index) =>
+      withRetry(() => this.segmentWindow(window, index, options), { retries: this.maxRetries })
+    )
+
+    const topics = chunked
+      ? this.mergeWindows(results.map(result => result.topics), windows)
+      : results[0].topics
+
+    const tokens = results.reduce((sum, result) => ({
+      prompt: sum.prompt + result.usage.promptTokens,
+      completion: sum.completion + result.usage.completionTokens
+    }), { prompt: 0, completion: 0 })
+
+    return {
+      topics,
+      report: {
+        mode: chunked ? 'chunked' : 'single',
+        windows: windows.length,
+        tokens: { ...tokens, total: tokens.prompt + tokens.completion },
+        latencyMs: Date.now() - started,
+        chunks: results.map((result, index) => ({
+          index,
+          pages: windows[index].ocrResults.map(r => r.pageNumber).filter((n, i, all) => all.indexOf(n) === i),
+          tokens: result.usage.promptTokens + result.usage.completionTokens,
+          latencyMs: result.latencyMs,
+          cached: result.cached,
+          topics: result.topics.length
+        }))
+      }
+    }
+  }
+
+  /**
+   * Split OCR output into windows of at most windowTokens of text.
+   * Windows end on page boundaries where possible; pages too long for one
+   * window are split at headings, then paragraphs.
+   * @param {Array} ocrResults - OCR results in page order
+   * @returns {Array} Windows of { text, ocrResults, startsAtHeading }
+   */
+  buildWindows(ocrResults) {
+    const units = ocrResults.flatMap(result => this.splitPage(result))
+    const windows = []
+    let current = null
+
+    for (const unit of units) {
+      if (!current || current.tokens + unit.tokens > this.windowTokens) {
+        current = { units: [], tokens: 0 }
+        windows.push(current)
+      }
+      current.units.push(unit)
+      current.tokens += unit.tokens
+    }
+
+    return windows.map(window => {
+      const pages = new Map()
+      for (const unit of window.units) {
+        const page = pages.get(unit.result.pageNumber) || { ...unit.result, fullText: '' }
+        page.fullText = page.fullText ? `${page.fullText}\n\n${unit.text}` : unit.text
+        pages.set(unit.result.pageNumber, page)
+      }
+      return {
+        text: window.units.map(unit => unit.text).join('\n\n'),
+        ocrResults: [...pages.values()],
+        startsAtHeading: window.units[0].startsAtHeading
+      }
+    })
+  }
+
+  splitPage(result) {
+    const text = result.fullText || ''
+    const budget = this.windowTokens
+    if (estimateTokens(text) <= budget) {
+      return [{ result, text, tokens: estimateTokens(text), startsAtHeading: true }]
+    }
+
+    // Sections start at heading lines; oversized sections fall back to paragraphs
+    const sections = []
+    for (const line of text.split('\n')) {
+      if (isHeading(line) || sections.length === 0) {
+        sections.push({ lines: [line], startsAtHeading: isHeading(line) })
+      } else {
+        sections[sections.length - 1].lines.push(line)
+      }
+    }
+
+    const units = []
+    for (const section of sections) {
+      const sectionText = section.lines.join('\n')
+      const pieces = estimateTokens(sectionText) <= budget
+        ? [sectionText]
+        : this.splitToBudget(sectionText.split(/\n\s*\n/), budget)
+      pieces.forEach((piece, index) => units.push({
+        result,
+        text: piece,
+        tokens: estimateTokens(piece),
+        startsAtHeading: index === 0 && section.startsAtHeading
+      }))
+    }
+    return units
+  }
+
+  splitToBudget(paragraphs, budget) {
+    const maxChars = budget * CHARS_PER_TOKEN
+    const pieces = []
+    let current = ''
+    for (const paragraph of paragraphs) {
+      for (let start = 0; start < paragraph.length || start === 0; start += maxChars) {
+        const part = paragraph.slice(start, start + maxChars)
+        if (current && estimateTokens(`${current}\n\n${part}`) > budget) {
+          pieces.push(current)
+          current = ''
+        }
+        current = current ? `${current}\n\n${part}` : part
+        if (paragraph.length === 0) break
+      }
+    }
+    if (current) pieces.push(current)
+    return pieces
+  }
+
+  /**
+   * Join per-window topics into one lesson. A topic that opens a window is
+   * folded into the previous window's last topic when it has the same
+   * title, or when the window was cut mid-section on a page both share.
+   * @param {Array} windowTopics - Topics per window, in window order
+   * @param {Array} windows - Windows from buildWindows
+   * @returns {Array} Topics with sequential order and unique ids
+   */
+  mergeWindows(windowTopics, windows) {
+    const merged = []
+
+    windowTopics.forEach((topics, windowIndex) => {
+      topics.forEach((topic, topicIndex) => {
+        const previous = merged[merged.length - 1]
+        const atEdge = windowIndex > 0 && topicIndex === 0 && previous
+        const sameTitle = atEdge &&
+          normalizeTitle(previous.topic) === normalizeTitle(topic.topic) &&
+          (!previous.subtopic || !topic.subtopic || normalizeTitle(previous.subtopic) === normalizeTitle(topic.subtopic))
+        const continuation = atEdge &&
+          !windows[windowIndex].startsAtHeading &&
+          (topic.pages || []).some(page => (previous.pages || []).includes(page))
+
+        if (sameTitle || continuation) {
+          previous.simplifiedExplanation = [...previous.simplifiedExplanation, ...topic.simplifiedExplanation]
+          previous.pages = [...new Set([...(previous.pages || []), ...(topic.pages || [])])].sort((a, b) => a - b)
+          previous.subtopic = previous.subtopic ?? topic.subtopic
+        } else {
+          merged.push({ ...topic, simplifiedExplanation: [...topic.simplifiedExplanation] })
+        }
+      })
+    })
+
+    // Each window numbers its own topics and segments, so make ids unique across the lesson
+    const uniqueId = (id, seen) => {
+      let unique = id
+      for (let n = 2; seen.has(unique); n++) {
+        unique = `${id}-${n}`
+      }
+      seen.add(unique)
+      return unique
+    }
+    const topicIds = new Set()
+    const segmentIds = new Set()
+
+    return merged.map((topic, index) => ({
+      ...topic,
+      topicId: uniqueId(topic.topicId, topicIds),
+      order: index + 1,
+      simplifiedExplanation: topic.simplifiedExplanation.map(segment => ({
+        ...segment,
+        id: uniqueId(segment.id, segmentIds)
+      }))
+    }))
+  }
+
+  /**
+   * Segment one window of text with a single model call
+   * @param {Object} window - { text, ocrResults }
+   * @param {number} index - Window index, for logging
+   * @param {Object} options - { bypassCache }
+   * @returns {Promise<Object>} { topics, usage, cached, latencyMs }
+   */
+  async segmentWindow(window, index = 0, options = {}) {
+    const started = Date.now()
+    const { topics, usage, cached } = await this.requestSegmentation(window.text, window.ocrResults, options)
+    const latencyMs = Date.now() - started
+    console.log(`AI Segmentation: window ${index + 1} ${cached ? 'cached' : 'done'} in ${latencyMs}ms (${usage.promptTokens + usage.completionTokens} tokens)`)
+    return { topics, usage, cached, latencyMs }
   }
 
   /**
    * Segment lesson content into structured topics and subtopics
    * @param {string} fullText - Complete OCR extracted text
    * @param {Array} ocrResults - Detailed OCR results with page info
+   * @param {Object} options - { bypassCache }
    * @returns {Promise<Array>} Array of LessonTopic objects
    */
-  async segmentLessonContent(fullText, ocrResults) {
-    try {
-      console.log('AI Segmentation: Analyzing content structure...')
-      
-      // Mock implementation - replace with actual OpenAI API call
-      // In production, you would:
-      // 1. Create a prompt asking GPT to segment the content
-      // 2. Request structured JSON output with topics, subtopics, and segments
-      // 3. Parse and validate the response
-      
-      const prompt = `Analyze the following lesson content and segment it into topics and subtopics. For each segment, provide:
+  async segmentLessonContent(fullText, ocrResults, options = {}) {
+    const { topics } = await this.requestSegmentation(fullText, ocrResults, options)
+    return topics
+  }
+
+  /**
+   * Call the configured model. 'openai' sends the prompt to the Chat
+   * Completions API; 'local' answers from the structured input with the
+   * deterministic stand-in, so everything runs offline.
+   * @param {string} task - 'segmentation' or 'image_mapping'
+   * @param {string} prompt - Prompt asking for a JSON answer
+   * @param {Object} input - Structured input for the local stand-in
+   * @returns {Promise<Object>} { content, usage }
+   */
+  async complete(task, prompt, input) {
+    if (this.provider !== 'openai') {
+      return localModel.complete(task, prompt, input)
+    }
+
+    const response = await fetch(`${this.baseUrl}/chat/completions`, {
+      method: 'POST',
+      headers: {
+        Authorization: `Bearer ${this.apiKey}`,
+        'Content-Type': 'application/json'
+      },
+      body: JSON.stringify({
+        model: this.model,
+        temperature: 0,
+        response_format: { type: 'json_object' },
+        messages: [{ role: 'user', content: prompt }]
+      })
+    })
+
+    if (!response.ok) {
+      const error = new Error(`OpenAI request failed: ${response.status} ${await response.text()}`)
+      error.status = response.status
+      const retryAfter = parseFloat(response.headers.get('retry-after'))
+      if (retryAfter) error.retryAfterMs = retryAfter * 1000
+      throw error
+    }
+
+    const body = await response.json()
+    return {
+      content: JSON.parse(body.choices[0].message.content),
+      usage: {
+        promptTokens: body.usage?.prompt_tokens ?? estimateTokens(prompt),
+        completionTokens: body.usage?.completion_tokens ?? 0
+      }
+    }
+  }
+
+  /**
+   * Call the model through the response cache
+   * @param {string} task - 'segmentation' or 'image_mapping'
+   * @param {string} prompt - Full prompt
+   * @param {Object} input - Structured input; also part of the cache key
+   * @param {Object} options - { bypassCache } to skip the lookup (the fresh answer is still stored)
+   * @returns {Promise<Object>} { content, usage, cached }
+   */
+  async completeCached(task, prompt, input, options = {}) {
+    const key = llmCache.cacheKey(task, this.activeModel, prompt, input)
+    const cached = await llmCache.get(key, { bypass: options.bypassCache })
+    if (cached) {
+      return { content: cached.response, usage: { promptTokens: 0, completionTokens: 0 }, cached: true }
+    }
+
+    const { content, usage } = await timeCall('llm', task, () => this.complete(task, prompt, input))
+    llmTokensTotal.inc({ task, type: 'prompt' }, usage.promptTokens)
+    llmTokensTotal.inc({ task, type: 'completion' }, usage.completionTokens)
+    await llmCache.set(key, { task, model: this.activeModel, response: content, usage })
+    return { content, usage, cached: false }
+  }
+
+  segmentationPrompt(fullText) {
+    return `Analyze the following lesson content and segment it into topics and subtopics. For each segment, provide:
 1. Topic name
 2. Subtopic name (if applicable)
 3. Original text
 4. Simplified explanation suitable for students
 5. Order/sequence
+6. Source page numbers
 
 Content:
 ${fullText}
 
-Return as JSON with structure: { topics: [{ topic, subtopic, order, segments: [{ originalText, text }] }] }`
-      
-      // Mock response
-      const mockTopics = [
-        {
-          topicId: 'topic-1',
-          topic: 'Introduction to the Lesson',
-          subtopic: null,
-          order: 1,
-          simplifiedExplanation: [
-            {
-              id: 'segment-1-1',
-              originalText: 'This is the opening paragraph that introduces the main concept.',
-              text: 'In this lesson, we will learn about the fundamental concepts that form the foundation of this subject.',
-              mediaMap: []
-            },
-            {
-              id: 'segment-1-2',
-              originalText: 'The lesson covers several key areas that students need to understand.',
-              text: 'We will explore different aspects step by step to build a complete understanding.',
-              mediaMap: []
-            }
-          ]
-        },
-        {
-          topicId: 'topic-2',
-          topic: 'Main Concepts',
-          subtopic: 'Key Principles',
-          order: 2,
-          simplifiedExplanation: [
-            {
-              id: 'segment-2-1',
-              originalText: 'The first principle explains how things work in this context.',
-              text: 'Think of this principle as the building block that everything else depends on.',
-              mediaMap: []
-            },
-            {
-              id: 'segment-2-2',
-              originalText: 'Understanding this relationship is crucial for mastering the topic.',
-              text: 'When we connect these ideas together, we can see how they relate to real-world situations.',
-              mediaMap: []
-            }
-          ]
-        },
-        {
-          topicId: 'topic-3',
-          topic: 'Practical Applications',
-          subtopic: 'Examples and Use Cases',
-          order: 3,
-          simplifiedExplanation: [
-            {
-              id: 'segment-3-1',
-              originalText: 'Here are some practical examples demonstrating the concepts.',
-              text: 'Let\'s look at real examples to see how these ideas work in practice.',
-              mediaMap: []
-            }
-          ]
-        }
-      ]
+Return as JSON with structure: { topics: [{ topic, subtopic, order, pages, segments: [{ originalText, text }] }] }`
+  }
+
+  /**
+   * Everything a lesson's segmentation depends on besides its pages: the
+   * model answering, the prompts and the windowing settings. Changing any of
+   * them must re-segment rather than reuse a checkpoint.
+   * @returns {Object} Value to hash with the page hashes
+   */
+  fingerprint() {
+    return {
+      model: this.activeModel,
+      segmentationPrompt: this.segmentationPrompt(''),
+      imageMappingPrompt: this.imageMappingPrompt([], []),
+      mode: this.mode,
+      windowTokens: this.windowTokens
+    }
+  }
+
+  async requestSegmentation(fullText, ocrResults, options = {}) {
+    try {
+      console.log('AI Segmentation: Analyzing content structure...')
       
-      return mockTopics
+      const prompt = this.segmentationPrompt(fullText)
+      const pages = (ocrResults || []).map(r => ({ pageNumber: r.pageNumber, text: r.fullText }))
+      const { content, usage, cached } = await this.completeCached('segmentation', prompt, { pages }, options)
+
+      return { topics: this.toLessonTopics(content), usage, cached }
     } catch (error) {
       console.error('AI Segmentation Error:', error)
-      throw new Error(`Failed to segment content: ${error.message}`)
+      const wrapped = new Error(`Failed to segment content: ${error.message}`)
+      wrapped.status = error.status
+      wrapped.retryAfterMs = error.retryAfterMs
+      throw wrapped
     }
   }
 
   /**
-   * Map extracted images to appropriate segments
+   * Convert the model's JSON answer into LessonTopic objects
+   * @param {Object} content - { topics: [{ topic, subtopic, pages, segments }] }
+   * @returns {Array} Topics
+   */
+  toLessonTopics(content) {
+    return (content?.topics || []).map((topic, topicIndex) => ({
+      topicId: topic.topicId || `topic-${topicIndex + 1}`,
+      topic: topic.topic,
+      subtopic: topic.subtopic ?? null,
+      order: topicIndex + 1,
+      pages: topic.pages || [],
+      simplifiedExplanation: (topic.segments || []).map((segment, segmentIndex) => ({
+        id: `segment-${topicIndex + 1}-${segmentIndex + 1}`,
+        originalText: segment.originalText,
+        text: segment.text,
+        mediaMap: []
+      }))
+    }))
+  }
+
+  /**
+   * Map extracted images to appropriate segments. Images are placed by
+   * layout, next to the text block nearest them on their page; only images
+   * without page data fall back to one batched model call.
    * @param {Array} topics - Segmented topics
-   * @param {Array} detectedImages - Images from OCR
+   * @param {Array} detectedImages - Images from OCR, with pageNumber and boundingBox
+   * @param {Object} options - { textBlocks } OCR text blocks with pageNumber, { bypassCache }
    * @returns {Promise<Array>} Topics with images mapped to segments
    */
-  async mapImagesToSegments(topics, detectedImages) {
-    // Use AI to determine which images belong to which segments
-    // For now, distribute images across segments
-    
+  async mapImagesToSegments(topics, detectedImages, options = {}) {
     if (!detectedImages || detectedImages.length === 0) {
       return topics
     }
-    
-    // Mock implementation
-    topics.forEach((topic, topicIndex) => {
-      topic.simplifiedExplanation.forEach((segment, segmentIndex) => {
-        const imageIndex = (topicIndex * topic.simplifiedExplanation.length + segmentIndex) % detectedImages.length
-        
-        if (detectedImages[imageIndex]) {
-          segment.mediaMap = [
-            {
-              type: 'image',
-              url: detectedImages[imageIndex].url || '',
-              caption: detectedImages[imageIndex].description || '',
-              key: `img-${imageIndex}`
-            }
-          ]
+
+    const { assignments, unplaced } = imageAssignment.assign(topics, detectedImages, options.textBlocks)
+    if (unplaced.length > 0) {
+      // Each image goes to one segment, but a segment may take several images
+      const placed = new Set()
+      const modelAssignments = await this.requestImageMapping(topics, unplaced.map(index => detectedImages[index]), options)
+      for (const assignment of modelAssignments) {
+        const image = unplaced[assignment.image]
+        if (image === undefined || placed.has(image)) continue
+        placed.add(image)
+        assignments.push({ ...assignment, image })
+      }
+    }
+
+    for (const { topic, segment, image } of assignments) {
+      const target = topics[topic]?.simplifiedExplanation[segment]
+      const detected = detectedImages[image]
+      if (!target || !detected) continue
+
+      target.mediaMap = [
+        ...(target.mediaMap || []),
+        {
+          type: 'image',
+          url: detected.url || '',
+          caption: detected.description || '',
+          key: `img-${image}`
         }
-      })
-    })
+      ]
+    }
     
     return topics
   }
+
+  /**
+   * Ask the model which segment each image illustrates
+   * @param {Array} topics - Segmented topics
+   * @param {Array} detectedImages - Images to place
+   * @param {Object} options - { bypassCache }
+   * @returns {Promise<Array>} [{ topic, segment, image }] with image indexing detectedImages
+   */
+  async requestImageMapping(topics, detectedImages, options = {}) {
+    const segments = topics.flatMap((topic, topicIndex) =>
+      topic.simplifiedExplanation.map((segment, segmentIndex) => ({
+        topic: topicIndex,
+        segment: segmentIndex,
+        topicSegments: topic.simplifiedExplanation.length,
+        text: segment.text
+      }))
+    )
+    const images = detectedImages.map((image, index) => ({
+      index,
+      description: image.description || '',
+      page: image.pageNumber ?? null
+    }))
+
+    const prompt = this.imageMappingPrompt(segments, images)
+    const { content } = await this.completeCached('image_mapping', prompt, { segments, images }, options)
+    return content?.assignments || []
+  }
+
+  imageMappingPrompt(segments, images) {
+    return `Assign each image to the lesson segment it best illustrates. A segment may have several images.
+
+Segments:
+${segments.map(s => `[${s.topic}.${s.segment}] ${s.text}`).join('\n')}
+
+Images:
+${images.map(i => `[${i.index}] (page ${i.page ?? '?'}) ${i.description}`).join('\n')}
+
+Return as JSON with structure: { assignments: [{ topic, segment, image }] }`
+  }
+
+  getCacheStats() {
+    return llmCache.getStats()
+  }
 }
 
 export default new AISegmentationService()
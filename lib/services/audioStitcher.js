@@ -0,0 +1,290 @@
+// Audio Stitching Service
+// Joins a topic's segment audio into one MP3, so a student downloads one file
+// per topic instead of one per sentence. Each segment records its byte range
+// and time span in the joined file, for seeking with HTTP range requests.
+//
+// MP3 frames are self-contained, so joining is a byte copy of the segments'
+// audio frames; ID3 tags and Xing/Info header frames are dropped because they
+// describe a single segment.
+//
+// Segments that can't be joined link to a copy of their audio under the
+// lesson rather than the TTS cache's file, which may be evicted.
+
+import { storage } from '@/lib/db'
+import checkpoints from '@/lib/services/pipelineCheckpoints'
+import ttsService from '@/lib/services/ttsService'
+
+// Layer III bitrates (kbit/s) by bitrate index
+const BITRATES = {
+  mpeg1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+  mpeg2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+}
+// Sample rates by version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+const SAMPLE_RATES = {
+  3: [44100, 48000, 32000],
+  2: [22050, 24000, 16000],
+  0: [11025, 12000, 8000]
+}
+
+function id3Size(buffer) {
+  if (buffer.length < 10 || buffer.toString('latin1', 0, 3) !== 'ID3') return 0
+  const size = ((buffer[6] & 0x7f) << 21) | ((buffer[7] & 0x7f) << 14) | ((buffer[8] & 0x7f) << 7) | (buffer[9] & 0x7f)
+  return 10 + size + (buffer[5] & 0x10 ? 10 : 0) // Footer flag
+}
+
+/**
+ * Decode an MPEG audio Layer III frame header
+ * @returns {Object|null} { length, samples, sampleRate, channels, sideInfo }
+ */
+function frameHeader(buffer, offset) {
+  if (offset + 4 > buffer.length || buffer[offset] !== 0xff || (buffer[offset + 1] & 0xe0) !== 0xe0) return null
+
+  const version = (buffer[offset + 1] >> 3) & 3
+  const layer = (buffer[offset + 1] >> 1) & 3
+  const bitrateIndex = buffer[offset + 2] >> 4
+  const sampleRateIndex = (buffer[offset + 2] >> 2) & 3
+  if (version === 1 || layer !== 1 || bitrateIndex === 0 || bitrateIndex === 15 || sampleRateIndex === 3) return null
+
+  const mpeg1 = version === 3
+  const bitrate = BITRATES[mpeg1 ? 'mpeg1' : 'mpeg2'][bitrateIndex] * 1000
+  const sampleRate = SAMPLE_RATES[version][sampleRateIndex]
+  const padding = (buffer[offset + 2] >> 1) & 1
+  const mono = (buffer[offset + 3] >> 6) === 3
+
+  return {
+    length: Math.floor((mpeg1 ? 144 : 72) * bitrate / sampleRate) + padding,
+    samples: mpeg1 ? 1152 : 576,
+    sampleRate,
+    channels: mono ? 1 : 2,
+    sideInfo: mpeg1 ? (mono ? 17 : 32) : (mono ? 9 : 17)
+  }
+}
+
+function isInfoFrame(buffer, offset, header) {
+  const tag = (at) => buffer.toString('latin1', at, at + 4)
+  const xing = tag(offset + 4 + header.sideInfo)
+  return xing === 'Xing' || xing === 'Info' || tag(offset + 36) === 'VBRI'
+}
+
+/**
+ * Audio frames of an MP3 file
+ * @param {Buffer} buffer - MP3 bytes
+ * @returns {Object|null} { frames: [{ offset, length, samples }], sampleRate, channels }, or null if not MP3
+ */
+export function parseMp3Frames(buffer) {
+  const frames = []
+  let format = null
+  let offset = id3Size(buffer)
+
+  while (offset + 4 <= buffer.length) {
+    const header = frameHeader(buffer, offset)
+    if (!header) {
+      if (buffer.toString('latin1', offset, offset + 3) === 'TAG') break // ID3v1 trailer
+      offset++ // Resynchronise past junk between frames
+      continue
+    }
+    if (offset + header.length > buffer.length) break // Truncated last frame
+
+    if (!format) {
+      format = { sampleRate: header.sampleRate, channels: header.channels }
+    } else if (header.sampleRate !== format.sampleRate || header.channels !== format.channels) {
+      return null
+    }
+
+    if (!(frames.length === 0 && isInfoFrame(buffer, offset, header))) {
+      frames.push({ offset, length: header.length, samples: header.samples })
+    }
+    offset += header.length
+  }
+
+  return frames.length > 0 ? { frames, ...format } : null
+}
+
+/**
+ * Join MP3 files recorded with the same sample rate and channel layout
+ * @param {Array<Buffer>} buffers - Segment audio, in order
+ * @returns {Object|null} { audio: Buffer, index: [{ byteStart, byteEnd, start, end }] },
+ *   byteEnd inclusive as in a Range header and times in seconds; null if they can't be joined
+ */
+export function joinMp3(buffers) {
+  const parsed = buffers.map(buffer => (buffer ? parseMp3Frames(buffer) : null))
+  if (parsed.some(file => !file)) return null
+  const { sampleRate, channels } = parsed[0]
+  if (parsed.some(file => file.sampleRate !== sampleRate || file.channels !== channels)) return null
+
+  const chunks = []
+  const index = []
+  let bytes = 0
+  let samples = 0
+
+  parsed.forEach(({ frames }, i) => {
+    const byteStart = bytes
+    const start = samples
+    // Copy runs of adjacent frames rather than one slice per frame
+    let runStart = frames[0].offset
+    let runEnd = runStart
+    for (const frame of frames) {
+      if (frame.offset !== runEnd) {
+        chunks.push(buffers[i].subarray(runStart, runEnd))
+        runStart = frame.offset
+      }
+      runEnd = frame.offset + frame.length
+      bytes += frame.length
+      samples += frame.samples
+    }
+    chunks.push(buffers[i].subarray(runStart, runEnd))
+
+    index.push({
+      byteStart,
+      byteEnd: bytes - 1,
+      start: Math.round(start / sampleRate * 1000) / 1000,
+      end: Math.round(samples / sampleRate * 1000) / 1000
+    })
+  })
+
+  return { audio: Buffer.concat(chunks, bytes), index }
+}
+
+export class AudioStitcher {
+  constructor() {
+    this.enabled = process.env.TTS_STITCH_AUDIO !== 'false'
+    this.stats = { topics: 0, reused: 0, skipped: 0, segments: 0, bytes: 0 }
+  }
+
+  /**
+   * Point a topic's segments at their slices of the joined file. audioSrcUrl
+   * gets a media fragment (#t=start,end), so plain <audio> players still
+   * play just the segment.
+   */
+  applyIndex(topic, data) {
+    topic.simplifiedExplanation.forEach((segment, i) => {
+      const slice = data.segments[i]
+      segment.audioSrcUrl = `${data.url}#t=${slice.start},${slice.end}`
+      segment.audioStart = slice.start
+      segment.audioEnd = slice.end
+      segment.audioByteStart = slice.byteStart
+      segment.audioByteEnd = slice.byteEnd
+    })
+  }
+
+  /**
+   * Join a voiced topic's segment audio into one stored file
+   * @param {number} lessonId - Lesson ID
+   * @param {Object} topic - Topic with simplifiedExplanation, updated in place
+   * @param {Array} audio - TTSService.generateAudioCached results, in segment order
+   * @param {Map} existing - topic_audio artifacts from the previous run
+   * @returns {Promise<string|null>} Storage path of the topic audio, or null if segments keep their own files
+   */
+  async stitchTopic(lessonId, topic, audio, existing) {
+    // Mock TTS produces no audio to join
+    if (!this.enabled || ttsService.provider !== 'elevenlabs' || audio.length === 0) return null
+
+    // Segment audio is content-addressed, so the same keys mean the same joined file
+    const inputHash = checkpoints.hash(audio.map(result => result.cacheKey))
+    const previous = existing.get(topic.topicId)
+    if (previous?.input_hash === inputHash && previous.data?.segments?.length === audio.length) {
+      this.applyIndex(topic, previous.data)
+      this.stats.reused++
+      return previous.storage_path
+    }
+
+    let joined = null
+    try {
+      const buffers = await Promise.all(audio.map(result => result.audioBuffer
+        ? Buffer.from(result.audioBuffer)
+        : storage.downloadAudio(result.audioPath)
+      ))
+      joined = joinMp3(buffers)
+    } catch (error) {
+      console.error(`Audio stitching error for topic ${topic.topicId}:`, error)
+    }
+    if (!joined) {
+      this.stats.skipped++
+      return null
+    }
+
+    const path = `lessons/${lessonId}/audio/topics/${inputHash}.mp3`
+    await storage.uploadTopicAudio(joined.audio, path)
+    const data = { url: storage.getPublicUrl('lesson-audio', path), segments: joined.index }
+
+    await checkpoints.save(lessonId, 'topic_audio', [{
+      key: topic.topicId,
+      inputHash,
+      data,
+      storagePath: path
+    }])
+
+    this.applyIndex(topic, data)
+    this.stats.topics++
+    this.stats.segments += audio.length
+    this.stats.bytes += joined.audio.length
+    return path
+  }
+
+  /**
+   * Point a topic's segments at copies of their cached audio under the lesson,
+   * for topics whose audio wasn't joined
+   * @param {number} lessonId - Lesson ID
+   * @param {Object} topic - Topic with simplifiedExplanation, updated in place
+   * @param {Array} audio - TTSService.generateAudioCached results, in segment order;
+   *   entries re-synthesized here are replaced in place
+   * @returns {Promise<Array<string>>} Storage paths of the copies
+   */
+  async linkSegments(lessonId, topic, audio) {
+    const copies = await Promise.all(audio.map(async (result, i) => {
+      if (!result.audioPath) return null // Mock TTS stores no audio
+
+      // Named by cache key, so an existing copy already holds the same audio
+      const path = `${this.segmentFolder(lessonId)}/${result.cacheKey}.mp3`
+      try {
+        await storage.copyAudio(result.audioPath, path)
+      } catch (error) {
+        if (!result.cached) throw error
+
+        // The cached file may have been evicted by another instance; synthesize it again
+        console.warn(`Cached audio ${result.audioPath} unavailable, regenerating:`, error.message)
+        const segment = topic.simplifiedExplanation[i]
+        audio[i] = await ttsService.generateAudioCached(segment.text, segment.id, { refresh: true })
+        if (!audio[i].audioPath) return null
+        await storage.copyAudio(audio[i].audioPath, path)
+      }
+      return path
+    }))
+
+    topic.simplifiedExplanation.forEach((segment, i) => {
+      if (copies[i]) segment.audioSrcUrl = storage.getPublicUrl('lesson-audio', copies[i])
+    })
+    return copies.filter(Boolean)
+  }
+
+  segmentFolder(lessonId) {
+    return `lessons/${lessonId}/audio/segments`
+  }
+
+  /**
+   * Remove topic and segment audio the current run no longer uses
+   * @param {number} lessonId - Lesson ID
+   * @param {Map} existing - topic_audio artifacts loaded at the start of the run
+   * @param {Map} current - topicId -> storage path stitched by this run
+   * @param {Set} segments - Segment copies linked by this run (linkSegments)
+   */
+  async prune(lessonId, existing, current, segments = new Set()) {
+    const inUse = new Set(current.values())
+    const folder = this.segmentFolder(lessonId)
+    const copies = (await storage.listFiles('lesson-audio', folder))
+      .map(file => `${folder}/${file.name}`)
+    const stale = [...new Set([...existing.values()].map(artifact => artifact.storage_path))]
+      .filter(path => path && !inUse.has(path))
+      .concat(copies.filter(path => !segments.has(path)))
+    if (stale.length > 0) {
+      await storage.removeFiles('lesson-audio', stale)
+    }
+    await checkpoints.prune(lessonId, 'topic_audio', existing, new Set(current.keys()))
+  }
+
+  getStats() {
+    return { ...this.stats }
+  }
+}
+
+export default new AudioStitcher()
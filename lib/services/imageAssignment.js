@@ -0,0 +1,169 @@
+// Image Assignment Service
+// Places detected images next to the text they illustrate using the OCR
+// layout instead of a model call. Text blocks and image boxes are indexed
+// per page; every image on a page is matched against every text block in one
+// pass over packed coordinate arrays, and each text block is matched to the
+// lesson segment it came from through an inverted word index.
+
+const MIN_WORD_LENGTH = 3
+const MIN_OVERLAP = 0.2 // Share of a block's words a segment must contain to claim it
+const MAX_WORD_SEGMENTS = 50 // Words in more segments than this don't tell segments apart
+
+function words(text) {
+  return new Set((text || '').toLowerCase().match(/[a-z0-9]+/g)?.filter(word => word.length >= MIN_WORD_LENGTH) || [])
+}
+
+/**
+ * Boxes packed as [x0, y0, x1, y1] runs in one typed array
+ * @param {Array} boxes - [{ x, y, width, height }]
+ * @returns {Float64Array}
+ */
+export function packBoxes(boxes) {
+  const packed = new Float64Array(boxes.length * 4)
+  boxes.forEach((box, i) => {
+    packed[i * 4] = box.x
+    packed[i * 4 + 1] = box.y
+    packed[i * 4 + 2] = box.x + box.width
+    packed[i * 4 + 3] = box.y + box.height
+  })
+  return packed
+}
+
+/**
+ * Nearest region for every box in one pass. Distance is the gap between
+ * rectangles, so a region enclosing or overlapping the box scores 0; ties
+ * go to the region above the box, as text usually introduces its figure.
+ * @param {Float64Array} boxes - Packed query boxes
+ * @param {Float64Array} regions - Packed regions
+ * @param {Uint8Array} eligible - 1 for regions that may be chosen
+ * @returns {Int32Array} Region index per box, -1 when none is eligible
+ */
+export function nearestRegions(boxes, regions, eligible) {
+  const boxCount = boxes.length / 4
+  const regionCount = regions.length / 4
+  const nearest = new Int32Array(boxCount).fill(-1)
+  const best = new Float64Array(boxCount).fill(Infinity)
+
+  for (let r = 0; r < regionCount; r++) {
+    if (!eligible[r]) continue
+    const rx0 = regions[r * 4]
+    const ry0 = regions[r * 4 + 1]
+    const rx1 = regions[r * 4 + 2]
+    const ry1 = regions[r * 4 + 3]
+
+    for (let b = 0; b < boxCount; b++) {
+      const dx = Math.max(0, rx0 - boxes[b * 4 + 2], boxes[b * 4] - rx1)
+      const dy = Math.max(0, ry0 - boxes[b * 4 + 3], boxes[b * 4 + 1] - ry1)
+      // Regions below the box lose ties to regions above it
+      const distance = Math.hypot(dx, dy) + (ry0 >= boxes[b * 4 + 3] ? 0.5 : 0)
+      if (distance < best[b]) {
+        best[b] = distance
+        nearest[b] = r
+      }
+    }
+  }
+  return nearest
+}
+
+export class ImageAssignmentService {
+  /**
+   * Assign each image to the segment whose text sits nearest to it on the page
+   * @param {Array} topics - Lesson topics with pages and simplifiedExplanation
+   * @param {Array} detectedImages - Images with pageNumber and boundingBox
+   * @param {Array} textBlocks - OCR text blocks with pageNumber, text and boundingBox
+   * @returns {Object} { assignments: [{ topic, segment, image }], unplaced: [image indexes] }
+   */
+  assign(topics, detectedImages, textBlocks = []) {
+    const segments = topics.flatMap((topic, topicIndex) =>
+      topic.simplifiedExplanation.map((segment, segmentIndex) => ({
+        topic: topicIndex,
+        segment: segmentIndex,
+        pages: topic.pages || [],
+        words: words(segment.originalText || segment.text)
+      }))
+    )
+
+    // word -> segment indexes containing it
+    const wordIndex = new Map()
+    segments.forEach((segment, index) => {
+      for (const word of segment.words) {
+        if (!wordIndex.has(word)) wordIndex.set(word, [])
+        wordIndex.get(word).push(index)
+      }
+    })
+
+    const onPage = (segment, pageNumber) => segment.pages.length === 0 || segment.pages.includes(pageNumber)
+    const firstOnPage = (pageNumber) => segments.findIndex(segment => onPage(segment, pageNumber))
+
+    // Group both kinds of box by page
+    const pages = new Map()
+    const pageFor = (pageNumber) => {
+      if (!pages.has(pageNumber)) pages.set(pageNumber, { blocks: [], images: [] })
+      return pages.get(pageNumber)
+    }
+    textBlocks.forEach(block => {
+      if (block.boundingBox && block.pageNumber != null) pageFor(block.pageNumber).blocks.push(block)
+    })
+
+    const assignments = []
+    const unplaced = []
+    detectedImages.forEach((image, index) => {
+      if (image.pageNumber == null) {
+        unplaced.push(index)
+      } else if (!image.boundingBox) {
+        const segment = firstOnPage(image.pageNumber)
+        if (segment === -1) unplaced.push(index)
+        else assignments.push({ topic: segments[segment].topic, segment: segments[segment].segment, image: index })
+      } else {
+        pageFor(image.pageNumber).images.push(index)
+      }
+    })
+
+    for (const [pageNumber, page] of pages) {
+      if (page.images.length === 0) continue
+
+      // Block -> best matching segment on this page, by share of the block's words it contains
+      const blockSegments = new Int32Array(page.blocks.length).fill(-1)
+      page.blocks.forEach((block, b) => {
+        const blockWords = words(block.text)
+        const counts = new Map()
+        for (const word of blockWords) {
+          const postings = wordIndex.get(word) || []
+          if (postings.length > MAX_WORD_SEGMENTS) continue
+          for (const segment of postings) {
+            if (onPage(segments[segment], pageNumber)) counts.set(segment, (counts.get(segment) || 0) + 1)
+          }
+        }
+        let bestScore = MIN_OVERLAP
+        for (const [segment, count] of counts) {
+          const score = count / blockWords.size
+          if (score >= bestScore) {
+            bestScore = score
+            blockSegments[b] = segment
+          }
+        }
+      })
+
+      const eligible = Uint8Array.from(blockSegments, segment => (segment === -1 ? 0 : 1))
+      const nearest = nearestRegions(
+        packBoxes(page.images.map(index => detectedImages[index].boundingBox)),
+        packBoxes(page.blocks.map(block => block.boundingBox)),
+        eligible
+      )
+
+      page.images.forEach((index, i) => {
+        // No block on the page traced back to a segment: use the page's first segment
+        const segment = nearest[i] === -1 ? firstOnPage(pageNumber) : blockSegments[nearest[i]]
+        if (segment === -1) {
+          unplaced.push(index)
+        } else {
+          assignments.push({ topic: segments[segment].topic, segment: segments[segment].segment, image: index })
+        }
+      })
+    }
+
+    return { assignments, unplaced }
+  }
+}
+
+export default new ImageAssignmentService()
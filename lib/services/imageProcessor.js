@@ -0,0 +1,288 @@
+// Image Processing Service
+// Compressed WebP variants of page renders and detected images, plus
+// perceptual hashing so images repeated across pages are stored once and
+// page furniture (logos, headers) is dropped.
+//
+// Uses sharp when it is installed (`yarn add sharp`); without it images are
+// stored as rendered and duplicate detection is skipped.
+
+import { storage } from '@/lib/db'
+
+// Longest edge, in pixels, of each stored variant
+export const IMAGE_VARIANTS = {
+  display: { width: 1280, quality: 80 },
+  thumb: { width: 320, quality: 70 }
+}
+const HASH_SIZE = 8 // 8x8 difference hash = 64 bits
+const DUPLICATE_DISTANCE = 6 // Max differing bits for two images to count as the same
+const BOILERPLATE_MIN_PAGES = parseInt(process.env.IMAGE_BOILERPLATE_MIN_PAGES) || 3
+
+let sharpModule
+
+async function loadSharp() {
+  if (sharpModule === undefined) {
+    try {
+      sharpModule = (await import('sharp')).default
+    } catch {
+      console.warn('sharp is not installed; images are stored without WebP variants or duplicate detection')
+      sharpModule = null
+    }
+  }
+  return sharpModule
+}
+
+async function toBuffer(image) {
+  if (!image) return null
+  if (Buffer.isBuffer(image)) return image
+  return Buffer.from(await image.arrayBuffer())
+}
+
+/**
+ * Number of differing bits between two hex perceptual hashes
+ * @param {string} a
+ * @param {string} b
+ * @returns {number}
+ */
+export function hammingDistance(a, b) {
+  let diff = BigInt(`0x${a}`) ^ BigInt(`0x${b}`)
+  let count = 0
+  while (diff) {
+    count += Number(diff & 1n)
+    diff >>= 1n
+  }
+  return count
+}
+
+/**
+ * Groups images of one lesson run by perceptual hash.
+ * The first image of a cluster is uploaded; later matches reuse its URLs.
+ */
+export class ImageDeduper {
+  constructor() {
+    this.clusters = [] // { hash, image, ready }
+  }
+
+  find(hash) {
+    return this.clusters.find(cluster => hammingDistance(cluster.hash, hash) <= DUPLICATE_DISTANCE) || null
+  }
+
+  add(hash, image, ready = Promise.resolve()) {
+    const cluster = { hash, image, ready }
+    this.clusters.push(cluster)
+    return cluster
+  }
+
+  /**
+   * Record images restored from a checkpoint so new pages can match them
+   * @param {Array} images - Processed detected images
+   */
+  register(images) {
+    for (const image of images || []) {
+      if (image.hash && !this.find(image.hash)) {
+        this.add(image.hash, image)
+      }
+    }
+  }
+}
+
+export class ImageProcessor {
+  constructor() {
+    this.stats = {
+      pages: 0,
+      images: 0,
+      duplicates: 0,
+      boilerplateDropped: 0,
+      sourceBytes: 0,
+      storedBytes: 0
+    }
+  }
+
+  /**
+   * Encode WebP variants of an image
+   * @param {Buffer} input - Source image
+   * @returns {Promise<Object|null>} { display, thumb } buffers, or null without sharp
+   */
+  async encodeVariants(input) {
+    const sharp = await loadSharp()
+    if (!sharp || !input) return null
+
+    const entries = await Promise.all(Object.entries(IMAGE_VARIANTS).map(async ([name, variant]) => [
+      name,
+      await sharp(input)
+        .resize({ width: variant.width, height: variant.width, fit: 'inside', withoutEnlargement: true })
+        .webp({ quality: variant.quality })
+        .toBuffer()
+    ]))
+    return Object.fromEntries(entries)
+  }
+
+  /**
+   * 64-bit difference hash: robust to scaling and recompression, so the
+   * same logo rendered on two pages hashes (nearly) the same
+   * @param {Buffer} input - Image
+   * @returns {Promise<string|null>} 16 hex digits, or null without sharp
+   */
+  async perceptualHash(input) {
+    const sharp = await loadSharp()
+    if (!sharp || !input) return null
+
+    const pixels = await sharp(input)
+      .removeAlpha()
+      .greyscale()
+      .resize(HASH_SIZE + 1, HASH_SIZE, { fit: 'fill' })
+      .raw()
+      .toBuffer()
+
+    let hash = 0n
+    for (let y = 0; y < HASH_SIZE; y++) {
+      for (let x = 0; x < HASH_SIZE; x++) {
+        const left = pixels[y * (HASH_SIZE + 1) + x]
+        const right = pixels[y * (HASH_SIZE + 1) + x + 1]
+        hash = (hash << 1n) | (left > right ? 1n : 0n)
+      }
+    }
+    return hash.toString(16).padStart(HASH_SIZE * HASH_SIZE / 4, '0')
+  }
+
+  async crop(pageBuffer, box) {
+    const sharp = await loadSharp()
+    const { width, height } = await sharp(pageBuffer).metadata()
+    const left = Math.max(0, Math.round(box.x))
+    const top = Math.max(0, Math.round(box.y))
+    const region = {
+      left,
+      top,
+      width: Math.min(Math.round(box.width), width - left),
+      height: Math.min(Math.round(box.height), height - top)
+    }
+    if (region.width <= 0 || region.height <= 0) return null
+    return sharp(pageBuffer).extract(region).png().toBuffer()
+  }
+
+  /**
+   * Store the display and thumbnail variants of a rendered page
+   * @param {number} lessonId - Lesson ID
+   * @param {Object} page - { pageNumber, imageBlob }
+   * @returns {Promise<Object|null>} { display, thumb } storage paths, or null if not stored
+   */
+  async uploadPageVariants(lessonId, page) {
+    const source = await toBuffer(page.imageBlob)
+    if (!source) return null
+
+    const variants = await this.encodeVariants(source)
+    this.stats.pages++
+    this.stats.sourceBytes += source.length
+
+    if (!variants) {
+      // No encoder: keep the original render
+      const uploaded = await storage.uploadImage(page.imageBlob, lessonId, page.pageNumber)
+      this.stats.storedBytes += source.length
+      return { display: uploaded.path, thumb: uploaded.path }
+    }
+
+    const paths = {}
+    await Promise.all(Object.entries(variants).map(async ([name, buffer]) => {
+      const path = `lessons/${lessonId}/pages/page-${page.pageNumber}-${name}.webp`
+      await storage.uploadWebP(buffer, path, { immutable: false })
+      paths[name] = path
+      this.stats.storedBytes += buffer.length
+    }))
+    return paths
+  }
+
+  /**
+   * Crop, hash and store the images OCR found on a page. Images matching
+   * one already stored in this run reuse its URLs instead of uploading.
+   * @param {number} lessonId - Lesson ID
+   * @param {Object} page - { pageNumber, imageBlob }
+   * @param {Array} detectedImages - OCR detected images with boundingBox
+   * @param {ImageDeduper} deduper - Per-run duplicate tracker
+   * @returns {Promise<Array>} Images with { pageNumber, hash, cluster, url, thumbUrl }
+   */
+  async processDetectedImages(lessonId, page, detectedImages = [], deduper) {
+    const pageBuffer = await toBuffer(page.imageBlob)
+    const sharp = await loadSharp()
+
+    const processed = []
+    for (const image of detectedImages) {
+      const base = { ...image, pageNumber: page.pageNumber }
+      const cropped = sharp && pageBuffer && image.boundingBox
+        ? await this.crop(pageBuffer, image.boundingBox)
+        : null
+      if (!cropped) {
+        processed.push(base)
+        continue
+      }
+
+      this.stats.images++
+      const hash = await this.perceptualHash(cropped)
+      const match = deduper.find(hash)
+      if (match) {
+        this.stats.duplicates++
+        await match.ready // The first copy may still be uploading on another page
+        processed.push({
+          ...base,
+          hash,
+          cluster: match.hash,
+          url: match.image.url,
+          thumbUrl: match.image.thumbUrl,
+          duplicateOf: match.image.pageNumber
+        })
+        continue
+      }
+
+      // Register the cluster before uploading so concurrent pages match it
+      const stored = { ...base, hash, cluster: hash }
+      const upload = this.uploadImageVariants(lessonId, stored, cropped)
+      deduper.add(hash, stored, upload.catch(() => {}))
+      await upload
+      processed.push(stored)
+    }
+    return processed
+  }
+
+  // Images are content-addressed, so the same image is never stored twice
+  async uploadImageVariants(lessonId, image, cropped) {
+    const variants = await this.encodeVariants(cropped)
+    this.stats.sourceBytes += cropped.length
+    await Promise.all(Object.entries(variants).map(async ([name, buffer]) => {
+      const path = `lessons/${lessonId}/images/${image.hash}-${name}.webp`
+      await storage.uploadWebP(buffer, path, { immutable: true })
+      image[name === 'display' ? 'url' : 'thumbUrl'] = storage.getPublicUrl('lesson-images', path)
+      this.stats.storedBytes += buffer.length
+    }))
+  }
+
+  /**
+   * Drop images that repeat on many pages (logos, running headers), which
+   * are page furniture rather than lesson content
+   * @param {Array} ocrResults - OCR results for the whole lesson
+   * @returns {Function} Filter over detected images
+   */
+  boilerplateFilter(ocrResults) {
+    const pagesByCluster = new Map()
+    for (const result of ocrResults) {
+      for (const image of result.detectedImages || []) {
+        if (!image.cluster) continue
+        const pages = pagesByCluster.get(image.cluster) || new Set()
+        pages.add(result.pageNumber)
+        pagesByCluster.set(image.cluster, pages)
+      }
+    }
+
+    return (image) => {
+      const keep = !image.cluster || pagesByCluster.get(image.cluster).size < BOILERPLATE_MIN_PAGES
+      if (!keep) this.stats.boilerplateDropped++
+      return keep
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      savedBytes: Math.max(0, this.stats.sourceBytes - this.stats.storedBytes)
+    }
+  }
+}
+
+export default new ImageProcessor()
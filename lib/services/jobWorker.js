@@ -0,0 +1,224 @@
+// Lesson Processing Job Worker
+// Claims jobs from the processing_jobs table and runs the lesson pipeline
+
+import { hostname } from 'os'
+import { randomUUID } from 'crypto'
+import { db } from '@/lib/db'
+import { runAsService } from '@/lib/supabase/server'
+import { jobsRunning, runDuration } from '@/lib/metrics'
+import { processLesson } from '@/lib/services/lessonPipeline'
+import progressHub, { jobStatus } from '@/lib/services/progressHub'
+
+const ACTIVE_STATUSES = ['pending', 'processing']
+
+// The job's lease expired and it may have been claimed by another worker
+class LeaseLostError extends Error {
+  constructor(jobId) {
+    super(`Lost lease on processing job ${jobId}`)
+    this.name = 'LeaseLostError'
+  }
+}
+
+export class JobWorker {
+  constructor() {
+    this.workerId = `${hostname()}-${process.pid}-${randomUUID().slice(0, 8)}`
+    this.concurrency = parseInt(process.env.JOB_WORKER_CONCURRENCY) || 2 // Jobs per server instance
+    this.maxRunning = parseInt(process.env.JOB_MAX_RUNNING) || 4 // Jobs across all instances
+    this.leaseSeconds = 60
+    this.heartbeatMs = 15000
+    this.pollMs = parseInt(process.env.JOB_POLL_MS) || 5000
+    this.retryBaseSeconds = parseInt(process.env.JOB_RETRY_BASE_SECONDS) || 30
+    this.retryMaxSeconds = 600
+    this.running = 0
+    this.filling = false
+    this.poller = null
+  }
+
+  /**
+   * Claim jobs for as long as the process runs, so pending jobs and jobs
+   * with expired leases are picked up without waiting for an API request.
+   * Called once at server start (instrumentation.js).
+   */
+  start() {
+    if (this.poller) return
+    console.log(`Job worker ${this.workerId} polling every ${this.pollMs}ms`)
+    this.poller = setInterval(() => this.poke(), this.pollMs)
+    this.poller.unref?.()
+    this.poke()
+  }
+
+  stop() {
+    clearInterval(this.poller)
+    this.poller = null
+  }
+
+  /**
+   * Delay before a failed job may run again: doubles per attempt, capped
+   * @param {number} attempts - Attempts made so far
+   * @returns {number} Seconds
+   */
+  retryDelaySeconds(attempts) {
+    return Math.min(this.retryMaxSeconds, this.retryBaseSeconds * 2 ** Math.max(0, attempts - 1))
+  }
+
+  /**
+   * Queue a lesson for processing, reusing an active job for the same lesson
+   * @param {number} lessonId - Lesson to process
+   * @param {Object} options - { force } to ignore checkpoints from earlier runs
+   * @returns {Promise<Object>} processing_jobs row
+   */
+  async enqueue(lessonId, options = {}) {
+    const existing = await db.getLatestProcessingJob(lessonId)
+    if (existing && ACTIVE_STATUSES.includes(existing.status)) {
+      return existing
+    }
+
+    return db.createProcessingJob({
+      id: randomUUID(),
+      lesson_id: lessonId,
+      status: 'pending',
+      stage: 'queued',
+      progress: 0,
+      metadata: { force: Boolean(options.force) }
+    })
+  }
+
+  /**
+   * Get the status of the latest job for a lesson
+   * @param {number} lessonId - Lesson ID
+   * @returns {Promise<Object>} Status in the shape the status page expects
+   */
+  async getStatus(lessonId) {
+    const job = await db.getLatestProcessingJob(lessonId)
+    return jobStatus(lessonId, job)
+  }
+
+  /**
+   * Write a job update and push it to anyone following the lesson
+   * @param {Object} job - Job being run
+   * @param {Object} updates - Columns to update
+   * @throws {LeaseLostError} If this worker no longer holds the job
+   */
+  async update(job, updates) {
+    const row = await db.updateProcessingJob(job.id, updates, this.workerId)
+    if (!row) throw new LeaseLostError(job.id)
+    const lessonId = parseInt(job.lesson_id)
+    progressHub.publish(lessonId, jobStatus(lessonId, row), { local: true })
+    return row
+  }
+
+  /**
+   * Claim jobs until this instance is at its concurrency limit.
+   * Safe to call often: concurrent calls collapse into one fill loop.
+   * Jobs run with the service client, never the session of the request
+   * that happened to call this.
+   */
+  poke() {
+    if (this.filling) return
+    this.filling = true
+
+    runAsService(() => this.fill())
+      .catch(error => console.error('Job claim error:', error))
+      .finally(() => {
+        this.filling = false
+      })
+  }
+
+  async fill() {
+    while (this.running < this.concurrency) {
+      const job = await db.claimProcessingJob(this.workerId, this.leaseSeconds, this.maxRunning)
+      if (!job) return
+
+      const lessonId = parseInt(job.lesson_id)
+      progressHub.publish(lessonId, jobStatus(lessonId, job), { local: true })
+
+      this.running++
+      this.run(job).finally(() => {
+        this.running--
+        this.poke()
+      })
+    }
+  }
+
+  async run(job) {
+    // A lost lease stops the run at its next progress report, and run()
+    // stops waiting on the pipeline at once
+    let leaseLost = null
+    let abort
+    const aborted = new Promise((resolve, reject) => {
+      abort = reject
+    })
+    aborted.catch(() => {})
+
+    const heartbeat = setInterval(() => {
+      db.renewProcessingJobLease(job.id, this.workerId, this.leaseSeconds)
+        .then(row => {
+          if (!row && !leaseLost) {
+            leaseLost = new LeaseLostError(job.id)
+            abort(leaseLost)
+          }
+        })
+        .catch(error => console.error('Job heartbeat error:', error))
+    }, this.heartbeatMs)
+
+    let metadata = job.metadata || {}
+    const report = async ({ stage, progress, metadata: extra }) => {
+      if (leaseLost) throw leaseLost
+      metadata = { ...metadata, ...extra }
+      await this.update(job, {
+        ...(stage && { stage }),
+        ...(progress !== undefined && { progress }),
+        metadata
+      })
+    }
+
+    const started = performance.now()
+    let outcome = 'failed'
+    jobsRunning.inc()
+
+    try {
+      await Promise.race([
+        processLesson(parseInt(job.lesson_id), report, { force: metadata.force }),
+        aborted
+      ])
+
+      await this.update(job, {
+        status: 'completed',
+        stage: 'completed',
+        progress: 100,
+        locked_by: null,
+        lease_expires_at: null,
+        completed_at: new Date().toISOString()
+      })
+      outcome = 'completed'
+    } catch (error) {
+      if (error instanceof LeaseLostError) {
+        // Whoever holds the job now owns its status
+        console.warn(`${error.message}; abandoning the run`)
+        outcome = 'abandoned'
+        return
+      }
+
+      console.error('Processing error:', error)
+      const retry = job.attempts < job.max_attempts
+      outcome = retry ? 'retried' : 'failed'
+
+      await this.update(job, {
+        status: retry ? 'pending' : 'failed',
+        stage: retry ? 'queued' : 'error',
+        error: error.message,
+        locked_by: null,
+        lease_expires_at: null,
+        not_before: retry
+          ? new Date(Date.now() + this.retryDelaySeconds(job.attempts) * 1000).toISOString()
+          : null
+      }).catch(updateError => console.error('Job update error:', updateError))
+    } finally {
+      clearInterval(heartbeat)
+      jobsRunning.dec()
+      runDuration.observe({ outcome }, (performance.now() - started) / 1000)
+    }
+  }
+}
+
+export default new JobWorker()
@@ -0,0 +1,208 @@
+// Lesson Bundle Service
+// Compiles a lesson, its topics and its quiz into one immutable, versioned
+// JSON document in the lesson-bundles bucket, so readers need a single
+// static fetch instead of several API round trips.
+
+import { createHash } from 'crypto'
+import { promisify } from 'util'
+import { gzip, brotliCompress, constants as zlibConstants } from 'zlib'
+import { db, storage } from '@/lib/db'
+import { runAsService } from '@/lib/supabase/server'
+
+const gzipAsync = promisify(gzip)
+const brotliAsync = promisify(brotliCompress)
+
+const BUCKET = 'lesson-bundles'
+const PARTS = ['lesson', 'topics', 'quiz']
+const IMMUTABLE_CACHE = '31536000'
+const LATEST_CACHE = '60'
+const PUBLISH_DEBOUNCE_MS = 2000
+const VERSIONS_KEPT = 2 // Current and previous, for readers mid-fetch
+
+export class LessonBundler {
+  constructor() {
+    this.pending = new Map() // lessonId -> { parts, timer }
+    this.publishing = new Map() // lessonId -> in-flight publish
+  }
+
+  async compileLesson(lessonId) {
+    const lesson = await db.getLessonById(lessonId)
+    return {
+      id: lesson.id,
+      name: lesson.name,
+      lessonNumber: lesson.lesson_number,
+      bookId: lesson.book_id,
+      thumbnail: lesson.thumbnail ?? null
+    }
+  }
+
+  // Same shape as samples/bhuvan/lesson.json
+  async compileTopics(lessonId) {
+    const topics = await db.getLessonTopics(lessonId)
+    return topics.map(topic => ({
+      topicId: topic.topic_id,
+      topic: topic.topic,
+      subtopic: topic.subtopic ?? null,
+      order: topic.order,
+      simplified_explanation: topic.simplified_explanation || []
+    }))
+  }
+
+  async compileQuiz(lessonId) {
+    const sections = await db.getQuizForLesson(lessonId)
+
+    return sections.map(section => ({
+      id: section.id,
+      name: section.name,
+      order: section.order,
+      questions: section.questions.map(question => ({
+        id: question.id,
+        question_type: question.question_type,
+        question: question.question,
+        answer: question.answer,
+        order: question.order
+      }))
+    }))
+  }
+
+  /**
+   * Build the bundle body, recompiling only the dirty parts when a previous
+   * bundle is available
+   * @param {number} lessonId - Lesson ID
+   * @param {Array} parts - Parts to recompile ('lesson', 'topics', 'quiz')
+   * @param {Object|null} previous - Previously published bundle body
+   * @returns {Promise<Object>} { lesson, topics, quiz }
+   */
+  async compile(lessonId, parts = PARTS, previous = null) {
+    const compilers = {
+      lesson: () => this.compileLesson(lessonId),
+      topics: () => this.compileTopics(lessonId),
+      quiz: () => this.compileQuiz(lessonId)
+    }
+
+    const compiled = await Promise.all(PARTS.map(part =>
+      previous && !parts.includes(part) ? previous[part] : compilers[part]()
+    ))
+    return Object.fromEntries(PARTS.map((part, index) => [part, compiled[index]]))
+  }
+
+  /**
+   * Compile and publish a lesson bundle. Unchanged content is not re-uploaded.
+   * @param {number} lessonId - Lesson ID
+   * @param {Object} options - { parts } to recompile only those parts, { force } to re-upload
+   * @returns {Promise<Object>} lesson_bundles row plus { published }
+   */
+  async publish(lessonId, options = {}) {
+    const { parts = PARTS, force = false } = options
+    const current = await db.getLessonBundle(lessonId)
+
+    let previous = null
+    if (current && !force && parts.length < PARTS.length) {
+      previous = await storage.downloadBundle(current.path).catch(error => {
+        console.warn(`Recompiling bundle for lesson ${lessonId} in full:`, error.message)
+        return null
+      })
+    }
+
+    const content = await this.compile(lessonId, previous ? parts : PARTS, previous)
+    const version = createHash('sha256').update(JSON.stringify(content)).digest('hex').slice(0, 16)
+
+    if (current?.version === version && !force) {
+      return { ...current, published: false }
+    }
+
+    const body = JSON.stringify({
+      lessonId,
+      version,
+      publishedAt: new Date().toISOString(),
+      ...content
+    })
+    const [gzipped, brotli] = await Promise.all([
+      gzipAsync(body, { level: 9 }),
+      brotliAsync(body, {
+        params: {
+          [zlibConstants.BROTLI_PARAM_QUALITY]: 11,
+          [zlibConstants.BROTLI_PARAM_SIZE_HINT]: Buffer.byteLength(body)
+        }
+      })
+    ])
+
+    const folder = `lessons/${lessonId}`
+    const path = `${folder}/${version}.json`
+    const json = new Blob([body], { type: 'application/json' })
+    await Promise.all([
+      storage.uploadBundle(path, json, 'application/json', IMMUTABLE_CACHE),
+      storage.uploadBundle(`${path}.gz`, gzipped, 'application/gzip', IMMUTABLE_CACHE),
+      storage.uploadBundle(`${path}.br`, brotli, 'application/x-brotli', IMMUTABLE_CACHE),
+      // Stable, short-lived alias for readers that don't track versions
+      storage.uploadBundle(`${folder}/latest.json`, json, 'application/json', LATEST_CACHE)
+    ])
+
+    const row = await db.upsertLessonBundle({
+      lesson_id: lessonId,
+      version,
+      previous_version: current?.version ?? null,
+      path,
+      url: storage.getPublicUrl(BUCKET, path),
+      size: Buffer.byteLength(body),
+      gzip_size: gzipped.length,
+      brotli_size: brotli.length,
+      published_at: new Date().toISOString()
+    })
+
+    await this.pruneVersions(folder, [version, current?.version].slice(0, VERSIONS_KEPT))
+      .catch(error => console.error('Bundle prune error:', error))
+
+    return { ...row, published: true }
+  }
+
+  async pruneVersions(folder, keep) {
+    const files = await storage.listFiles(BUCKET, folder)
+    const stale = files
+      .map(file => file.name)
+      .filter(name => name !== 'latest.json' && !keep.some(version => version && name.startsWith(`${version}.json`)))
+    if (stale.length > 0) {
+      await storage.removeFiles(BUCKET, stale.map(name => `${folder}/${name}`))
+    }
+  }
+
+  /**
+   * Republish a lesson shortly after its content changes. Edits arriving
+   * within the debounce window are folded into one publish.
+   * @param {number} lessonId - Lesson ID
+   * @param {Array} parts - Parts that changed
+   */
+  schedule(lessonId, parts = PARTS) {
+    const key = String(lessonId)
+    const pending = this.pending.get(key) || { parts: new Set() }
+    parts.forEach(part => pending.parts.add(part))
+    clearTimeout(pending.timer)
+
+    // Runs after the editing request has finished, with the service client
+    pending.timer = runAsService(() => setTimeout(() => {
+      this.pending.delete(key)
+      // Publishes for one lesson run one at a time so versions land in order
+      const previous = this.publishing.get(key) || Promise.resolve()
+      const next = previous
+        .then(() => this.publish(parseInt(lessonId), { parts: [...pending.parts] }))
+        .catch(error => console.error(`Bundle publish error for lesson ${lessonId}:`, error))
+        .finally(() => {
+          if (this.publishing.get(key) === next) this.publishing.delete(key)
+        })
+      this.publishing.set(key, next)
+    }, PUBLISH_DEBOUNCE_MS))
+
+    this.pending.set(key, pending)
+  }
+
+  /**
+   * Schedule a quiz republish for the lesson owning a quiz section
+   * @param {number|string} sectionId - Quiz section ID
+   */
+  async scheduleForSection(sectionId) {
+    const section = await db.getQuizSectionById(sectionId)
+    this.schedule(section.lesson_id, ['quiz'])
+  }
+}
+
+export default new LessonBundler()
@@ -0,0 +1,346 @@
+// Lesson Processing Pipeline
+// PDF extraction -> OCR -> AI segmentation -> TTS -> audio stitching -> database save -> bundle publish
+//
+// Stages run concurrently and are joined by bounded queues: pages are OCR'd
+// while later pages are still being rendered, and topics are voiced as soon
+// as segmentation hands them over. Page images are released once OCR'd, so
+// memory is bounded by the queue sizes rather than the size of the book.
+//
+// Page images, per-page OCR results, segmentation output and joined topic
+// audio are checkpointed, so a re-run only repeats the paid OCR/LLM calls for
+// pages that changed.
+
+import { db } from '@/lib/db'
+import { BoundedQueue } from '@/lib/concurrency'
+import { StageSpans, pagesTotal, segmentsTotal } from '@/lib/metrics'
+import pdfProcessor from '@/lib/services/pdfProcessor'
+import ocrService from '@/lib/services/ocrService'
+import aiSegmentation from '@/lib/services/aiSegmentation'
+import ttsService from '@/lib/services/ttsService'
+import checkpoints from '@/lib/services/pipelineCheckpoints'
+import lessonBundle from '@/lib/services/lessonBundle'
+import imageProcessor, { ImageDeduper } from '@/lib/services/imageProcessor'
+import audioStitcher from '@/lib/services/audioStitcher'
+
+const STAGES = ['pdf_extraction', 'ocr_processing', 'ai_segmentation', 'tts_generation', 'database_save']
+const PAGE_BUFFER = parseInt(process.env.PIPELINE_PAGE_BUFFER) || 4
+const TOPIC_BUFFER = 4
+const TTS_TOPIC_WORKERS = 2
+
+/**
+ * Run `workers` consumers over a queue until it is drained
+ * @param {BoundedQueue} queue - Queue to consume
+ * @param {number} workers - Number of concurrent consumers
+ * @param {Function} fn - Async function called per item
+ */
+async function consume(queue, workers, fn) {
+  await Promise.all(Array.from({ length: Math.max(1, workers) }, async () => {
+    for await (const item of queue) {
+      await fn(item)
+    }
+  }))
+}
+
+/**
+ * Read the process-wide service counters
+ * @returns {Object} { ttsCache, llmCache, images, audio }
+ */
+function serviceStats() {
+  return {
+    ttsCache: ttsService.getCacheStats(),
+    llmCache: aiSegmentation.getCacheStats(),
+    images: imageProcessor.getStats(),
+    audio: audioStitcher.getStats()
+  }
+}
+
+/**
+ * Counters accumulated since a serviceStats() snapshot, so a job reports its own
+ * work rather than process-lifetime totals. Jobs running at the same time in one
+ * process share the counters, so their deltas can overlap.
+ * @param {Object} before - Snapshot taken when the run started
+ * @returns {Object} { ttsCache, llmCache, images, audio }
+ */
+function serviceStatsSince(before) {
+  return Object.fromEntries(Object.entries(serviceStats()).map(([service, stats]) => {
+    const delta = {}
+    for (const [key, value] of Object.entries(stats)) {
+      // memoryEntries is a current size, not a counter
+      delta[key] = typeof value === 'number' && key !== 'memoryEntries'
+        ? value - (before[service][key] || 0)
+        : value
+    }
+    if ('hitRate' in delta) {
+      const lookups = delta.hits + delta.misses
+      delta.hitRate = lookups > 0 ? delta.hits / lookups : 0
+    }
+    if ('savedBytes' in delta) {
+      delta.savedBytes = Math.max(0, delta.sourceBytes - delta.storedBytes)
+    }
+    return [service, delta]
+  }))
+}
+
+/**
+ * Segment the lesson, reusing the previous segmentation where possible.
+ * Only topics drawn from changed pages are re-segmented; the rest are kept.
+ * @param {number} lessonId - Lesson ID
+ * @param {Array} ocrResults - OCR results in page order, with contentHash
+ * @param {boolean} force - Ignore the previous segmentation
+ * @returns {Promise<Object>} { topics, segmentation: 'reused' | 'partial' | 'full', report }
+ */
+async function segmentWithCheckpoint(lessonId, ocrResults, force) {
+  const pageHashes = Object.fromEntries(ocrResults.map(r => [r.pageNumber, r.contentHash]))
+  // Keyed like the LLM cache: a different model, prompt or windowing re-segments
+  const settingsHash = checkpoints.hash(aiSegmentation.fingerprint())
+  const inputHash = checkpoints.hash(settingsHash, pageHashes)
+  const previous = force ? null : (await checkpoints.load(lessonId, 'segmentation')).get('topics')
+
+  if (previous?.input_hash === inputHash) {
+    return { topics: previous.data.topics, segmentation: 'reused', report: null }
+  }
+
+  let report = null
+  const segment = async (results) => {
+    // A forced run also skips cached model responses
+    const segmented = await aiSegmentation.segment(results, { bypassCache: force })
+    report = segmented.report
+    // Images repeated across many pages (logos, headers) aren't lesson content
+    const detectedImages = results
+      .flatMap(r => (r.detectedImages || []).map(image => ({ ...image, pageNumber: r.pageNumber })))
+      .filter(imageProcessor.boilerplateFilter(ocrResults))
+    const textBlocks = results.flatMap(r => (r.textBlocks || []).map(block => ({ ...block, pageNumber: r.pageNumber })))
+    return aiSegmentation.mapImagesToSegments(segmented.topics, detectedImages, { textBlocks, bypassCache: force })
+  }
+
+  let topics
+  let segmentation = 'full'
+
+  // Only topics segmented with the same settings are kept around changed pages
+  if (previous && previous.data.settingsHash === settingsHash) {
+    const changed = checkpoints.changedPages(previous.data.pageHashes, pageHashes)
+    const affected = previous.data.topics.filter(topic =>
+      !topic.pages?.length || topic.pages.some(page => changed.has(page))
+    )
+
+    if (affected.length < previous.data.topics.length) {
+      const pages = new Set([...changed, ...affected.flatMap(topic => topic.pages)])
+      const results = ocrResults.filter(r => pages.has(r.pageNumber))
+      const replacement = results.length > 0 ? await segment(results) : []
+      topics = checkpoints.spliceTopics(previous.data.topics, affected, replacement)
+      segmentation = 'partial'
+    }
+  }
+
+  if (!topics) {
+    topics = await segment(ocrResults)
+  }
+
+  await checkpoints.save(lessonId, 'segmentation', [{
+    key: 'topics',
+    inputHash,
+    data: { topics, pageHashes, settingsHash }
+  }])
+
+  return { topics, segmentation, report }
+}
+
+/**
+ * Run the full processing pipeline for a lesson
+ * @param {number} lessonId - Lesson to process
+ * @param {Function} onProgress - Called with { stage, progress, metadata } updates
+ * @param {Object} options - { force } to ignore checkpoints from earlier runs
+ * @returns {Promise<Object>} { topicsCount }
+ */
+export async function processLesson(lessonId, onProgress = async () => {}, options = {}) {
+  const { force = false } = options
+  console.log(`Starting processing for lesson ${lessonId}...`)
+  const statsAtStart = serviceStats()
+
+  const [pageImageCheckpoints, ocrCheckpoints, topicAudioCheckpoints] = await Promise.all([
+    checkpoints.load(lessonId, 'page_image'),
+    checkpoints.load(lessonId, 'ocr'),
+    checkpoints.load(lessonId, 'topic_audio')
+  ])
+
+  const pageQueue = new BoundedQueue(PAGE_BUFFER)
+  const topicQueue = new BoundedQueue(TOPIC_BUFFER)
+  const queues = [pageQueue, topicQueue]
+
+  let currentStage = -1
+  const enterStage = async (stage, progress, metadata) => {
+    // Stages overlap, so only report forward transitions
+    const index = STAGES.indexOf(stage)
+    if (index <= currentStage) return
+    currentStage = index
+    await onProgress({ stage, progress, metadata })
+  }
+
+  // Failing one stage unblocks and fails every other stage
+  const stage = (promise) => promise.catch(error => {
+    queues.forEach(queue => queue.abort(error))
+    throw error
+  })
+
+  let pagesExtracted = 0
+  let pagesProcessed = 0
+  let pagesReused = 0
+  const ocrResults = []
+  const voicedTopics = []
+  const topicAudio = new Map() // topicId -> joined audio path
+  const segmentAudio = new Set() // Lesson copies of audio that wasn't joined
+  const images = new ImageDeduper()
+  const spans = new StageSpans()
+
+  // Stage 1: Extract page images
+  const extraction = stage(spans.run('pdf_extraction', async () => {
+    await enterStage('pdf_extraction', 10)
+
+    for await (const page of pdfProcessor.streamPageImages(null)) {
+      pagesExtracted++
+      await checkpoints.checkpointPageImage(lessonId, page, force ? new Map() : pageImageCheckpoints)
+      await pageQueue.push(page)
+    }
+    pageQueue.close()
+
+    await checkpoints.prune(lessonId, 'page_image', pageImageCheckpoints, new Set(
+      Array.from({ length: pagesExtracted }, (_, i) => `page-${i + 1}`)
+    ))
+
+    await onProgress({ metadata: { totalPages: pagesExtracted } })
+  }))
+
+  // Stage 2: OCR Processing, then AI Segmentation once every page is read
+  const recognition = stage((async () => {
+    await consume(pageQueue, ocrService.concurrency, async (page) => {
+      spans.start('ocr_processing')
+      await enterStage('ocr_processing', 30)
+
+      // OCR results are keyed by page content, so moved or unchanged pages are free
+      const checkpoint = !force && ocrCheckpoints.get(page.contentHash)
+      let result
+      if (checkpoint) {
+        result = { ...checkpoint.data, pageNumber: page.pageNumber }
+        images.register(result.detectedImages)
+        pagesReused++
+        pagesTotal.inc({ source: 'checkpoint' })
+      } else {
+        result = await ocrService.processPageWithRetry(page)
+        result.detectedImages = await imageProcessor.processDetectedImages(
+          lessonId, page, result.detectedImages, images
+        )
+        await checkpoints.save(lessonId, 'ocr', [{
+          key: page.contentHash,
+          inputHash: page.contentHash,
+          data: result
+        }])
+        pagesTotal.inc({ source: 'ocr' })
+      }
+      result.contentHash = page.contentHash
+      page.imageBlob = null // Release the rendered page
+      ocrResults.push(result)
+      pagesProcessed++
+
+      await onProgress({
+        progress: 30 + Math.round(20 * pagesProcessed / Math.max(pagesExtracted, pagesProcessed)),
+        metadata: { pagesProcessed, pagesReused }
+      })
+    })
+
+    ocrResults.sort((a, b) => a.pageNumber - b.pageNumber)
+    await checkpoints.prune(lessonId, 'ocr', ocrCheckpoints, new Set(ocrResults.map(r => r.contentHash)))
+    spans.end('ocr_processing')
+
+    await enterStage('ai_segmentation', 60)
+
+    const { topics, segmentation, report } = await spans.run('ai_segmentation', () =>
+      segmentWithCheckpoint(lessonId, ocrResults, force)
+    )
+    segmentsTotal.inc({}, topics.reduce((sum, topic) => sum + topic.simplifiedExplanation.length, 0))
+
+    await onProgress({
+      progress: 70,
+      metadata: { topicsCount: topics.length, segmentation, segmentationReport: report }
+    })
+
+    for (const topic of topics) {
+      await topicQueue.push(topic)
+    }
+    topicQueue.close()
+  })())
+
+  // Stage 3: TTS Generation as topics arrive, then one audio file per topic
+  const narration = stage(consume(topicQueue, TTS_TOPIC_WORKERS, async (topic) => {
+    spans.start('tts_generation')
+    await enterStage('tts_generation', 75)
+
+    const audio = await ttsService.generateSegmentsAudio(topic.simplifiedExplanation)
+    topic.simplifiedExplanation.forEach((segment, index) => {
+      segment.audioSrcUrl = audio[index].audioUrl
+    })
+
+    spans.start('audio_stitching')
+    const path = await audioStitcher.stitchTopic(
+      lessonId, topic, audio, force ? new Map() : topicAudioCheckpoints
+    )
+    if (path) {
+      topicAudio.set(topic.topicId, path)
+    } else {
+      const copies = await audioStitcher.linkSegments(lessonId, topic, audio)
+      copies.forEach(copy => segmentAudio.add(copy))
+    }
+    voicedTopics.push(topic)
+  }).then(() => spans.end('tts_generation')))
+
+  await Promise.all([extraction, recognition, narration])
+
+  spans.end('audio_stitching')
+
+  await onProgress({
+    progress: 90,
+    metadata: {
+      ...serviceStatsSince(statsAtStart),
+      stageTimings: spans.toJSON()
+    }
+  })
+
+  // Stage 4: Save to Database
+  await enterStage('database_save', 95)
+
+  const bundleVersion = await spans.run('database_save', async () => {
+    voicedTopics.sort((a, b) => a.order - b.order)
+
+    // Topics and num_topics are written together in a single transaction
+    await db.createLessonTopics(lessonId, voicedTopics.map(topic => ({
+      topic_id: topic.topicId,
+      topic: topic.topic,
+      subtopic: topic.subtopic,
+      order: topic.order,
+      simplified_explanation: topic.simplifiedExplanation
+    })))
+
+    // The lesson is saved either way; a failed publish can be retried from the bundle API
+    try {
+      const bundle = await lessonBundle.publish(lessonId, { parts: ['lesson', 'topics'] })
+      return bundle.version
+    } catch (error) {
+      console.error(`Bundle publish error for lesson ${lessonId}:`, error)
+      return null
+    }
+  })
+
+  // Saved topics and the published bundle no longer link to audio from
+  // earlier runs; until both succeed, that audio is kept for the next run
+  if (bundleVersion !== null) {
+    try {
+      await audioStitcher.prune(lessonId, topicAudioCheckpoints, topicAudio, segmentAudio)
+    } catch (error) {
+      console.error(`Audio prune error for lesson ${lessonId}:`, error)
+    }
+  }
+
+  await onProgress({ metadata: { bundleVersion, stageTimings: spans.toJSON() } })
+
+  console.log(`Processing completed for lesson ${lessonId}`)
+  return { topicsCount: voicedTopics.length }
+}
@@ -0,0 +1,136 @@
+// LLM Response Cache
+// Persistent cache of model responses, keyed by task + model + prompt + input
+
+import { createHash } from 'crypto'
+import { db } from '@/lib/db'
+
+export class LLMCache {
+  constructor() {
+    this.ttlMs = (parseFloat(process.env.LLM_CACHE_TTL_HOURS) || 720) * 60 * 60 * 1000
+    this.maxEntries = parseInt(process.env.LLM_CACHE_MAX_ENTRIES) || 5000
+    this.maxMemoryEntries = 200
+    this.evictEvery = 50 // Run persistent eviction every N inserts
+    this.memory = new Map() // Insertion order doubles as LRU order
+    this.stats = { hits: 0, misses: 0, bypassed: 0, inserts: 0, evictions: 0 }
+  }
+
+  /**
+   * Build the cache key for a model request
+   * @param {string} task - 'segmentation' or 'image_mapping'
+   * @param {string} model - Model id
+   * @param {string} prompt - Full prompt
+   * @param {any} input - Any other input that shapes the response (e.g. page numbers)
+   * @returns {string} Hex sha256 digest
+   */
+  cacheKey(task, model, prompt, input = null) {
+    return createHash('sha256')
+      .update(JSON.stringify([task, model, prompt, input]))
+      .digest('hex')
+  }
+
+  remember(key, entry) {
+    this.memory.delete(key)
+    this.memory.set(key, entry)
+
+    while (this.memory.size > this.maxMemoryEntries) {
+      const oldest = this.memory.keys().next().value
+      this.memory.delete(oldest)
+    }
+  }
+
+  /**
+   * Look up a cached response, checking memory before the database
+   * @param {string} key - Cache key
+   * @param {Object} options - { bypass } to skip the lookup (forced re-runs)
+   * @returns {Promise<Object|null>} Cache entry or null
+   */
+  async get(key, options = {}) {
+    if (options.bypass) {
+      this.stats.bypassed++
+      return null
+    }
+
+    const local = this.memory.get(key)
+    if (local && new Date(local.expires_at) > new Date()) {
+      this.remember(key, local)
+      this.stats.hits++
+      return local
+    }
+    this.memory.delete(key)
+
+    const entry = await db.getLlmCacheEntry(key)
+    if (!entry) {
+      this.stats.misses++
+      return null
+    }
+
+    this.remember(key, entry)
+    this.stats.hits++
+    db.touchLlmCacheEntry(key).catch(error => console.error('LLM cache touch error:', error))
+    return entry
+  }
+
+  /**
+   * Record a model response
+   * @param {string} key - Cache key
+   * @param {Object} value - { task, model, response, usage }
+   * @returns {Promise<Object|null>} Stored entry, or null if the write failed
+   */
+  async set(key, value) {
+    try {
+      const now = Date.now()
+      const entry = await db.upsertLlmCacheEntry({
+        cache_key: key,
+        task: value.task,
+        model: value.model,
+        response: value.response,
+        usage: value.usage,
+        expires_at: new Date(now + this.ttlMs).toISOString(),
+        last_used_at: new Date(now).toISOString()
+      })
+
+      this.remember(key, entry)
+      this.stats.inserts++
+
+      if (this.stats.inserts % this.evictEvery === 0) {
+        await this.evict()
+      }
+      return entry
+    } catch (error) {
+      // A failed cache write only costs a repeat call next time
+      console.error('LLM cache write error:', error)
+      return null
+    }
+  }
+
+  /**
+   * Drop expired entries and least recently used entries beyond maxEntries
+   * @returns {Promise<number>} Number of entries evicted
+   */
+  async evict() {
+    try {
+      const evicted = await db.evictLlmCacheEntries(this.maxEntries)
+      evicted.forEach(key => this.memory.delete(key))
+      this.stats.evictions += evicted.length
+      return evicted.length
+    } catch (error) {
+      console.error('LLM cache eviction error:', error)
+      return 0
+    }
+  }
+
+  /**
+   * Get hit/miss counters
+   * @returns {Object} Cache statistics
+   */
+  getStats() {
+    const lookups = this.stats.hits + this.stats.misses
+    return {
+      ...this.stats,
+      hitRate: lookups > 0 ? this.stats.hits / lookups : 0,
+      memoryEntries: this.memory.size
+    }
+  }
+}
+
+export default new LLMCache()
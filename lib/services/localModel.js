@@ -0,0 +1,134 @@
+// Local Language Model
+// Deterministic stand-in for the segmentation and image-mapping model calls.
+// Answers with the same JSON the prompts ask for, derived only from its
+// input, so the response cache and the pipeline can run offline.
+
+import { estimateTokens, isHeading } from '@/lib/text'
+
+const MAX_SEGMENTS_PER_TOPIC = 6
+const MAX_SIMPLIFIED_LENGTH = 200
+
+function slugify(text) {
+  return text.toLowerCase().replace(/[^a-z0-9]+/g, '-').replace(/^-|-$/g, '') || 'topic'
+}
+
+// First sentence, trimmed to a student-friendly length
+function simplify(paragraph) {
+  const sentence = paragraph.match(/^.*?[.!?](\s|$)/)?.[0] || paragraph
+  const text = sentence.replace(/\s+/g, ' ').trim()
+  return text.length > MAX_SIMPLIFIED_LENGTH
+    ? `${text.slice(0, MAX_SIMPLIFIED_LENGTH - 1).trimEnd()}…`
+    : text
+}
+
+export class LocalLanguageModel {
+  constructor() {
+    this.id = 'local-stand-in-v1'
+  }
+
+  /**
+   * Answer a model request
+   * @param {string} task - 'segmentation' or 'image_mapping'
+   * @param {string} prompt - Prompt the real model would receive (counted for usage only)
+   * @param {Object} input - Structured input for the task
+   * @returns {Promise<Object>} { content, usage }
+   */
+  async complete(task, prompt, input) {
+    const content = task === 'segmentation'
+      ? this.segment(input.pages)
+      : this.mapImages(input.segments, input.images)
+
+    return {
+      content,
+      usage: {
+        promptTokens: estimateTokens(prompt),
+        completionTokens: estimateTokens(JSON.stringify(content))
+      }
+    }
+  }
+
+  /**
+   * One topic per heading, one segment per paragraph; long sections are
+   * continued in further parts
+   * @param {Array} pages - [{ pageNumber, text }]
+   * @returns {Object} { topics: [{ topicId, topic, subtopic, order, pages, segments }] }
+   */
+  segment(pages) {
+    const topics = []
+    let current = null
+
+    const startTopic = (title) => {
+      current = { topic: title, subtopic: null, pages: [], segments: [], part: 1 }
+      topics.push(current)
+    }
+
+    for (const page of pages) {
+      const paragraphs = (page.text || '').split(/\n\s*\n/).map(p => p.trim()).filter(Boolean)
+
+      for (const paragraph of paragraphs) {
+        const [firstLine, ...rest] = paragraph.split('\n')
+        let body = paragraph
+
+        if (isHeading(firstLine)) {
+          startTopic(firstLine.replace(/^#+\s*/, '').trim())
+          body = rest.join('\n').trim()
+        } else if (!current) {
+          startTopic('Introduction')
+        } else if (current.segments.length >= MAX_SEGMENTS_PER_TOPIC) {
+          const { topic, part } = current
+          startTopic(topic)
+          current.subtopic = `Part ${part + 1}`
+          current.part = part + 1
+        }
+
+        if (!current.pages.includes(page.pageNumber)) {
+          current.pages.push(page.pageNumber)
+        }
+        if (body) {
+          current.segments.push({ originalText: body, text: simplify(body) })
+        }
+      }
+    }
+
+    const seen = new Set()
+    return {
+      topics: topics
+        .filter(topic => topic.segments.length > 0)
+        .map((topic, index) => {
+          let topicId = slugify(topic.subtopic ? `${topic.topic} ${topic.subtopic}` : topic.topic)
+          for (let n = 2; seen.has(topicId); n++) {
+            topicId = `${slugify(topic.topic)}-${n}`
+          }
+          seen.add(topicId)
+          return {
+            topicId,
+            topic: topic.topic,
+            subtopic: topic.subtopic,
+            order: index + 1,
+            pages: topic.pages,
+            segments: topic.segments
+          }
+        })
+    }
+  }
+
+  /**
+   * Spread images evenly across segments, in reading order. Every image gets
+   * one segment; with more images than segments, segments share.
+   * @param {Array} segments - [{ topic, segment, topicSegments }]
+   * @param {Array} images - [{ index, description, page }]
+   * @returns {Object} { assignments: [{ topic, segment, image }] }
+   */
+  mapImages(segments, images) {
+    if (images.length === 0 || segments.length === 0) return { assignments: [] }
+
+    return {
+      assignments: images.map((image, i) => {
+        const { topic, segment } = segments[Math.floor(i * segments.length / images.length)]
+        return { topic, segment, image: image.index }
+      })
+    }
+  }
+}
+
+export default new LocalLanguageModel()
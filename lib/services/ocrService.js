@@ -1,9 +1,18 @@
 // Google Cloud Vision OCR Service
 
+import { TokenBucket, mapWithConcurrency, withRetry } from '@/lib/concurrency'
+import { timeCall } from '@/lib/metrics'
+
 export class OCRService {
   constructor() {
     this.apiKey = process.env.GOOGLE_CLOUD_VISION_API_KEY
     this.projectId = process.env.GOOGLE_CLOUD_PROJECT_ID
+    this.provider = process.env.OCR_PROVIDER || 'mock' // 'vision' or 'mock'
+    this.baseUrl = process.env.GOOGLE_VISION_BASE_URL || 'https://vision.googleapis.com'
+    this.concurrency = parseInt(process.env.OCR_CONCURRENCY) || 5
+    this.requestsPerSecond = parseFloat(process.env.OCR_REQUESTS_PER_SECOND) || 10
+    this.maxRetries = 4
+    this.rateLimiter = new TokenBucket(this.requestsPerSecond)
   }
 
   /**
@@ -15,12 +24,12 @@ export class OCRService {
   async processPageImage(imageData, pageNumber) {
     try {
       console.log(`OCR Processing: Page ${pageNumber}...`)
+
+      if (this.provider === 'vision') {
+        return await this.annotate(imageData, pageNumber)
+      }
       
-      // Mock implementation - replace with actual Google Vision API call
-      // In production, you would:
-      // 1. Convert image to base64
-      // 2. Call Vision API with document_text_detection
-      // 3. Parse response for text blocks and image regions
+      // Mock implementation, used unless OCR_PROVIDER=vision
       
       const mockResult = {
         pageNumber,
@@ -51,24 +60,113 @@ export class OCRService {
       return mockResult
     } catch (error) {
       console.error('OCR Processing Error:', error)
-      throw new Error(`Failed to process OCR for page ${pageNumber}: ${error.message}`)
+      const wrapped = new Error(`Failed to process OCR for page ${pageNumber}: ${error.message}`)
+      wrapped.status = error.status
+      throw wrapped
     }
   }
 
   /**
-   * Batch process multiple pages
-   * @param {Array} pages - Array of page images
-   * @returns {Promise<Array>} Array of OCR results
+   * Call Vision document text detection and convert the response into
+   * page text, text blocks and picture regions
+   * @param {Blob|Buffer|null} imageData - Page image
+   * @param {number} pageNumber - Page number for reference
+   * @returns {Promise<Object>} OCR result
    */
-  async batchProcessPages(pages) {
-    const results = []
-    
-    for (const page of pages) {
-      const result = await this.processPageImage(page.imageBlob, page.pageNumber)
-      results.push(result)
+  async annotate(imageData, pageNumber) {
+    const content = imageData
+      ? Buffer.from(Buffer.isBuffer(imageData) ? imageData : await imageData.arrayBuffer()).toString('base64')
+      : ''
+    const started = Date.now()
+
+    const response = await fetch(`${this.baseUrl}/v1/images:annotate?key=${this.apiKey}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        requests: [{ image: { content }, features: [{ type: 'DOCUMENT_TEXT_DETECTION' }] }]
+      })
+    })
+
+    if (!response.ok) {
+      const error = new Error(`Vision request failed: ${response.status} ${await response.text()}`)
+      error.status = response.status
+      const retryAfter = parseFloat(response.headers.get('retry-after'))
+      if (retryAfter) error.retryAfterMs = retryAfter * 1000
+      throw error
+    }
+
+    const annotation = (await response.json()).responses?.[0]?.fullTextAnnotation || {}
+    const toBox = (vertices = []) => {
+      const xs = vertices.map(v => v.x || 0)
+      const ys = vertices.map(v => v.y || 0)
+      return {
+        x: Math.min(...xs),
+        y: Math.min(...ys),
+        width: Math.max(...xs) - Math.min(...xs),
+        height: Math.max(...ys) - Math.min(...ys)
+      }
+    }
+    const blockText = (block) => (block.paragraphs || [])
+      .map(paragraph => (paragraph.words || [])
+        .map(word => (word.symbols || []).map(symbol => symbol.text).join(''))
+        .join(' '))
+      .join('\n')
+
+    const blocks = annotation.pages?.[0]?.blocks || []
+    return {
+      pageNumber,
+      fullText: annotation.text || '',
+      textBlocks: blocks
+        .filter(block => block.blockType === 'TEXT')
+        .map(block => ({
+          text: blockText(block),
+          confidence: block.confidence,
+          boundingBox: toBox(block.boundingBox?.vertices)
+        })),
+      detectedImages: blocks
+        .filter(block => block.blockType === 'PICTURE')
+        .map(block => ({
+          description: 'Picture',
+          boundingBox: toBox(block.boundingBox?.vertices),
+          confidence: block.confidence
+        })),
+      confidence: annotation.pages?.[0]?.confidence ?? null,
+      processingTime: (Date.now() - started) / 1000
     }
-    
-    return results
+  }
+
+  /**
+   * Process one page through the shared rate limiter, retrying quota
+   * rejections with exponential backoff
+   * @param {Object} page - {pageNumber, imageBlob}
+   * @param {Object} options - { maxRetries }
+   * @returns {Promise<Object>} OCR result
+   */
+  async processPageWithRetry(page, options = {}) {
+    const { maxRetries = this.maxRetries } = options
+
+    return withRetry(async () => {
+      await this.rateLimiter.take()
+      return timeCall('ocr', 'process_page', () => this.processPageImage(page.imageBlob, page.pageNumber))
+    }, { retries: maxRetries })
+  }
+
+  /**
+   * Batch process multiple pages with bounded concurrency.
+   * Calls share a token bucket so bursts stay under the Vision API quota,
+   * and quota rejections are retried with exponential backoff.
+   * @param {Array} pages - Array of page images
+   * @param {Object} options - { concurrency, maxRetries }
+   * @returns {Promise<Array>} Array of OCR results in page order
+   */
+  async batchProcessPages(pages, options = {}) {
+    const { concurrency = this.concurrency } = options
+
+    const ordered = [...pages].sort((a, b) => a.pageNumber - b.pageNumber)
+
+    return mapWithConcurrency(ordered, concurrency, (page) =>
+      this.processPageWithRetry(page, options)
+    )
   }
 }
 
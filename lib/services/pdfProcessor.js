@@ -1,43 +1,79 @@
 // PDF Processing Service
 // Extracts images from PDF pages
 
+import { createHash } from 'crypto'
+
 export class PDFProcessor {
   constructor() {
     this.maxPages = 100 // Safety limit
+    // Pages are rendered once, at the width OCR needs; smaller WebP variants
+    // for the app are derived from this render
+    this.renderWidth = parseInt(process.env.OCR_RENDER_WIDTH) || 1600
   }
 
   /**
-   * Convert PDF to images using pdf.js
+   * Render PDF pages to images one at a time using pdf.js.
+   * Only the page being rendered is held in memory by this generator.
    * @param {File|Buffer} pdfFile - PDF file to process
-   * @returns {Promise<Array>} Array of {pageNumber, imageBlob, width, height}
+   * @yields {Object} {pageNumber, imageBlob, contentHash, width, height}
    */
-  async extractPageImages(pdfFile) {
+  async *streamPageImages(pdfFile) {
     try {
-      // For now, return a mock structure
+      // For now, yield a mock structure
       // In production, you'd use pdf.js or a server-side library
-      console.log('PDF Processing: Extracting page images...')
+      console.log('PDF Processing: Streaming page images...')
       
       // Mock implementation - replace with actual pdf.js processing
-      const pageCount = 5 // Mock page count
-      const pages = []
+      const pageCount = Math.min(5, this.maxPages) // Mock page count
       
       for (let i = 1; i <= pageCount; i++) {
-        pages.push({
+        const imageBlob = null // Would be actual image blob from pdf.js
+        yield {
           pageNumber: i,
-          imageBlob: null, // Would be actual image blob from pdf.js
-          width: 1920,
-          height: 2560,
+          imageBlob,
+          contentHash: await this.hashPageImage(imageBlob, `mock-page-${i}`),
+          width: this.renderWidth,
+          height: Math.round(this.renderWidth * 4 / 3),
           status: 'extracted'
-        })
+        }
       }
-      
-      return pages
     } catch (error) {
       console.error('PDF Processing Error:', error)
       throw new Error(`Failed to extract images from PDF: ${error.message}`)
     }
   }
 
+  /**
+   * Hash a rendered page so unchanged pages can reuse earlier results
+   * @param {Blob|null} imageBlob - Rendered page image
+   * @param {string} fallback - Value hashed when there is no image data
+   * @returns {Promise<string>} Hex sha256 digest
+   */
+  async hashPageImage(imageBlob, fallback = '') {
+    const hash = createHash('sha256')
+    if (imageBlob) {
+      hash.update(Buffer.from(await imageBlob.arrayBuffer()))
+    } else {
+      hash.update(fallback)
+    }
+    return hash.digest('hex')
+  }
+
+  /**
+   * Convert PDF to images using pdf.js
+   * @param {File|Buffer} pdfFile - PDF file to process
+   * @returns {Promise<Array>} Array of {pageNumber, imageBlob, width, height}
+   */
+  async extractPageImages(pdfFile) {
+    const pages = []
+    
+    for await (const page of this.streamPageImages(pdfFile)) {
+      pages.push(page)
+    }
+    
+    return pages
+  }
+
   /**
    * Get PDF metadata
    * @param {File|Buffer} pdfFile - PDF file
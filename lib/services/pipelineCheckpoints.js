@@ -0,0 +1,154 @@
+// Pipeline Checkpoint Service
+// Per-stage artifacts that let a re-run skip work whose inputs have not changed
+
+import { createHash } from 'crypto'
+import { db } from '@/lib/db'
+import imageProcessor from '@/lib/services/imageProcessor'
+
+export class PipelineCheckpoints {
+  /**
+   * Hash any JSON-serializable inputs
+   * @param {...any} parts - Values identifying a stage input
+   * @returns {string} Hex sha256 digest
+   */
+  hash(...parts) {
+    return createHash('sha256').update(JSON.stringify(parts)).digest('hex')
+  }
+
+  /**
+   * Load a lesson's artifacts for one stage
+   * @param {number} lessonId - Lesson ID
+   * @param {string} stage - 'page_image', 'ocr', 'segmentation' or 'topic_audio'
+   * @returns {Promise<Map>} artifact_key -> artifact row
+   */
+  async load(lessonId, stage) {
+    const artifacts = await db.getPipelineArtifacts(lessonId, stage)
+    return new Map(artifacts.map(artifact => [artifact.artifact_key, artifact]))
+  }
+
+  /**
+   * Save artifacts for one stage
+   * @param {number} lessonId - Lesson ID
+   * @param {string} stage - Stage name
+   * @param {Array} artifacts - Array of { key, inputHash, data, storagePath }
+   */
+  async save(lessonId, stage, artifacts) {
+    if (artifacts.length === 0) return
+
+    await db.upsertPipelineArtifacts(artifacts.map(artifact => ({
+      lesson_id: lessonId,
+      stage,
+      artifact_key: artifact.key,
+      input_hash: artifact.inputHash,
+      data: artifact.data ?? null,
+      storage_path: artifact.storagePath ?? null,
+      updated_at: new Date().toISOString()
+    })))
+  }
+
+  /**
+   * Delete artifacts that the current run no longer produces
+   * @param {number} lessonId - Lesson ID
+   * @param {string} stage - Stage name
+   * @param {Map} existing - Artifacts loaded at the start of the run
+   * @param {Set} keep - Keys produced by the current run
+   */
+  async prune(lessonId, stage, existing, keep) {
+    const stale = [...existing.keys()].filter(key => !keep.has(key))
+    if (stale.length > 0) {
+      await db.deletePipelineArtifacts(lessonId, stage, stale)
+    }
+  }
+
+  /**
+   * Store a rendered page's WebP variants unless an identical page is already stored
+   * @param {number} lessonId - Lesson ID
+   * @param {Object} page - { pageNumber, imageBlob, contentHash }
+   * @param {Map} existing - Page image artifacts from the previous run
+   * @returns {Promise<boolean>} Whether the page changed
+   */
+  async checkpointPageImage(lessonId, page, existing) {
+    const key = `page-${page.pageNumber}`
+    if (existing.get(key)?.input_hash === page.contentHash) return false
+
+    const variants = await imageProcessor.uploadPageVariants(lessonId, page)
+
+    await this.save(lessonId, 'page_image', [{
+      key,
+      inputHash: page.contentHash,
+      data: { width: page.width, height: page.height, variants },
+      storagePath: variants?.display || null
+    }])
+    return true
+  }
+
+  /**
+   * Page numbers whose content differs between two runs (including added or removed pages)
+   * @param {Object} previous - pageNumber -> contentHash from the earlier run
+   * @param {Object} current - pageNumber -> contentHash for this run
+   * @returns {Set<number>} Changed page numbers
+   */
+  changedPages(previous = {}, current = {}) {
+    const pages = new Set([...Object.keys(previous), ...Object.keys(current)])
+    return new Set(
+      [...pages]
+        .filter(page => previous[page] !== current[page])
+        .map(page => parseInt(page))
+    )
+  }
+
+  /**
+   * Replace the affected topics with freshly segmented ones, keeping the
+   * unaffected topics and their position in the lesson. Each new topic goes
+   * in by the first page it covers, since affected topics need not be adjacent.
+   * @param {Array} topics - Topics from the previous run
+   * @param {Array} affected - Topics to replace
+   * @param {Array} replacement - Newly segmented topics, in lesson order
+   * @returns {Array} Topics with sequential order and unique topicIds
+   */
+  spliceTopics(topics, affected, replacement) {
+    const affectedIds = new Set(affected.map(topic => topic.topicId))
+    const kept = topics.filter(topic => !affectedIds.has(topic.topicId))
+
+    // Kept topics keep their ids (and so their rows); new topics yield on clashes
+    const seen = new Set(kept.map(topic => topic.topicId))
+    const renamed = replacement.map(topic => {
+      let topicId = topic.topicId
+      for (let n = 2; seen.has(topicId); n++) {
+        topicId = `${topic.topicId}-${n}`
+      }
+      seen.add(topicId)
+      return { ...topic, topicId }
+    })
+
+    // New topics without pages stay next to the new topic before them (or after them)
+    const firstPage = (topic) => (topic.pages?.length ? Math.min(...topic.pages) : null)
+    const anchors = renamed.map(firstPage)
+    for (let i = 1; i < anchors.length; i++) anchors[i] ??= anchors[i - 1]
+    for (let i = anchors.length - 2; i >= 0; i--) anchors[i] ??= anchors[i + 1]
+
+    let merged
+    if (anchors.length > 0 && anchors[0] === null) {
+      // No page numbers at all: fall back to where the first affected topic was
+      const insertAt = topics.findIndex(topic => affectedIds.has(topic.topicId))
+      const position = insertAt === -1 ? kept.length : insertAt
+      merged = [...kept.slice(0, position), ...renamed, ...kept.slice(position)]
+    } else {
+      // Merge the two lists, each already in lesson order
+      merged = []
+      let next = 0
+      for (const topic of kept) {
+        const page = firstPage(topic)
+        while (next < renamed.length && page !== null && anchors[next] < page) {
+          merged.push(renamed[next++])
+        }
+        merged.push(topic)
+      }
+      merged.push(...renamed.slice(next))
+    }
+
+    return merged.map((topic, index) => ({ ...topic, order: index + 1 }))
+  }
+}
+
+export default new PipelineCheckpoints()
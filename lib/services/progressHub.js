@@ -0,0 +1,158 @@
+// Processing Progress Hub
+// Fans processing job status out to stream subscribers. Jobs running in this
+// process publish their updates directly; jobs running on other instances
+// are picked up by one shared poll of the watched lessons, however many
+// clients are listening.
+
+import { db } from '@/lib/db'
+import { runAsService } from '@/lib/supabase/server'
+
+export const TERMINAL_STATUSES = ['completed', 'failed']
+
+/**
+ * Status of a lesson's latest processing job, as returned by the status API
+ * @param {number} lessonId - Lesson ID
+ * @param {Object|null} job - processing_jobs row
+ * @returns {Object} Status
+ */
+export function jobStatus(lessonId, job) {
+  if (!job) {
+    return {
+      lessonId,
+      status: 'pending',
+      stage: 'queued',
+      progress: 0
+    }
+  }
+
+  return {
+    jobId: job.id,
+    lessonId,
+    status: job.status,
+    stage: job.stage,
+    progress: job.progress,
+    metadata: job.metadata,
+    error: job.error,
+    attempts: job.attempts,
+    startedAt: job.started_at,
+    completedAt: job.completed_at
+  }
+}
+
+export class ProgressHub {
+  constructor() {
+    this.coalesceMs = 250 // Progress-only updates are sent at most this often
+    this.pollMs = parseInt(process.env.PROGRESS_POLL_MS) || 2000
+    this.lessons = new Map() // lessonId -> { listeners, status, fingerprint, version, sentAt, timer, localAt }
+    this.poller = null
+  }
+
+  /**
+   * Follow a lesson's processing status. The listener receives the current
+   * status straight away and then every change.
+   * @param {number} lessonId - Lesson ID
+   * @param {Function} listener - Called with { version, status }
+   * @returns {Function} Unsubscribe
+   */
+  subscribe(lessonId, listener) {
+    const key = String(lessonId)
+    let entry = this.lessons.get(key)
+    if (!entry) {
+      entry = { listeners: new Set(), status: null, fingerprint: null, version: 0, sentAt: 0, timer: null, localAt: 0 }
+      this.lessons.set(key, entry)
+    }
+    entry.listeners.add(listener)
+
+    if (entry.status) {
+      listener({ version: entry.version, status: entry.status })
+    } else {
+      db.getLatestProcessingJob(lessonId)
+        .then(job => this.publish(lessonId, jobStatus(lessonId, job)))
+        .catch(error => console.error('Progress snapshot error:', error))
+    }
+    this.startPolling()
+
+    return () => {
+      entry.listeners.delete(listener)
+      if (entry.listeners.size === 0) {
+        clearTimeout(entry.timer)
+        this.lessons.delete(key)
+      }
+      if (this.lessons.size === 0) this.stopPolling()
+    }
+  }
+
+  /**
+   * Record a new status for a lesson and notify its subscribers.
+   * Stage and status transitions go out immediately; progress-only changes
+   * are coalesced so a burst of updates becomes one event.
+   * @param {number} lessonId - Lesson ID
+   * @param {Object} status - Status from jobStatus()
+   * @param {Object} options - { local } when the job runs in this process
+   */
+  publish(lessonId, status, options = {}) {
+    const entry = this.lessons.get(String(lessonId))
+    if (!entry) return
+    if (options.local) entry.localAt = Date.now()
+
+    const fingerprint = JSON.stringify(status)
+    if (fingerprint === entry.fingerprint) return
+
+    const transition = !entry.status ||
+      entry.status.stage !== status.stage ||
+      entry.status.status !== status.status
+    entry.status = status
+    entry.fingerprint = fingerprint
+    entry.version++
+
+    clearTimeout(entry.timer)
+    const wait = entry.sentAt + this.coalesceMs - Date.now()
+    if (transition || wait <= 0) {
+      this.flush(entry)
+    } else {
+      entry.timer = setTimeout(() => this.flush(entry), wait)
+    }
+  }
+
+  flush(entry) {
+    entry.timer = null
+    entry.sentAt = Date.now()
+    const event = { version: entry.version, status: entry.status }
+    for (const listener of [...entry.listeners]) {
+      try {
+        listener(event)
+      } catch (error) {
+        console.error('Progress listener error:', error)
+      }
+    }
+  }
+
+  startPolling() {
+    if (this.poller) return
+    // Outlives the request that first subscribed, so it must not use its session
+    this.poller = runAsService(() => setInterval(() => {
+      this.poll().catch(error => console.error('Progress poll error:', error))
+    }, this.pollMs))
+  }
+
+  stopPolling() {
+    clearInterval(this.poller)
+    this.poller = null
+  }
+
+  // One query for every watched lesson whose job isn't reporting to us directly
+  async poll() {
+    const stale = Date.now() - this.pollMs * 2
+    const lessonIds = [...this.lessons.entries()]
+      .filter(([, entry]) => entry.localAt < stale)
+      .map(([key]) => parseInt(key))
+    if (lessonIds.length === 0) return
+
+    const jobs = await db.getLatestProcessingJobs(lessonIds)
+    for (const lessonId of lessonIds) {
+      this.publish(lessonId, jobStatus(lessonId, jobs.get(String(lessonId)) || null))
+    }
+  }
+}
+
+export default new ProgressHub()
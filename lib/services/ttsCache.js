@@ -0,0 +1,163 @@
+// TTS Audio Cache
+// Content-addressed cache of synthesized audio, keyed by provider + voice + model + text
+
+import { createHash } from 'crypto'
+import { db, storage } from '@/lib/db'
+
+export class TTSCache {
+  constructor() {
+    this.maxEntries = parseInt(process.env.TTS_CACHE_MAX_ENTRIES) || 10000
+    this.maxMemoryEntries = 1000
+    this.evictEvery = 50 // Run persistent eviction every N inserts
+    this.memory = new Map() // Insertion order doubles as LRU order
+    this.stats = { hits: 0, misses: 0, inserts: 0, evictions: 0, stale: 0 }
+  }
+
+  /**
+   * Normalize text so whitespace-only differences share a cache entry
+   * @param {string} text - Segment text
+   * @returns {string} Normalized text
+   */
+  normalizeText(text) {
+    return (text || '').normalize('NFC').replace(/\s+/g, ' ').trim()
+  }
+
+  /**
+   * Build the cache key for a synthesis request
+   * @param {string} text - Segment text
+   * @param {string} voiceId - Voice used for synthesis
+   * @param {string} model - TTS model id
+   * @param {string} provider - TTS provider ('elevenlabs' or 'mock')
+   * @returns {string} Hex sha256 digest
+   */
+  cacheKey(text, voiceId, model, provider) {
+    return createHash('sha256')
+      .update(`${provider}\u0000${voiceId}\u0000${model}\u0000${this.normalizeText(text)}`)
+      .digest('hex')
+  }
+
+  remember(key, entry) {
+    this.memory.delete(key)
+    this.memory.set(key, entry)
+
+    while (this.memory.size > this.maxMemoryEntries) {
+      const oldest = this.memory.keys().next().value
+      this.memory.delete(oldest)
+    }
+  }
+
+  /**
+   * Look up a cached entry, checking memory before the database
+   * @param {string} key - Cache key
+   * @returns {Promise<Object|null>} Cache entry or null
+   */
+  async get(key) {
+    const local = this.memory.get(key)
+    if (local) {
+      this.remember(key, local)
+      this.stats.hits++
+      return local
+    }
+
+    const entry = await db.getTtsCacheEntry(key)
+    if (!entry) {
+      this.stats.misses++
+      return null
+    }
+
+    this.remember(key, entry)
+    this.stats.hits++
+    db.touchTtsCacheEntry(key).catch(error => console.error('TTS cache touch error:', error))
+    return entry
+  }
+
+  /**
+   * Store synthesized audio and record it in the cache
+   * @param {string} key - Cache key
+   * @param {Object} audio - Result of TTSService.generateAudio
+   * @returns {Promise<Object>} Stored cache entry; without audio (mock TTS) an
+   *   unsaved entry with no audio_path or audio_url
+   */
+  async set(key, audio) {
+    const audioPath = `cache/${key}.mp3`
+
+    // Nothing was synthesized, so there is nothing to store or link to
+    if (!audio.audioBuffer) {
+      return {
+        cache_key: key,
+        audio_path: null,
+        audio_url: null,
+        duration: audio.duration
+      }
+    }
+
+    const blob = new Blob([audio.audioBuffer], { type: 'audio/mpeg' })
+    await storage.uploadCachedAudio(blob, key)
+
+    const entry = await db.upsertTtsCacheEntry({
+      cache_key: key,
+      voice_id: audio.voiceId,
+      model: audio.model,
+      audio_path: audioPath,
+      audio_url: storage.getPublicUrl('lesson-audio', audioPath),
+      duration: audio.duration,
+      last_used_at: new Date().toISOString()
+    })
+
+    this.remember(key, entry)
+    this.stats.inserts++
+
+    if (this.stats.inserts % this.evictEvery === 0) {
+      await this.evict()
+    }
+
+    return entry
+  }
+
+  /**
+   * Drop an entry whose audio is gone, e.g. evicted by another instance after
+   * this one remembered it
+   * @param {string} key - Cache key
+   * @returns {Promise<void>}
+   */
+  async forget(key) {
+    this.memory.delete(key)
+    this.stats.stale++
+    await db.deleteTtsCacheEntry(key)
+  }
+
+  /**
+   * Drop least recently used entries beyond maxEntries. Lessons link to their
+   * own copies of the audio (see AudioStitcher), never to cache files.
+   * @returns {Promise<number>} Number of entries evicted
+   */
+  async evict() {
+    try {
+      const evicted = await db.evictTtsCacheEntries(this.maxEntries)
+      if (evicted.length === 0) return 0
+
+      evicted.forEach(entry => this.memory.delete(entry.cache_key))
+      await storage.removeFiles('lesson-audio', evicted.map(entry => entry.audio_path))
+      this.stats.evictions += evicted.length
+      return evicted.length
+    } catch (error) {
+      console.error('TTS cache eviction error:', error)
+      return 0
+    }
+  }
+
+  /**
+   * Get hit/miss counters
+   * @returns {Object} Cache statistics
+   */
+  getStats() {
+    const lookups = this.stats.hits + this.stats.misses
+    return {
+      ...this.stats,
+      hitRate: lookups > 0 ? this.stats.hits / lookups : 0,
+      memoryEntries: this.memory.size
+    }
+  }
+}
+
+export default new TTSCache()
@@ -1,10 +1,36 @@
 // ElevenLabs Text-to-Speech Service
 
+import ttsCache from '@/lib/services/ttsCache'
+import { AdaptiveLimiter, mapWithConcurrency } from '@/lib/concurrency'
+import { timeCall, ttsCharactersTotal } from '@/lib/metrics'
+
 export class TTSService {
   constructor() {
     this.apiKey = process.env.ELEVENLABS_API_KEY
     this.voiceId = 'EXAVITQu4vr4xnSDxMaL' // Default voice (Sarah)
     this.model = 'eleven_multilingual_v2'
+    this.provider = process.env.TTS_PROVIDER || 'mock' // 'elevenlabs' or 'mock'
+    this.baseUrl = process.env.ELEVENLABS_BASE_URL || 'https://api.elevenlabs.io'
+    this.concurrency = parseInt(process.env.TTS_CONCURRENCY) || 4
+    this.limiter = new AdaptiveLimiter(this.concurrency)
+  }
+
+  /**
+   * Read rate-limit hints from an ElevenLabs response
+   * @param {Headers} headers - Response headers
+   * @returns {Object} { maxConcurrent, remaining, resetMs, retryAfterMs }
+   */
+  parseRateLimitHeaders(headers) {
+    const toInt = (value) => (value === null || value === undefined ? null : parseInt(value))
+    const retryAfter = headers.get('retry-after')
+    const reset = headers.get('x-ratelimit-reset-requests')
+
+    return {
+      maxConcurrent: toInt(headers.get('maximum-concurrent-requests')),
+      remaining: toInt(headers.get('x-ratelimit-remaining-requests')),
+      resetMs: reset ? parseFloat(reset) * 1000 : null,
+      retryAfterMs: retryAfter ? parseFloat(retryAfter) * 1000 : null
+    }
   }
 
   /**
@@ -17,15 +43,22 @@ export class TTSService {
     try {
       console.log(`TTS Generation: Processing segment ${segmentId}...`)
       
-      // Mock implementation - replace with actual ElevenLabs API call
-      // In production, you would:
-      // 1. Call ElevenLabs API with text and voice settings
-      // 2. Receive audio stream/buffer
-      // 3. Return audio data for storage
-      
-      /*
+      if (this.provider !== 'elevenlabs') {
+        // Mock response, used unless TTS_PROVIDER=elevenlabs
+        return {
+          segmentId,
+          audioBuffer: null,
+          duration: Math.ceil(text.length / 15), // Estimate ~15 chars per second
+          format: 'mp3',
+          voiceId: this.voiceId,
+          model: this.model,
+          rateLimit: null,
+          generatedAt: new Date().toISOString()
+        }
+      }
+
       const response = await fetch(
-        `https://api.elevenlabs.io/v1/text-to-speech/${this.voiceId}`,
+        `${this.baseUrl}/v1/text-to-speech/${this.voiceId}`,
         {
           method: 'POST',
           headers: {
@@ -44,44 +77,110 @@ export class TTSService {
         }
       )
       
-      const audioBuffer = await response.arrayBuffer()
-      */
+      const rateLimit = this.parseRateLimitHeaders(response.headers)
+      if (response.status === 429) {
+        const error = new Error('ElevenLabs rate limit exceeded')
+        error.status = 429
+        error.retryAfterMs = rateLimit.retryAfterMs
+        throw error
+      }
+      if (!response.ok) {
+        const error = new Error(`ElevenLabs request failed: ${response.status} ${await response.text()}`)
+        error.status = response.status
+        throw error
+      }
       
-      // Mock response
       return {
         segmentId,
-        audioBuffer: null, // Would be actual audio data
+        audioBuffer: await response.arrayBuffer(),
         duration: Math.ceil(text.length / 15), // Estimate ~15 chars per second
         format: 'mp3',
         voiceId: this.voiceId,
+        model: this.model,
+        rateLimit,
         generatedAt: new Date().toISOString()
       }
     } catch (error) {
       console.error('TTS Generation Error:', error)
-      throw new Error(`Failed to generate audio for segment ${segmentId}: ${error.message}`)
+      const wrapped = new Error(`Failed to generate audio for segment ${segmentId}: ${error.message}`)
+      wrapped.status = error.status
+      wrapped.retryAfterMs = error.retryAfterMs
+      throw wrapped
     }
   }
 
+  /**
+   * Generate audio for a segment, reusing cached audio for identical text
+   * @param {string} text - Text to convert to speech
+   * @param {string} segmentId - Segment ID for reference
+   * @param {Object} options - { refresh: drop any cached entry and synthesize again }
+   * @returns {Promise<Object>} { segmentId, cacheKey, audioUrl, audioPath, audioBuffer, duration, cached }
+   *   audioBuffer is only set for freshly synthesized audio
+   */
+  async generateAudioCached(text, segmentId, { refresh = false } = {}) {
+    const key = ttsCache.cacheKey(text, this.voiceId, this.model, this.provider)
+    if (refresh) await ttsCache.forget(key)
+    const cached = refresh ? null : await ttsCache.get(key)
+    ttsCharactersTotal.inc({ cached: String(Boolean(cached)) }, text.length)
+
+    if (cached) {
+      return {
+        segmentId,
+        cacheKey: key,
+        audioUrl: cached.audio_url,
+        audioPath: cached.audio_path,
+        audioBuffer: null,
+        duration: cached.duration,
+        cached: true
+      }
+    }
+
+    // Only cache misses take a provider slot; the audio is uploaded as soon as it is ready
+    const audio = await this.limiter.run(() => timeCall('tts', 'synthesize', () => this.generateAudio(text, segmentId)))
+    const entry = await ttsCache.set(key, audio)
+
+    return {
+      segmentId,
+      cacheKey: key,
+      audioUrl: entry.audio_url,
+      audioPath: entry.audio_path,
+      audioBuffer: audio.audioBuffer,
+      duration: audio.duration,
+      cached: false
+    }
+  }
+
+  /**
+   * Get TTS cache hit/miss counters
+   * @returns {Object} Cache statistics
+   */
+  getCacheStats() {
+    return ttsCache.getStats()
+  }
+
+  /**
+   * Generate (or reuse) audio for many segments concurrently.
+   * Network calls are paced by the adaptive limiter, which follows the
+   * provider's rate-limit headers instead of sleeping between calls.
+   * @param {Array} segments - Array of {id, text} segments
+   * @returns {Promise<Array>} Results of generateAudioCached, in segment order
+   */
+  async generateSegmentsAudio(segments) {
+    return mapWithConcurrency(segments, this.concurrency, (segment) =>
+      this.generateAudioCached(segment.text, segment.id)
+    )
+  }
+
   /**
    * Batch generate audio for multiple segments
    * @param {Array} segments - Array of text segments
    * @returns {Promise<Array>} Array of audio results
    */
   async batchGenerateAudio(segments) {
-    const results = []
-    
-    for (const segment of segments) {
-      const audio = await this.generateAudio(segment.text, segment.id)
-      results.push({
-        segmentId: segment.id,
-        audio
-      })
-      
-      // Add small delay to avoid rate limiting
-      await new Promise(resolve => setTimeout(resolve, 100))
-    }
-    
-    return results
+    return mapWithConcurrency(segments, this.concurrency, async (segment) => ({
+      segmentId: segment.id,
+      audio: await this.limiter.run(() => this.generateAudio(segment.text, segment.id))
+    }))
   }
 
   /**
@@ -0,0 +1,102 @@
+// Resumable SHA-256 for files received in chunks across requests
+// Node's crypto hashes can't be saved, so this keeps its state as plain JSON
+
+const K = new Uint32Array([
+  0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+  0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+  0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+  0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+  0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+  0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+  0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+  0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+])
+
+const INITIAL = [0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19]
+
+const rotr = (x, n) => (x >>> n) | (x << (32 - n))
+
+export class Sha256 {
+  /**
+   * @param {Object|null} state - Result of toJSON() from an earlier instance
+   */
+  constructor(state = null) {
+    this.h = new Uint32Array(state ? state.h : INITIAL)
+    this.pending = state ? Buffer.from(state.pending, 'base64') : Buffer.alloc(0)
+    this.length = state ? state.length : 0
+    this.w = new Uint32Array(64)
+  }
+
+  /**
+   * Hash more bytes
+   * @param {Uint8Array} data - Next bytes of the input
+   * @returns {Sha256} this
+   */
+  update(data) {
+    const bytes = Buffer.from(data.buffer, data.byteOffset, data.byteLength)
+    this.length += bytes.length
+
+    let offset = 0
+    if (this.pending.length > 0) {
+      offset = Math.min(64 - this.pending.length, bytes.length)
+      this.pending = Buffer.concat([this.pending, bytes.subarray(0, offset)])
+      if (this.pending.length < 64) return this
+      this.block(this.pending, 0)
+    }
+    for (; offset + 64 <= bytes.length; offset += 64) {
+      this.block(bytes, offset)
+    }
+    // Copied: stream chunks may be reused once this returns
+    this.pending = Buffer.from(bytes.subarray(offset))
+    return this
+  }
+
+  block(bytes, offset) {
+    const w = this.w
+    for (let i = 0; i < 16; i++) {
+      w[i] = bytes.readUInt32BE(offset + i * 4)
+    }
+    for (let i = 16; i < 64; i++) {
+      const s0 = rotr(w[i - 15], 7) ^ rotr(w[i - 15], 18) ^ (w[i - 15] >>> 3)
+      const s1 = rotr(w[i - 2], 17) ^ rotr(w[i - 2], 19) ^ (w[i - 2] >>> 10)
+      w[i] = w[i - 16] + s0 + w[i - 7] + s1
+    }
+
+    const h = this.h
+    let a = h[0], b = h[1], c = h[2], d = h[3], e = h[4], f = h[5], g = h[6], k = h[7]
+    for (let i = 0; i < 64; i++) {
+      const t1 = (k + (rotr(e, 6) ^ rotr(e, 11) ^ rotr(e, 25)) + ((e & f) ^ (~e & g)) + K[i] + w[i]) | 0
+      const t2 = ((rotr(a, 2) ^ rotr(a, 13) ^ rotr(a, 22)) + ((a & b) ^ (a & c) ^ (b & c))) | 0
+      k = g; g = f; f = e; e = (d + t1) | 0
+      d = c; c = b; b = a; a = (t1 + t2) | 0
+    }
+    h[0] += a; h[1] += b; h[2] += c; h[3] += d
+    h[4] += e; h[5] += f; h[6] += g; h[7] += k
+  }
+
+  /**
+   * Digest of the bytes so far; the hash can still be updated afterwards
+   * @returns {string} Hex digest
+   */
+  digest() {
+    const final = new Sha256(this.toJSON())
+    const bits = this.length * 8
+    const padding = Buffer.alloc(((this.pending.length + 9 + 63) & ~63) - this.pending.length)
+    padding[0] = 0x80
+    padding.writeUInt32BE(Math.floor(bits / 0x100000000), padding.length - 8)
+    padding.writeUInt32BE(bits >>> 0, padding.length - 4)
+    final.update(padding)
+
+    const out = Buffer.alloc(32)
+    final.h.forEach((word, i) => out.writeUInt32BE(word, i * 4))
+    return out.toString('hex')
+  }
+
+  /**
+   * Serializable state, restored with new Sha256(state)
+   * @returns {Object} { h, pending, length }
+   */
+  toJSON() {
+    return { h: Array.from(this.h), pending: this.pending.toString('base64'), length: this.length }
+  }
+}
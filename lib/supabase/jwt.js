@@ -0,0 +1,187 @@
+// Local verification of Supabase session JWTs (Edge runtime compatible)
+// Lets the middleware skip the auth server round trip for fresh, valid tokens.
+
+const JWKS_TTL_MS = 10 * 60 * 1000
+const SESSION_CACHE_TTL_MS = 30 * 1000
+const SESSION_CACHE_MAX_ENTRIES = 1000
+// Tokens this close to expiry go to the auth server so they get refreshed
+export const REFRESH_MARGIN_SECONDS = 60
+
+const ALGORITHMS = {
+  ES256: {
+    importParams: { name: 'ECDSA', namedCurve: 'P-256' },
+    verifyParams: { name: 'ECDSA', hash: 'SHA-256' }
+  },
+  RS256: {
+    importParams: { name: 'RSASSA-PKCS1-v1_5', hash: 'SHA-256' },
+    verifyParams: { name: 'RSASSA-PKCS1-v1_5' }
+  }
+}
+
+let jwksCache = { keys: new Map(), fetchedAt: 0 }
+let hmacKey = null
+const sessionCache = new Map()
+
+function base64UrlDecode(value) {
+  const base64 = value.replace(/-/g, '+').replace(/_/g, '/')
+  const padded = base64 + '='.repeat((4 - (base64.length % 4)) % 4)
+  return Uint8Array.from(atob(padded), char => char.charCodeAt(0))
+}
+
+function decodeJson(value) {
+  return JSON.parse(new TextDecoder().decode(base64UrlDecode(value)))
+}
+
+/**
+ * Read the Supabase session from the (possibly chunked) auth cookie
+ * @param {Array} cookies - [{ name, value }] from request.cookies.getAll()
+ * @returns {Object|null} Session with access_token, or null
+ */
+export function readSessionCookie(cookies) {
+  const chunks = cookies
+    .filter(({ name }) => /^sb-.+-auth-token(\.\d+)?$/.test(name))
+    .sort((a, b) => {
+      const index = name => parseInt(name.split('.').pop()) || 0
+      return index(a.name) - index(b.name)
+    })
+
+  if (chunks.length === 0) return null
+
+  let value = chunks.map(chunk => chunk.value).join('')
+  try {
+    if (value.startsWith('base64-')) {
+      value = new TextDecoder().decode(base64UrlDecode(value.slice('base64-'.length)))
+    }
+    const session = JSON.parse(value)
+    return session?.access_token ? session : null
+  } catch {
+    return null
+  }
+}
+
+async function getHmacKey() {
+  const secret = process.env.SUPABASE_JWT_SECRET
+  if (!secret) return null
+  if (!hmacKey) {
+    hmacKey = await crypto.subtle.importKey(
+      'raw',
+      new TextEncoder().encode(secret),
+      { name: 'HMAC', hash: 'SHA-256' },
+      false,
+      ['verify']
+    )
+  }
+  return hmacKey
+}
+
+async function getSigningKey(kid, alg, forceRefresh = false) {
+  const stale = Date.now() - jwksCache.fetchedAt > JWKS_TTL_MS
+  if (stale || forceRefresh) {
+    const response = await fetch(
+      `${process.env.NEXT_PUBLIC_SUPABASE_URL}/auth/v1/.well-known/jwks.json`
+    )
+    if (!response.ok) return null
+
+    const { keys = [] } = await response.json()
+    const imported = new Map()
+    for (const jwk of keys) {
+      const algorithm = ALGORITHMS[jwk.alg]
+      if (!algorithm) continue
+      imported.set(jwk.kid, {
+        alg: jwk.alg,
+        key: await crypto.subtle.importKey('jwk', jwk, algorithm.importParams, false, ['verify'])
+      })
+    }
+    jwksCache = { keys: imported, fetchedAt: Date.now() }
+  }
+
+  const entry = jwksCache.keys.get(kid)
+  return entry && entry.alg === alg ? entry.key : null
+}
+
+async function verifySignature(header, signingInput, signature) {
+  if (header.alg === 'HS256') {
+    const key = await getHmacKey()
+    if (!key) return null
+    return crypto.subtle.verify('HMAC', key, signature, signingInput)
+  }
+
+  const algorithm = ALGORITHMS[header.alg]
+  if (!algorithm) return null
+
+  let key = await getSigningKey(header.kid, header.alg)
+  if (!key) {
+    // Unknown kid: keys may have rotated since the last fetch
+    key = await getSigningKey(header.kid, header.alg, true)
+  }
+  if (!key) return null
+  return crypto.subtle.verify(algorithm.verifyParams, key, signature, signingInput)
+}
+
+/**
+ * Verify an access token locally against the project's signing keys
+ * @param {string} token - Supabase access token
+ * @returns {Promise<Object>} { status: 'valid', claims } | { status: 'refresh' } | { status: 'unverifiable' }
+ */
+export async function verifyAccessToken(token) {
+  try {
+    const [encodedHeader, encodedPayload, encodedSignature] = token.split('.')
+    const header = decodeJson(encodedHeader)
+    const claims = decodeJson(encodedPayload)
+
+    const verified = await verifySignature(
+      header,
+      new TextEncoder().encode(`${encodedHeader}.${encodedPayload}`),
+      base64UrlDecode(encodedSignature)
+    )
+    if (!verified) return { status: 'unverifiable' }
+
+    const issuer = `${process.env.NEXT_PUBLIC_SUPABASE_URL}/auth/v1`
+    if (claims.iss && claims.iss !== issuer) return { status: 'unverifiable' }
+
+    const now = Math.floor(Date.now() / 1000)
+    if (!claims.exp || claims.exp - now < REFRESH_MARGIN_SECONDS) {
+      return { status: 'refresh' }
+    }
+
+    return { status: 'valid', claims }
+  } catch {
+    return { status: 'unverifiable' }
+  }
+}
+
+/**
+ * Short-lived cache of session lookups, positive (user) and negative (null)
+ * @param {string} token - Access token
+ * @returns {Object|undefined} { user } if cached
+ */
+export function getCachedSession(token) {
+  const entry = sessionCache.get(token)
+  if (!entry) return undefined
+  if (entry.expiresAt < Date.now()) {
+    sessionCache.delete(token)
+    return undefined
+  }
+  return entry
+}
+
+/**
+ * Remember a session lookup for a short time
+ * @param {string} token - Access token
+ * @param {Object|null} user - Resolved user, or null for a rejected token
+ * @param {number} tokenExp - Token expiry (seconds since epoch), if known
+ */
+export function cacheSession(token, user, tokenExp = null) {
+  let expiresAt = Date.now() + SESSION_CACHE_TTL_MS
+  if (tokenExp) {
+    // Never serve a cached session past the point where it should be refreshed
+    expiresAt = Math.min(expiresAt, (tokenExp - REFRESH_MARGIN_SECONDS) * 1000)
+  }
+  if (expiresAt <= Date.now()) return
+
+  sessionCache.delete(token)
+  sessionCache.set(token, { user, expiresAt })
+  while (sessionCache.size > SESSION_CACHE_MAX_ENTRIES) {
+    sessionCache.delete(sessionCache.keys().next().value)
+  }
+}
@@ -1,11 +1,65 @@
 import { createServerClient } from '@supabase/ssr'
 import { NextResponse } from 'next/server'
+import { readSessionCookie, verifyAccessToken, getCachedSession, cacheSession } from './jwt'
+
+// Resolve the user without a network hop when the session token is fresh
+async function getUserFast(request) {
+  const session = readSessionCookie(request.cookies.getAll())
+  if (!session) return { user: null, resolved: true }
+
+  const token = session.access_token
+  const cached = getCachedSession(token)
+  if (cached) return { user: cached.user, resolved: true }
+
+  const result = await verifyAccessToken(token)
+  if (result.status === 'valid') {
+    const user = { id: result.claims.sub, email: result.claims.email, role: result.claims.role }
+    cacheSession(token, user, result.claims.exp)
+    return { user, resolved: true }
+  }
+
+  return { token, expiresAt: session.expires_at, resolved: false }
+}
 
 export async function updateSession(request) {
   let supabaseResponse = NextResponse.next({
     request,
   })
 
+  const fast = await getUserFast(request)
+  const user = fast.resolved ? fast.user : await getUserRemote(request, fast, (response) => {
+    supabaseResponse = response
+  })
+
+  // Protected routes
+  const protectedPaths = ['/admin']
+  const isProtectedPath = protectedPaths.some(path => 
+    request.nextUrl.pathname.startsWith(path)
+  )
+
+  // If accessing protected route without auth, redirect to login
+  if (isProtectedPath && !user) {
+    const url = request.nextUrl.clone()
+    url.pathname = '/login'
+    return NextResponse.redirect(url)
+  }
+
+  // If accessing login while authenticated, redirect to admin
+  if (request.nextUrl.pathname === '/login' && user) {
+    const url = request.nextUrl.clone()
+    url.pathname = '/admin'
+    return NextResponse.redirect(url)
+  }
+
+  return supabaseResponse
+}
+
+// Ask the auth server, refreshing the session cookies if the token is near expiry
+async function getUserRemote(request, { token, expiresAt }, setResponse) {
+  let supabaseResponse = NextResponse.next({
+    request,
+  })
+
   const supabase = createServerClient(
     process.env.NEXT_PUBLIC_SUPABASE_URL,
     process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY,
@@ -29,25 +83,7 @@ export async function updateSession(request) {
     data: { user },
   } = await supabase.auth.getUser()
 
-  // Protected routes
-  const protectedPaths = ['/admin']
-  const isProtectedPath = protectedPaths.some(path => 
-    request.nextUrl.pathname.startsWith(path)
-  )
-
-  // If accessing protected route without auth, redirect to login
-  if (isProtectedPath && !user) {
-    const url = request.nextUrl.clone()
-    url.pathname = '/login'
-    return NextResponse.redirect(url)
-  }
-
-  // If accessing login while authenticated, redirect to admin
-  if (request.nextUrl.pathname === '/login' && user) {
-    const url = request.nextUrl.clone()
-    url.pathname = '/admin'
-    return NextResponse.redirect(url)
-  }
-
-  return supabaseResponse
+  setResponse(supabaseResponse)
+  cacheSession(token, user, expiresAt)
+  return user
 }
@@ -1,10 +1,25 @@
+import { AsyncLocalStorage } from 'async_hooks'
 import { createServerClient } from '@supabase/ssr'
+import { createClient as createSupabaseClient } from '@supabase/supabase-js'
 import { cookies } from 'next/headers'
 
+// One client per request, keyed by the request's cookie store. Every db
+// helper called while handling a request shares its parsed session, and
+// its queries go through the process-wide keep-alive pool of Node's fetch.
+const requestClients = new WeakMap()
+
+// Marks work running on the server's own behalf (see runAsService)
+const serviceScope = new AsyncLocalStorage()
+
 export function createClient() {
+  if (serviceScope.getStore()) return createServiceClient()
+
   const cookieStore = cookies()
 
-  return createServerClient(
+  const existing = requestClients.get(cookieStore)
+  if (existing) return existing
+
+  const client = createServerClient(
     process.env.NEXT_PUBLIC_SUPABASE_URL,
     process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY,
     {
@@ -26,4 +41,38 @@ export function createClient() {
       },
     }
   )
+
+  requestClients.set(cookieStore, client)
+  return client
+}
+
+// One process-wide client with the service role key and no user session, for
+// work that isn't done on behalf of one user: caches shared by every request
+// and background jobs. It bypasses RLS, so it must never reach the browser
+// (the key has no NEXT_PUBLIC_ prefix) or serve a user's query directly.
+let serviceClient = null
+
+export function createServiceClient() {
+  if (!serviceClient) {
+    if (!process.env.SUPABASE_SERVICE_ROLE_KEY) {
+      throw new Error('SUPABASE_SERVICE_ROLE_KEY is not set; see RLS_SETUP.md')
+    }
+    serviceClient = createSupabaseClient(
+      process.env.NEXT_PUBLIC_SUPABASE_URL,
+      process.env.SUPABASE_SERVICE_ROLE_KEY,
+      { auth: { persistSession: false, autoRefreshToken: false } }
+    )
+  }
+  return serviceClient
+}
+
+/**
+ * Run fn, and everything it schedules (timers, promises), with the service
+ * client instead of the current request's session. For background work that
+ * outlives or isn't tied to the request that started it.
+ * @param {Function} fn - Work to run
+ * @returns {any} fn's result
+ */
+export function runAsService(fn) {
+  return serviceScope.run(true, fn)
 }
@@ -0,0 +1,27 @@
+// Text helpers shared by the segmentation services
+
+const CHARS_PER_TOKEN = 4 // Rough estimate for English text
+// Case-sensitive on purpose: with /i the all-caps alternative matches any
+// short line, so keywords list both spellings instead
+const HEADING_PATTERN = /^(#{1,6}\s+\S|\d+(\.\d+)*[.)]?\s+[A-Z]|(Chapter|Unit|Lesson|Section|CHAPTER|UNIT|LESSON|SECTION)\b|[A-Z][A-Z0-9 ,:'&-]{3,}$)/
+
+export { CHARS_PER_TOKEN }
+
+/**
+ * Approximate token count of a string
+ * @param {string} text
+ * @returns {number}
+ */
+export function estimateTokens(text) {
+  return Math.ceil((text || '').length / CHARS_PER_TOKEN)
+}
+
+/**
+ * Whether an OCR line looks like a section heading
+ * @param {string} line
+ * @returns {boolean}
+ */
+export function isHeading(line) {
+  const trimmed = line.trim()
+  return trimmed.length > 0 && trimmed.length <= 80 && HEADING_PATTERN.test(trimmed)
+}
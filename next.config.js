@@ -1,5 +1,9 @@
 const nextConfig = {
   output: 'standalone',
+  experimental: {
+    // instrumentation.js starts the job worker at boot
+    instrumentationHook: true,
+  },
   images: {
     unoptimized: true,
   },
@@ -0,0 +1,23 @@
+import { existsSync } from 'node:fs'
+import { fileURLToPath, pathToFileURL } from 'node:url'
+
+const ROOT = new URL('../../', import.meta.url)
+
+export async function resolve(specifier, context, nextResolve) {
+  if (specifier.startsWith('@/')) {
+    const url = new URL(specifier.slice(2), ROOT)
+    if (!existsSync(fileURLToPath(url)) && existsSync(`${fileURLToPath(url)}.js`)) {
+      return nextResolve(pathToFileURL(`${fileURLToPath(url)}.js`).href, context)
+    }
+    return nextResolve(url.href, context)
+  }
+  return nextResolve(specifier, context)
+}
+
+export async function load(url, context, nextLoad) {
+  // The app's .js files are ES modules; package.json leaves the type unset for Next
+  if (url.startsWith(ROOT.href) && url.endsWith('.js') && !url.includes('/node_modules/')) {
+    return nextLoad(url, { ...context, format: 'module' })
+  }
+  return nextLoad(url, context)
+}
@@ -0,0 +1,32 @@
+import { test } from 'node:test'
+import assert from 'node:assert/strict'
+import localModel from '@/lib/services/localModel'
+
+const segmentsOf = (...counts) => counts.flatMap((count, topic) =>
+  Array.from({ length: count }, (_, segment) => ({ topic, segment, topicSegments: count }))
+)
+const imagesOf = (count) => Array.from({ length: count }, (_, index) => ({ index, description: '', page: 1 }))
+
+test('mapImages places every image when there are more images than segments', () => {
+  const { assignments } = localModel.mapImages(segmentsOf(2, 1), imagesOf(7))
+
+  assert.deepEqual(assignments.map(a => a.image), [0, 1, 2, 3, 4, 5, 6])
+  const segments = new Set(assignments.map(a => `${a.topic}.${a.segment}`))
+  assert.deepEqual([...segments], ['0.0', '0.1', '1.0'])
+})
+
+test('mapImages places every image once when topics have different segment counts', () => {
+  const { assignments } = localModel.mapImages(segmentsOf(3, 1, 5), imagesOf(4))
+
+  assert.deepEqual(assignments.map(a => a.image), [0, 1, 2, 3])
+  // Spread in reading order, starting at the first segment
+  assert.deepEqual(assignments[0], { topic: 0, segment: 0, image: 0 })
+  assert.ok(assignments.every((a, i) => i === 0 ||
+    a.topic > assignments[i - 1].topic ||
+    (a.topic === assignments[i - 1].topic && a.segment >= assignments[i - 1].segment)))
+})
+
+test('mapImages returns no assignments without images or segments', () => {
+  assert.deepEqual(localModel.mapImages(segmentsOf(2), []), { assignments: [] })
+  assert.deepEqual(localModel.mapImages([], imagesOf(2)), { assignments: [] })
+})
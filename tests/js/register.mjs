@@ -0,0 +1,5 @@
+// Lets `node --test` import app modules: resolves the `@/` alias from
+// jsconfig.json and loads the extensionless ESM sources as modules.
+import { register } from 'node:module'
+
+register('./loader.mjs', import.meta.url)
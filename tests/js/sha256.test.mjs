@@ -0,0 +1,32 @@
+import { test } from 'node:test'
+import assert from 'node:assert/strict'
+import { createHash, randomBytes } from 'crypto'
+import { Sha256 } from '@/lib/sha256'
+
+const expected = (bytes) => createHash('sha256').update(bytes).digest('hex')
+
+test('digest matches crypto around block and padding boundaries', () => {
+  for (const size of [0, 1, 55, 56, 63, 64, 65, 119, 120, 128, 1000]) {
+    const bytes = randomBytes(size)
+    assert.equal(new Sha256().update(bytes).digest(), expected(bytes), `size ${size}`)
+  }
+})
+
+test('state survives a JSON round trip between uneven chunks', () => {
+  const bytes = randomBytes(5000)
+  let state = null
+  for (const [start, end] of [[0, 7], [7, 64], [64, 1030], [1030, 1031], [1031, 5000]]) {
+    const hash = new Sha256(state).update(bytes.subarray(start, end))
+    state = JSON.parse(JSON.stringify(hash))
+  }
+
+  assert.equal(new Sha256(state).digest(), expected(bytes))
+})
+
+test('digest does not finalize the running hash', () => {
+  const hash = new Sha256().update(Buffer.from('abc'))
+  hash.digest()
+  hash.update(Buffer.from('def'))
+
+  assert.equal(hash.digest(), expected(Buffer.from('abcdef')))
+})
@@ -0,0 +1,125 @@
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from tools.bulk_import import Checkpoint, ValidationError, iter_json_array, validate_lesson
+
+
+def topic(topic_id='t1'):
+    return {'topicId': topic_id, 'topic': 'Kites', 'simplified_explanation': [{'id': 1, 'text': 'A kite flies.'}]}
+
+
+def lesson(**overrides):
+    record = {'school': 'Greenwood High', 'book': 'English Reader 5', 'lesson_number': 3,
+              'name': 'The Little Kite', 'topics': [topic()]}
+    record.update(overrides)
+    return record
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    def test_values_split_across_chunk_boundaries(self):
+        values = [12345678, -0.5e-7, 'a "quoted" string, with [brackets]', {'nested': [1, {'x': None}]}, True, []]
+        text = ' [ ' + ' ,\n'.join(json.dumps(value) for value in values) + ' ] '
+
+        for chunk_size in (1, 2, 3, 7, 64):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)), values)
+
+    def test_number_ending_a_chunk_is_not_cut_short(self):
+        self.assertEqual(list(iter_json_array(io.StringIO('[1234,5]'), chunk_size=3)), [1234, 5])
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(io.StringIO('  []'), chunk_size=1)), [])
+
+    def test_rejects_other_documents(self):
+        for text in ('{"topics": []}', '[1, 2', '[1 2]'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                list(iter_json_array(io.StringIO(text), chunk_size=2))
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.source = self.root / 'lessons.jsonl'
+        self.source.write_text('{}\n' * 5)
+        self.path = self.root / 'checkpoint.json'
+
+    def test_out_of_order_completion_only_advances_over_a_prefix(self):
+        checkpoint = Checkpoint(self.path)
+        self.assertEqual(checkpoint.start(self.source), 0)
+
+        for ordinal in (2, 1, 4):
+            checkpoint.record_done(self.source, ordinal)
+        self.assertEqual(checkpoint.files[str(self.source)]['done'], 0)
+
+        checkpoint.record_done(self.source, 0)
+        self.assertEqual(checkpoint.files[str(self.source)]['done'], 3)
+
+    def test_resume_skips_written_records_and_finished_files(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.start(self.source)
+        for ordinal in (0, 1, 3):
+            checkpoint.record_done(self.source, ordinal)
+        checkpoint.save()
+
+        resumed = Checkpoint(self.path)
+        self.assertEqual(resumed.start(self.source), 2)
+
+        for ordinal in (2, 3, 4):
+            resumed.record_done(self.source, ordinal)
+        resumed.finished_reading(self.source, 5)
+        resumed.save()
+        self.assertIsNone(Checkpoint(self.path).start(self.source))
+
+    def test_changed_file_starts_over(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.start(self.source)
+        checkpoint.record_done(self.source, 0)
+        checkpoint.save()
+
+        self.source.write_text('{}\n' * 6)
+        self.assertEqual(Checkpoint(self.path).start(self.source), 0)
+
+
+class ValidateLessonTest(unittest.TestCase):
+    def validate(self, record, defaults=None):
+        return validate_lesson(record, 'lessons.jsonl', 0, defaults or {})
+
+    def test_accepts_a_complete_record(self):
+        record = self.validate(lesson())
+
+        self.assertEqual(record.school['name'], 'Greenwood High')
+        self.assertEqual(record.book['slug'], 'english-reader-5')
+        self.assertEqual(record.lesson_key, 'lesson:english-reader-5/3')
+
+    def test_defaults_fill_missing_fields_only(self):
+        record = {'topics': [topic()], 'name': 'From Record'}
+        defaults = {'school': 'S', 'book': 'B', 'lesson_number': 2, 'name': 'From Default'}
+
+        validated = self.validate(record, defaults)
+        self.assertEqual((validated.lesson_number, validated.name), (2, 'From Record'))
+
+    def test_rejections(self):
+        cases = {
+            'not an object': ['a list'],
+            'missing school': lesson(school=None),
+            'missing book': lesson(book=3),
+            'lesson number zero': lesson(lesson_number=0),
+            'lesson number as text': lesson(lesson_number='3'),
+            'lesson number as bool': lesson(lesson_number=True),
+            'no topics': lesson(topics=[]),
+            'segment without id': lesson(topics=[{**topic(), 'simplified_explanation': [{'text': 'x'}]}]),
+            'duplicate topic ids': lesson(topics=[topic('t1'), topic('t1')]),
+            'partial subject link': lesson(curriculum='CBSE', grade='5'),
+        }
+        for name, record in cases.items():
+            with self.subTest(name), self.assertRaises(ValidationError):
+                self.validate(record)
+
+
+if __name__ == '__main__':
+    unittest.main()
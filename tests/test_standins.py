@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+
+from benchmarks.standins import ServiceProfile, StandInServer, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch('benchmarks.standins.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_allows_a_burst_of_rate_then_reports_the_wait(self):
+        bucket = TokenBucket(4)
+
+        self.assertEqual([bucket.take() for _ in range(4)], [0, 0, 0, 0])
+        self.assertAlmostEqual(bucket.take(), 0.25)
+
+    def test_refills_at_the_rate_up_to_capacity(self):
+        bucket = TokenBucket(4)
+        for _ in range(4):
+            bucket.take()
+
+        self.clock.now += 0.5  # Two tokens back
+        self.assertEqual([bucket.take() for _ in range(2)], [0, 0])
+        self.assertGreater(bucket.take(), 0)
+
+        self.clock.now += 60  # Never more than a second's worth
+        self.assertEqual([bucket.take() for _ in range(4)], [0, 0, 0, 0])
+        self.assertGreater(bucket.take(), 0)
+
+    def test_zero_rate_is_unlimited(self):
+        bucket = TokenBucket(0)
+        self.assertEqual({bucket.take() for _ in range(100)}, {0})
+
+
+class DelayTest(unittest.TestCase):
+    def server(self, profile, seed=0):
+        server = StandInServer(('127.0.0.1', 0), profiles={'ocr': profile}, seed=seed)
+        self.addCleanup(server.server_close)
+        return server
+
+    def test_error_rate_sets_the_share_of_failed_calls(self):
+        for error_rate, low, high in ((0.0, 0, 0), (1.0, 2000, 2000), (0.25, 400, 600)):
+            server = self.server(ServiceProfile(error_rate=error_rate))
+            failures = sum(server.delay('ocr')[1] for _ in range(2000))
+            with self.subTest(error_rate=error_rate):
+                self.assertTrue(low <= failures <= high, failures)
+
+    def test_latency_stays_within_jitter_and_never_negative(self):
+        server = self.server(ServiceProfile(latency_ms=100, jitter_ms=30))
+        seconds = [server.delay('ocr')[0] for _ in range(500)]
+        self.assertTrue(all(0.07 <= value <= 0.13 for value in seconds))
+
+        server = self.server(ServiceProfile(latency_ms=5, jitter_ms=50))
+        self.assertTrue(all(server.delay('ocr')[0] >= 0 for _ in range(500)))
+
+    def test_same_seed_gives_the_same_run(self):
+        profile = ServiceProfile(latency_ms=50, jitter_ms=20, error_rate=0.3)
+        first, second = self.server(profile, seed=7), self.server(profile, seed=7)
+
+        self.assertEqual([first.delay('ocr') for _ in range(50)], [second.delay('ocr') for _ in range(50)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,694 @@
+#!/usr/bin/env python3
+"""
+Bulk import of lesson content straight into Supabase.
+
+Reads lessons from files or directories, validates every record and upserts
+schools, books, lessons and lesson_topic rows through PostgREST in large
+batches, with several writers in parallel. Rows carry an import_key (topics
+use lesson_id + topic_id), so importing the same content twice updates rows
+instead of duplicating them. A checkpoint file records how far each input
+file got; re-running the same command after an interruption resumes there.
+
+Inputs (files, or directories searched recursively for .json and .jsonl):
+
+  * Topic files in the samples/bhuvan/lesson.json format. The lesson comes
+    from the path: <school>/<book>/<NN>-<lesson name>.json, or
+    <school>/<book>/<NN>-<lesson name>/lesson.json. --school, --book,
+    --lesson-number and --name fill in levels the layout leaves out.
+  * .jsonl files with one lesson per line, or .json files holding an array of
+    lessons, each:
+        {"school": "Greenwood High", "book": "English Reader 5",
+         "lesson_number": 3, "name": "The Little Kite", "topics": [...]}
+    "school" and "book" may also be objects ({"name", "address", "state",
+    "country"} / {"title", "author", "slug"}). Adding "curriculum", "grade"
+    and "subject" links the book to the school through a subject row.
+
+Files are parsed incrementally, so only the lessons of in-flight batches are
+held in memory. Topics removed from the source are not deactivated; re-run
+the lesson through the pipeline for that.
+
+Running app servers cache schools, curriculums, grades and books. When an
+import has written rows it broadcasts an invalidation on the reference-cache
+Realtime channel, which servers with REFERENCE_CACHE_BROADCAST=true act on;
+other servers pick the rows up once REFERENCE_CACHE_TTL_SECONDS has passed.
+
+    export NEXT_PUBLIC_SUPABASE_URL=... SUPABASE_SERVICE_ROLE_KEY=...
+    python -m tools.bulk_import content/ --writers 8
+    python -m tools.bulk_import lessons.jsonl --school "Greenwood High" --errors rejected.jsonl
+    python -m tools.bulk_import kite/lesson.json --school "Greenwood High" --book "English Reader 5" \
+        --lesson-number 3 --name "The Little Kite"
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import requests
+
+CHUNK_SIZE = 1 << 16
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LESSON_NUMBER_PATTERN = re.compile(r'^(\d+)[\s_-]*(.*)$')
+NUMBER_CHARS = frozenset('0123456789+-.eE')
+
+# Columns written for each reference table; every row in a request carries
+# all of them, as PostgREST requires for bulk inserts
+SCHOOL_COLUMNS = ('name', 'address', 'state', 'country')
+BOOK_COLUMNS = ('title', 'author', 'slug')
+# Tables the app's reference cache holds (lib/referenceCache.js)
+REFERENCE_TABLES = ('school', 'curriculum', 'grade', 'book')
+
+
+class ValidationError(ValueError):
+    pass
+
+
+class WriteError(RuntimeError):
+    pass
+
+
+def slugify(text):
+    """Same slug the admin API derives from a title or name"""
+    return re.sub(r'\s+', '-', text.lower())
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def iter_json_array(fp, chunk_size=CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array without reading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = fp.read(chunk_size)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        eof = not chunk
+
+    def peek():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                return ''
+            fill()
+
+    if peek() != '[':
+        raise ValidationError('expected a JSON array')
+    pos += 1
+
+    expect_value = True
+    while True:
+        char = peek()
+        if not char:
+            raise ValidationError('unexpected end of file inside the array')
+        if char == ']':
+            return
+        if not expect_value:
+            if char != ',':
+                raise ValidationError(f'expected "," or "]" but found {buffer[pos:pos + 20]!r}')
+            pos += 1
+            expect_value = True
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if not eof and (end == len(buffer) or (is_number(value) and buffer[end] in NUMBER_CHARS)):
+            # A number may continue in the next chunk, e.g. 12 | 34 or 1.5 | e-7
+            fill()
+            continue
+        pos = end
+        expect_value = False
+        yield value
+
+
+def iter_jsonl(fp):
+    """Yield one value per line; a malformed line yields its ValidationError so the rest still import"""
+    for number, line in enumerate(fp, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            yield ValidationError(f'line {number}: {error}')
+
+
+@dataclass
+class LessonRecord:
+    source: str
+    ordinal: int
+    school: dict
+    book: dict
+    lesson_number: int
+    name: str
+    topics: list
+    curriculum: str = None
+    grade: str = None
+    subject: str = None
+
+    @property
+    def book_key(self):
+        return f"book:{self.book['slug']}"
+
+    @property
+    def lesson_key(self):
+        return f'lesson:{self.book["slug"]}/{self.lesson_number}'
+
+
+@dataclass
+class ImportStats:
+    started: float = field(default_factory=time.perf_counter)
+    files: int = 0
+    lessons: int = 0
+    topics: int = 0
+    skipped: int = 0
+    rejected: int = 0
+    batches: int = 0
+    requests: int = 0
+    retries: int = 0
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'files': self.files,
+            'lessons': self.lessons,
+            'topics': self.topics,
+            'skipped_from_checkpoint': self.skipped,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'requests': self.requests,
+            'retries': self.retries,
+            'elapsed_s': round(elapsed, 2),
+            'topics_per_s': round(self.topics / elapsed, 1) if elapsed else 0.0
+        }
+
+
+def text(value, name, required=True):
+    if value in (None, '') and not required:
+        return None
+    if not isinstance(value, str) or not value.strip():
+        raise ValidationError(f'{name} must be a non-empty string')
+    return value.strip()
+
+
+def validate_topic(topic, index):
+    """One topic in the lesson.json format -> a lesson_topic row (without lesson_id)"""
+    where = f'topics[{index}]'
+    if not isinstance(topic, dict):
+        raise ValidationError(f'{where} must be an object')
+    order = topic.get('order', index + 1)
+    if not isinstance(order, int) or isinstance(order, bool):
+        raise ValidationError(f'{where}.order must be an integer')
+
+    segments = topic.get('simplified_explanation')
+    if not isinstance(segments, list) or not segments:
+        raise ValidationError(f'{where}.simplified_explanation must be a non-empty array')
+    for position, segment in enumerate(segments):
+        if not isinstance(segment, dict) or segment.get('id') is None:
+            raise ValidationError(f'{where}.simplified_explanation[{position}] needs an id')
+        text(segment.get('text'), f'{where}.simplified_explanation[{position}].text')
+
+    return {
+        'topic_id': text(topic.get('topicId', topic.get('topic_id')), f'{where}.topicId'),
+        'topic': text(topic.get('topic'), f'{where}.topic'),
+        'subtopic': text(topic.get('subtopic'), f'{where}.subtopic', required=False),
+        'order': order,
+        'simplified_explanation': segments,
+        'active': True
+    }
+
+
+def validate_lesson(record, source, ordinal, defaults):
+    if not isinstance(record, dict):
+        raise ValidationError('lesson must be an object')
+
+    school = record.get('school', defaults.get('school'))
+    if isinstance(school, str):
+        school = {'name': school}
+    if not isinstance(school, dict):
+        raise ValidationError('school is required')
+    school = {column: school.get(column) for column in SCHOOL_COLUMNS}
+    school['name'] = text(school['name'], 'school.name')
+
+    book = record.get('book', defaults.get('book'))
+    if isinstance(book, str):
+        book = {'title': book}
+    if not isinstance(book, dict):
+        raise ValidationError('book is required')
+    book = {column: book.get(column) for column in BOOK_COLUMNS}
+    book['title'] = text(book['title'], 'book.title')
+    book['slug'] = book['slug'] or slugify(book['title'])
+
+    lesson_number = record.get('lesson_number', defaults.get('lesson_number'))
+    if not isinstance(lesson_number, int) or isinstance(lesson_number, bool) or lesson_number < 1:
+        raise ValidationError(
+            'lesson_number must be a positive integer (topic files take it from a numbered '
+            'file or directory name, e.g. 03-the-little-kite, or from --lesson-number)'
+        )
+
+    topics = record.get('topics')
+    if not isinstance(topics, list) or not topics:
+        raise ValidationError('topics must be a non-empty array')
+    rows = [validate_topic(topic, index) for index, topic in enumerate(topics)]
+    seen = set()
+    for row in rows:
+        if row['topic_id'] in seen:
+            raise ValidationError(f"duplicate topicId {row['topic_id']!r}")
+        seen.add(row['topic_id'])
+
+    link = [record.get(key) for key in ('curriculum', 'grade', 'subject')]
+    if any(link) and not all(link):
+        raise ValidationError('curriculum, grade and subject must be given together')
+
+    return LessonRecord(
+        source=source,
+        ordinal=ordinal,
+        school=school,
+        book=book,
+        lesson_number=lesson_number,
+        name=text(record.get('name', defaults.get('name')), 'name'),
+        topics=rows,
+        curriculum=text(link[0], 'curriculum', required=False),
+        grade=text(link[1], 'grade', required=False),
+        subject=text(link[2], 'subject', required=False)
+    )
+
+
+def lesson_from_path(path, root):
+    """Lesson fields implied by a topic file's place under the import root"""
+    parts = list(path.relative_to(root).with_suffix('').parts)
+    context = {}
+    if parts[-1] == 'lesson':
+        if len(parts) == 1:
+            return context  # A bare lesson.json says nothing about the lesson
+        parts.pop()  # <NN>-<name>/lesson.json
+    match = LESSON_NUMBER_PATTERN.match(parts[-1])
+    if match:
+        context['lesson_number'] = int(match.group(1))
+        name = match.group(2)
+    else:
+        name = parts[-1]
+    context['name'] = re.sub(r'[_-]+', ' ', name).strip() or None
+    if len(parts) >= 2:
+        context['book'] = parts[-2]
+    if len(parts) >= 3:
+        context['school'] = parts[-3]
+    return context
+
+
+def discover(paths):
+    """(file, root) pairs in a stable order, so checkpoints line up between runs"""
+    for path in paths:
+        path = Path(path).resolve()
+        if path.is_dir():
+            for file in sorted(path.rglob('*')):
+                if file.suffix in ('.json', '.jsonl') and file.is_file():
+                    yield file, path
+        else:
+            yield path, path.parent
+
+
+def read_records(path, root):
+    """Yield (ordinal, raw lesson dict) from one input file"""
+    with open(path, encoding='utf-8') as fp:
+        if path.suffix == '.jsonl':
+            yield from enumerate(iter_jsonl(fp))
+            return
+
+        elements = iter_json_array(fp)
+        first = next(elements, None)
+        if first is None:
+            return
+        if isinstance(first, dict) and ('topicId' in first or 'topic_id' in first):
+            # A single lesson's topic array
+            yield 0, {**lesson_from_path(path, root), 'topics': [first, *elements]}
+            return
+        yield 0, first
+        for ordinal, element in enumerate(elements, start=1):
+            yield ordinal, element
+
+
+class Checkpoint:
+    """
+    Per-file progress: `done` counts records from the start of the file that
+    are fully written, so writers finishing out of order never skip a record.
+    A file that changed since the checkpoint is imported again from the start.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path) if path else None
+        self.files = {}
+        self.ahead = {}  # file -> ordinals finished beyond `done`
+        if self.path and self.path.exists():
+            self.files = json.loads(self.path.read_text()).get('files', {})
+
+    @staticmethod
+    def fingerprint(file):
+        stat = file.stat()
+        return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def start(self, file):
+        """Records of `file` already imported; None if the whole file is done"""
+        key = str(file)
+        state = self.files.get(key)
+        fingerprint = self.fingerprint(file)
+        if not state or any(state.get(name) != value for name, value in fingerprint.items()):
+            state = {**fingerprint, 'done': 0, 'records': None}
+            self.files[key] = state
+        self.ahead[key] = set()
+        if state['records'] is not None and state['done'] >= state['records']:
+            return None
+        return state['done']
+
+    def finished_reading(self, file, records):
+        self.files[str(file)]['records'] = records
+
+    def record_done(self, file, ordinal):
+        key = str(file)
+        state = self.files[key]
+        ahead = self.ahead[key]
+        ahead.add(ordinal)
+        while state['done'] in ahead:
+            ahead.remove(state['done'])
+            state['done'] += 1
+
+    def save(self):
+        if not self.path:
+            return
+        temporary = self.path.with_name(f'{self.path.name}.tmp')
+        temporary.write_text(json.dumps({'files': self.files}, indent=2))
+        os.replace(temporary, self.path)
+
+
+class SupabaseWriter:
+    """Batched PostgREST upserts, safe to call from several threads"""
+
+    def __init__(self, url, key, stats, retries=5):
+        self.url = url.rstrip('/')
+        self.headers = {
+            'apikey': key,
+            'Authorization': f'Bearer {key}',
+            'Content-Type': 'application/json'
+        }
+        self.stats = stats
+        self.retries = retries
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.ids = {}  # import_key -> id for schools, curriculums, grades and books
+
+    @property
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            self.local.session.headers.update(self.headers)
+        return self.local.session
+
+    def request(self, method, path, **kwargs):
+        url = f'{self.url}/rest/v1/{path}'
+        for attempt in range(self.retries + 1):
+            delay = min(30.0, 0.5 * 2 ** attempt)
+            try:
+                response = self.session.request(method, url, timeout=120, **kwargs)
+            except requests.RequestException as error:
+                if attempt == self.retries:
+                    raise WriteError(f'{method} {path}: {error}') from error
+            else:
+                with self.lock:
+                    self.stats.requests += 1
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    break
+                delay = float(response.headers.get('Retry-After') or delay)
+            with self.lock:
+                self.stats.retries += 1
+            time.sleep(delay)
+
+        if response.status_code >= 400:
+            raise WriteError(f'{method} {path}: {response.status_code} {response.text[:500]}')
+        return response
+
+    def upsert(self, table, rows, on_conflict, select=None):
+        params = {'on_conflict': on_conflict}
+        prefer = 'resolution=merge-duplicates,'
+        if select:
+            params['select'] = select
+            prefer += 'return=representation'
+        else:
+            prefer += 'return=minimal'
+        response = self.request('POST', table, params=params, json=rows, headers={'Prefer': prefer})
+        return response.json() if select else None
+
+    def resolve(self, table, rows_by_key):
+        """Ids for reference rows keyed by import_key, upserting the ones not seen yet"""
+        with self.lock:
+            missing = {key: row for key, row in rows_by_key.items() if key not in self.ids}
+        if missing:
+            rows = [{**row, 'import_key': key, 'active': True} for key, row in missing.items()]
+            for row in self.upsert(table, rows, 'import_key', select='id,import_key'):
+                with self.lock:
+                    self.ids[row['import_key']] = row['id']
+        with self.lock:
+            return {key: self.ids[key] for key in rows_by_key}
+
+    def invalidate_reference_cache(self):
+        """Tell app servers to reload the reference tables, as db.invalidateReferenceCache does"""
+        messages = [
+            {'topic': 'reference-cache', 'event': 'invalidate',
+             'payload': {'table': table, 'instanceId': 'bulk-import'}}
+            for table in REFERENCE_TABLES
+        ]
+        response = self.session.post(f'{self.url}/realtime/v1/api/broadcast', json={'messages': messages}, timeout=30)
+        if response.status_code >= 400:
+            raise WriteError(f'POST realtime broadcast: {response.status_code} {response.text[:500]}')
+
+    def write_batch(self, records):
+        schools = self.resolve('school', {f"school:{r.school['name']}": r.school for r in records})
+        books = self.resolve('book', {r.book_key: r.book for r in records})
+
+        linked = [r for r in records if r.subject]
+        if linked:
+            curriculums = self.resolve('curriculum', {f'curriculum:{r.curriculum}': {'name': r.curriculum} for r in linked})
+            grades = self.resolve('grade', {f'grade:{r.grade}': {'grade': r.grade} for r in linked})
+            subjects = {}
+            for r in linked:
+                key = f"subject:{r.school['name']}/{r.curriculum}/{r.grade}/{r.book['slug']}"
+                subjects[key] = {
+                    'name': r.subject,
+                    'school_id': schools[f"school:{r.school['name']}"],
+                    'curriculum_id': curriculums[f'curriculum:{r.curriculum}'],
+                    'grade_id': grades[f'grade:{r.grade}'],
+                    'book_id': books[r.book_key],
+                    'import_key': key,
+                    'active': True
+                }
+            self.upsert('subject', list(subjects.values()), 'import_key')
+
+        # A lesson repeated within one batch would make the upsert touch a row twice; last one wins
+        lessons = {}
+        for r in records:
+            lessons[r.lesson_key] = {
+                'book_id': books[r.book_key],
+                'lesson_number': r.lesson_number,
+                'name': r.name,
+                'slug': slugify(r.name),
+                'num_topics': len(r.topics),
+                'import_key': r.lesson_key,
+                'active': True
+            }
+        rows = self.upsert('lesson', list(lessons.values()), 'import_key', select='id,import_key')
+        lesson_ids = {row['import_key']: row['id'] for row in rows}
+
+        topics = {}
+        for r in records:
+            lesson_id = lesson_ids[r.lesson_key]
+            for topic in r.topics:
+                topics[(lesson_id, topic['topic_id'])] = {**topic, 'lesson_id': lesson_id}
+        self.upsert('lesson_topic', list(topics.values()), 'lesson_id,topic_id')
+
+
+class BulkImporter:
+    def __init__(self, paths, writer, checkpoint, stats, defaults=None, batch_size=1000,
+                 writers=4, errors=None, progress_every=10.0):
+        self.paths = paths
+        self.writer = writer
+        self.checkpoint = checkpoint
+        self.defaults = defaults or {}
+        self.batch_size = batch_size
+        self.writers = writers
+        self.errors = errors
+        self.progress_every = progress_every
+        self.stats = stats
+        self.failure = None
+        self.last_progress = time.perf_counter()
+
+    def reject(self, source, ordinal, error):
+        self.stats.rejected += 1
+        entry = {'source': source, 'record': ordinal, 'error': str(error)}
+        if self.errors:
+            self.errors.write(json.dumps(entry) + '\n')
+        else:
+            print(f'Rejected {source} record {ordinal}: {error}', file=sys.stderr)
+
+    def batches(self):
+        """Validated records grouped into batches of about batch_size topics"""
+        batch, topics = [], 0
+        for file, root in discover(self.paths):
+            if self.failure:
+                return
+            self.stats.files += 1
+            skip = self.checkpoint.start(file)
+            if skip is None:
+                continue
+
+            count = 0
+            try:
+                for ordinal, raw in read_records(file, root):
+                    count = ordinal + 1
+                    if ordinal < skip:
+                        self.stats.skipped += 1
+                        continue
+                    try:
+                        if isinstance(raw, ValidationError):
+                            raise raw
+                        record = validate_lesson(raw, str(file), ordinal, self.defaults)
+                    except ValidationError as error:
+                        self.reject(str(file), ordinal, error)
+                        self.checkpoint.record_done(str(file), ordinal)
+                        continue
+                    batch.append(record)
+                    topics += len(record.topics)
+                    if topics >= self.batch_size:
+                        yield batch
+                        batch, topics = [], 0
+            except (ValidationError, json.JSONDecodeError, UnicodeDecodeError) as error:
+                # Unreadable from here on; records before the error still import
+                self.reject(str(file), count, error)
+            self.checkpoint.finished_reading(file, count)
+        if batch:
+            yield batch
+
+    def write(self, batch):
+        if self.writer:
+            self.writer.write_batch(batch)
+        return batch
+
+    def collect(self, futures):
+        for future in futures:
+            try:
+                batch = future.result()
+            except WriteError as error:
+                self.failure = self.failure or error
+                continue
+            for record in batch:
+                self.checkpoint.record_done(record.source, record.ordinal)
+            self.stats.batches += 1
+            self.stats.lessons += len(batch)
+            self.stats.topics += sum(len(record.topics) for record in batch)
+        self.checkpoint.save()
+
+        if time.perf_counter() - self.last_progress >= self.progress_every:
+            self.last_progress = time.perf_counter()
+            summary = self.stats.summary()
+            print(f"{summary['lessons']} lessons, {summary['topics']} topics ({summary['topics_per_s']}/s), "
+                  f"{summary['rejected']} rejected", file=sys.stderr)
+
+    def run(self):
+        # Bounded in-flight work keeps memory flat however large the input is
+        with ThreadPoolExecutor(max_workers=self.writers) as pool:
+            in_flight = set()
+            for batch in self.batches():
+                if len(in_flight) >= self.writers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    self.collect(done)
+                if self.failure:
+                    break
+                in_flight.add(pool.submit(self.write, batch))
+            self.collect(wait(in_flight).done)
+        return self.stats.summary()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='Lesson files or directories')
+    parser.add_argument('--supabase-url', default=os.environ.get('NEXT_PUBLIC_SUPABASE_URL'), help='Supabase project URL')
+    parser.add_argument(
+        '--supabase-key',
+        default=os.environ.get('SUPABASE_SERVICE_ROLE_KEY') or os.environ.get('NEXT_PUBLIC_SUPABASE_ANON_KEY'),
+        help='Service role (or anon) key'
+    )
+    parser.add_argument('--school', help='School for records that do not name one')
+    parser.add_argument('--book', help='Book title for records that do not name one')
+    parser.add_argument('--lesson-number', type=int, help='Lesson number for records that do not give one')
+    parser.add_argument('--name', help='Lesson name for records that do not give one')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Topics per write batch')
+    parser.add_argument('--writers', type=int, default=4, help='Batches written in parallel')
+    parser.add_argument('--retries', type=int, default=5, help='Retries per request on 429/5xx')
+    parser.add_argument('--checkpoint', default='.bulk-import-checkpoint.json', help='Progress file used to resume')
+    parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+    parser.add_argument('--errors', help='Write rejected records as JSON lines to this path')
+    parser.add_argument('--validate-only', action='store_true', help='Validate the input without writing')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    stats = ImportStats()
+    writer = None
+    if not args.validate_only:
+        if not args.supabase_url or not args.supabase_key:
+            sys.exit('Set NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY, or pass --supabase-url/--supabase-key')
+        writer = SupabaseWriter(args.supabase_url, args.supabase_key, stats, retries=args.retries)
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    checkpoint = Checkpoint(None if args.validate_only else args.checkpoint)
+    defaults = {
+        key: value for key, value in (
+            ('school', args.school), ('book', args.book),
+            ('lesson_number', args.lesson_number), ('name', args.name)
+        ) if value is not None
+    }
+
+    errors = open(args.errors, 'w') if args.errors else None
+    try:
+        importer = BulkImporter(
+            args.paths, writer, checkpoint, stats,
+            defaults=defaults,
+            batch_size=args.batch_size,
+            writers=args.writers,
+            errors=errors
+        )
+        summary = importer.run()
+    finally:
+        if errors:
+            errors.close()
+
+    if writer and summary['lessons'] > 0:
+        try:
+            writer.invalidate_reference_cache()
+        except (requests.RequestException, WriteError) as error:
+            print(f'Reference cache not invalidated ({error}); app servers pick up new rows '
+                  'after REFERENCE_CACHE_TTL_SECONDS', file=sys.stderr)
+
+    print(json.dumps(summary, indent=2))
+    if importer.failure:
+        print(f'Import stopped: {importer.failure}', file=sys.stderr)
+        print('Re-run the same command to resume from the checkpoint.', file=sys.stderr)
+        sys.exit(1)